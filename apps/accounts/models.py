@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
 
@@ -132,3 +134,14 @@ class Address(models.Model):
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return f"{self.city}, {self.line1}".strip(', ')
+
+
+@receiver(post_save, sender=GarageVehicle)
+@receiver(post_delete, sender=GarageVehicle)
+def bump_garage_version_on_change(sender, instance: GarageVehicle, raw: bool = False, **kwargs):
+    # Catalog ETags of the user include the garage (filter and picker)
+    if raw:
+        return
+    from apps.catalog.cache import bump_garage_version
+
+    bump_garage_version(instance.user_id)
@@ -5,10 +5,10 @@ from typing import Tuple
 
 from rest_framework import status, views
 from rest_framework.response import Response
-from rest_framework.renderers import JSONRenderer
 from django.shortcuts import get_object_or_404
 
 from apps.catalog.models import Product
+from apps.core.renderers import FastJSONRenderer
 from .models import Cart, CartItem
 from .serializers import CartSerializer, CartItemSerializer
 
@@ -37,7 +37,7 @@ def ensure_cart(request) -> Tuple[Cart, bool]:
 
 
 class CartRetrieveView(views.APIView):
-    renderer_classes = [JSONRenderer]
+    renderer_classes = [FastJSONRenderer]
     def get(self, request):
         cart, _ = ensure_cart(request)
         data = CartSerializer(cart).data
@@ -45,7 +45,7 @@ class CartRetrieveView(views.APIView):
 
 
 class CartItemAddView(views.APIView):
-    renderer_classes = [JSONRenderer]
+    renderer_classes = [FastJSONRenderer]
     def post(self, request):
         cart, _ = ensure_cart(request)
         product_id = request.data.get("product")
@@ -71,7 +71,7 @@ class CartItemAddView(views.APIView):
 
 
 class CartItemUpdateView(views.APIView):
-    renderer_classes = [JSONRenderer]
+    renderer_classes = [FastJSONRenderer]
     def patch(self, request, item_id: int):
         cart, _ = ensure_cart(request)
         item = get_object_or_404(CartItem, id=item_id, cart=cart)
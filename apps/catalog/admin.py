@@ -1,8 +1,58 @@
 from decimal import Decimal
 import json
 from django import forms
-from django.contrib import admin
-from .models import Category, Product, PriceHistory, ProductChangeLog
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .importer import IMPORT_FORMATS, ImportFormatUnavailable, check_format, detect_format, import_file
+from .models import Category, Product, PriceHistory, ProductChangeLog, ScheduledPriceChange
+from .pricing import (
+    MODE_CHOICES,
+    MODE_PERCENT,
+    ROUNDING_CHOICES,
+    RepricingRule,
+    apply_repricing,
+    preview_repricing,
+)
+
+
+class CatalogImportForm(forms.Form):
+    file = forms.FileField(label="Файл", help_text="CSV, XLSX или JSONL; товары сопоставляются по артикулу (sku)")
+    reason = forms.CharField(label="Причина изменения цен", max_length=255, initial="import")
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        try:
+            self.format = detect_format(upload.name)
+        except ValueError:
+            raise forms.ValidationError(f"Поддерживаются файлы: {', '.join(IMPORT_FORMATS)}")
+        try:
+            check_format(self.format)
+        except ImportFormatUnavailable as exc:
+            raise forms.ValidationError(str(exc))
+        return upload
+
+
+class RepricingForm(forms.Form):
+    mode = forms.ChoiceField(label="Изменение", choices=MODE_CHOICES, initial=MODE_PERCENT)
+    value = forms.DecimalField(label="Величина", max_digits=12, decimal_places=2,
+                               help_text="Например 10 или -5; для процента — на сколько процентов изменить цену")
+    rounding = forms.ChoiceField(label="Округление", choices=ROUNDING_CHOICES, initial="0.01")
+    category = forms.ModelChoiceField(label="Категория", queryset=Category.objects.all(), required=False)
+    manufacturer = forms.CharField(label="Производитель", max_length=120, required=False)
+
+    def rule(self) -> RepricingRule:
+        data = self.cleaned_data
+        return RepricingRule(data["mode"], data["value"], data["rounding"])
+
+    def scope(self, queryset):
+        if self.cleaned_data["category"]:
+            queryset = queryset.filter(category=self.cleaned_data["category"])
+        if self.cleaned_data["manufacturer"]:
+            queryset = queryset.filter(manufacturer__iexact=self.cleaned_data["manufacturer"])
+        return queryset
 
 
 class PriceHistoryInline(admin.TabularInline):
@@ -31,20 +81,99 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ("name", "sku", "manufacturer", "description")
     prepopulated_fields = {"slug": ("name",)}
     inlines = [PriceHistoryInline, ProductChangeLogInline]
+    change_list_template = "admin/catalog/product/change_list.html"
+
+    actions = ["increase_price_10", "decrease_price_10", "reprice_selected"]
+
+    def save_model(self, request, obj, form, change):
+        # Recorded on the change-log and price-history rows
+        obj._changed_by = request.user
+        super().save_model(request, obj, form, change)
 
-    actions = ["increase_price_10", "decrease_price_10"]
+    def _apply_repricing(self, request, queryset, rule: RepricingRule):
+        result = apply_repricing(queryset, rule, changed_by=request.user)
+        self.message_user(
+            request,
+            f"Цены изменены: {result.changed}, без изменений: {result.unchanged}, пропущено: {result.skipped}",
+            messages.SUCCESS,
+        )
 
     @admin.action(description="Увеличить цену на 10%%")
     def increase_price_10(self, request, queryset):
-        for product in queryset:
-            product.price = (product.price * Decimal('1.10')).quantize(Decimal('0.01'))
-            product.save()
+        self._apply_repricing(request, queryset, RepricingRule(MODE_PERCENT, Decimal("10")))
 
     @admin.action(description="Уменьшить цену на 10%%")
     def decrease_price_10(self, request, queryset):
-        for product in queryset:
-            product.price = (product.price * Decimal('0.90')).quantize(Decimal('0.01'))
-            product.save()
+        self._apply_repricing(request, queryset, RepricingRule(MODE_PERCENT, Decimal("-10")))
+
+    @admin.action(description="Переоценка выбранных товаров…")
+    def reprice_selected(self, request, queryset):
+        return self._reprice(request, queryset, selected=True)
+
+    def reprice_view(self, request):
+        return self._reprice(request, Product.objects.all(), selected=False)
+
+    def _reprice(self, request, queryset, selected: bool):
+        """Repricing form: "preview" shows counts and a sample, "apply" writes the new prices."""
+        if not self.has_change_permission(request):
+            return redirect("admin:catalog_product_changelist")
+        submitted = "preview" in request.POST or "apply" in request.POST
+        form = RepricingForm(request.POST if submitted else None)
+        preview = None
+        if submitted and form.is_valid():
+            scoped = form.scope(queryset)
+            if "apply" in request.POST:
+                self._apply_repricing(request, scoped, form.rule())
+                return redirect("admin:catalog_product_changelist")
+            preview = preview_repricing(scoped, form.rule())
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Переоценка товаров",
+            "form": form,
+            "preview": preview,
+            "selected": selected,
+            "selected_count": queryset.count() if selected else None,
+            "action_checkbox_name": ACTION_CHECKBOX_NAME,
+            "selected_ids": request.POST.getlist(ACTION_CHECKBOX_NAME),
+            "select_across": request.POST.get("select_across", "0"),
+        }
+        return TemplateResponse(request, "admin/catalog/product/reprice.html", context)
+
+    def get_urls(self):
+        urls = [
+            path("import/", self.admin_site.admin_view(self.import_view), name="catalog_product_import"),
+            path("reprice/", self.admin_site.admin_view(self.reprice_view), name="catalog_product_reprice"),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a price list and run the bulk import (see ``apps.catalog.importer``)."""
+        if not self.has_change_permission(request) or not self.has_add_permission(request):
+            return redirect("admin:catalog_product_changelist")
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            report = import_file(
+                form.cleaned_data["file"].file, form.format, user=request.user, reason=form.cleaned_data["reason"],
+            )
+            self.message_user(
+                request,
+                f"Строк: {report.rows}, создано: {report.created} (категория подобрана: {report.categorized}), "
+                f"обновлено: {report.updated}, "
+                f"без изменений: {report.unchanged}, ошибок: {report.error_count} "
+                f"({report.elapsed:.1f} с, {report.rows_per_second:.0f} строк/с)",
+                messages.WARNING if report.error_count else messages.SUCCESS,
+            )
+            for line, message in report.errors[:20]:
+                self.message_user(request, f"Строка {line}: {message}", messages.ERROR)
+            return redirect("admin:catalog_product_changelist")
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Импорт товаров",
+            "form": form,
+        }
+        return TemplateResponse(request, "admin/catalog/product/import.html", context)
 
 
 # --- Custom admin form to make `images` input friendlier ---
@@ -108,3 +237,24 @@ class ProductChangeLogAdmin(admin.ModelAdmin):
     list_display = ("product", "field", "changed_by", "changed_at")
     list_filter = ("field", "changed_at", "changed_by")
     search_fields = ("product__name", "field", "old_value", "new_value")
+
+
+@admin.register(ScheduledPriceChange)
+class ScheduledPriceChangeAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "kind", "value", "effective_at", "applied_at", "created_by")
+    list_filter = (("applied_at", admin.EmptyFieldListFilter), "kind", "effective_at")
+    search_fields = ("product__name", "product__sku", "category__name", "reason")
+    raw_id_fields = ("product",)
+    readonly_fields = ("created_by", "created_at", "applied_at")
+    date_hierarchy = "effective_at"
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Applied changes are kept as a record and no longer editable
+        if obj is not None and obj.applied_at:
+            return [f.name for f in self.model._meta.fields]
+        return self.readonly_fields
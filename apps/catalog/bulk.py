@@ -0,0 +1,79 @@
+"""Bulk Product writes shared by the importer, repricing and the price scheduler.
+
+These paths never call ``save()``, so they write rows in bulk and then
+refresh, once per batch, the derived data the Product signal handlers would
+otherwise maintain per row (see :func:`sync_derived_data`).
+"""
+from __future__ import annotations
+
+from django.db import connection, transaction
+
+from .models import Category, Product
+
+
+def update_products(products: list[Product], fields: list[str]) -> None:
+    """Write ``fields`` of already-saved ``products`` without signals.
+
+    The same ``UPDATE … WHERE id = %s`` is run once per product through
+    ``executemany`` (one round trip; the database still executes a statement
+    per row): ``bulk_update()`` would build a CASE WHEN expression per row and
+    field, which dominates large batches with several changed columns.
+    """
+    columns = [Product._meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    sql = "UPDATE {} SET {} WHERE {} = %s".format(
+        quote(Product._meta.db_table),
+        ", ".join(f"{quote(column.column)} = %s" for column in columns),
+        quote(Product._meta.pk.column),
+    )
+    params = [
+        [column.get_db_prep_save(getattr(p, column.attname), connection) for column in columns] + [p.pk]
+        for p in products
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def sync_derived_data(products: list[Product], previous: dict[int, dict], reindex: list[Product],
+                      fitments: list[Product]) -> None:
+    """Refresh what the Product save handlers maintain, for bulk-written ``products``.
+
+    ``previous`` maps the pk of updated products to their old ``slug``,
+    ``category_id`` and ``updated_at``. Search tokens, FTS rows, codes and
+    suggestions are rebuilt for ``reindex`` (with ``category`` loaded), vehicle
+    fitments for ``fitments``; caches are invalidated for all ``products``.
+    """
+    from . import fts, result_cache, search, suggest
+    from .cache import bump_catalog_version
+    from .codes import sync_codes
+    from .compatibility import sync_fitments
+    from .fragments import card_keys
+
+    if not products:
+        return
+    search.index_products(reindex)
+    fts.index_products([p.pk for p in reindex])
+    sync_fitments(fitments)
+    sync_codes(reindex)
+
+    def after_commit():
+        scopes = {result_cache.SCOPE_ALL}
+        category_ids = set()
+        stale_cards = []
+        for p in products:
+            old = previous.get(p.pk, {})
+            scopes.update(result_cache.product_scope(slug) for slug in (p.slug, old.get("slug")) if slug)
+            category_ids.update({p.category_id, old.get("category_id")} - {None})
+            if old.get("updated_at"):
+                stale_cards.extend(card_keys(p.pk, old["updated_at"]))
+        for p in reindex:
+            suggest.product_changed(p)
+        slugs = Category.objects.filter(pk__in=category_ids).values_list("slug", flat=True)
+        scopes.update(result_cache.category_scope(slug) for slug in slugs)
+        result_cache.bump_generations(scopes)
+        result_cache.result_cache().delete_many(stale_cards)
+        # Renamed products were patched into the suggest index above; the
+        # rest keep their names, so the index stays current either way
+        suggest.catalog_bumped(bump_catalog_version(products=[p.pk for p in products]))
+
+    transaction.on_commit(after_commit)
@@ -0,0 +1,97 @@
+"""Version counters used to key cached catalog data.
+
+The catalog version is bumped by the Product/Category signal handlers and
+the bulk writers (import, repricing, the price scheduler), so anything
+cached under the current version becomes unreachable as soon as the catalog
+changes. Each user's garage has its own version, bumped when a
+``GarageVehicle`` is saved or deleted.
+
+Each catalog bump can record the ids of the products and categories it
+changed, so per-process structures built from the catalog (the suggest
+index) catch up by re-reading those rows instead of rebuilding.
+
+Counters live in the ``catalog`` cache alias (shared between processes when
+it is backed by files or Redis), like the result-cache generations.
+"""
+from __future__ import annotations
+
+import time
+from typing import Iterable
+
+from .result_cache import result_cache
+
+
+VERSION_KEY = "catalog:version"
+# Seconds a version's change record is kept; readers further behind rebuild
+CHANGES_TIMEOUT = 3600
+
+
+def _changes_key(version: int) -> str:
+    return f"catalog:changes:{version}"
+
+
+def _garage_key(user_id: int) -> str:
+    return f"catalog:garage:{user_id}"
+
+
+def _counter(key: str) -> int:
+    cache = result_cache()
+    value = cache.get(key)
+    if value is None:
+        # Seed from the clock so a counter evicted from the cache never
+        # comes back with a value that was already used.
+        cache.add(key, time.time_ns() // 1_000_000, timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def _bump(key: str) -> int:
+    cache = result_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        _counter(key)
+        return cache.incr(key)
+
+
+def catalog_version() -> int:
+    return _counter(VERSION_KEY)
+
+
+def bump_catalog_version(products: Iterable[int] | None = None, categories: Iterable[int] | None = None) -> int:
+    """Bump the catalog version, recording the changed product and category ids.
+
+    Without ids nothing is recorded and readers treat the change as unknown.
+    """
+    version = _bump(VERSION_KEY)
+    if products is not None or categories is not None:
+        result_cache().set(
+            _changes_key(version), (tuple(products or ()), tuple(categories or ())), timeout=CHANGES_TIMEOUT,
+        )
+    return version
+
+
+def catalog_changes(since: int, until: int) -> tuple[set[int], set[int]] | None:
+    """Product and category ids changed by the versions after ``since`` up to ``until``.
+
+    ``None`` when any of those versions has no change record.
+    """
+    if until < since:
+        return None
+    keys = [_changes_key(version) for version in range(since + 1, until + 1)]
+    records = result_cache().get_many(keys)
+    if len(records) < len(keys):
+        return None
+    products, categories = set(), set()
+    for product_ids, category_ids in records.values():
+        products.update(product_ids)
+        categories.update(category_ids)
+    return products, categories
+
+
+def garage_version(user_id: int) -> int:
+    return _counter(_garage_key(user_id))
+
+
+def bump_garage_version(user_id: int) -> int:
+    return _bump(_garage_key(user_id))
@@ -0,0 +1,98 @@
+"""Normalized article numbers (SKU / OEM codes).
+
+Part numbers are pasted in many spellings ("0 986 AFL 123", "0986AFL123",
+"0986-afl-123"). They are reduced to lowercase letters and digits and stored
+in ``ProductCode`` so a pasted number resolves with one indexed equality
+lookup. Codes come from the SKU and from code-like runs in the product name
+(tokens with digits or short Latin capitals, e.g. "Bosch 0 986 AFL 123").
+"""
+from __future__ import annotations
+
+import re
+from typing import Iterable
+
+from .models import Product, ProductCode
+
+
+MIN_CODE_LENGTH = 4
+MAX_CODE_LENGTH = 100
+_NON_CODE_RE = re.compile(r"[\W_]+", re.UNICODE)
+_DIGIT_RE = re.compile(r"\d")
+
+
+def normalize_code(value: str) -> str:
+    return _NON_CODE_RE.sub("", (value or "").casefold())[:MAX_CODE_LENGTH]
+
+
+def looks_like_code(value: str) -> bool:
+    code = normalize_code(value)
+    return len(code) >= MIN_CODE_LENGTH and bool(_DIGIT_RE.search(code))
+
+
+def _is_code_token(token: str) -> bool:
+    if _DIGIT_RE.search(token):
+        return True
+    letters = _NON_CODE_RE.sub("", token)
+    return bool(letters) and letters.isascii() and letters.isupper() and len(letters) <= 4
+
+
+def name_codes(name: str) -> set[str]:
+    """Codes from runs of consecutive code-like tokens in a product name."""
+    codes: set[str] = set()
+    run: list[str] = []
+    for token in (name or "").split() + [""]:
+        if token and _is_code_token(token):
+            run.append(token)
+            continue
+        if run:
+            code = normalize_code("".join(run))
+            if len(code) >= MIN_CODE_LENGTH and _DIGIT_RE.search(code):
+                codes.add(code)
+            run = []
+    return codes
+
+
+def product_codes(name: str, sku: str) -> set[tuple[str, str]]:
+    codes = {(code, ProductCode.KIND_OEM) for code in name_codes(name)}
+    sku_code = normalize_code(sku)
+    if sku_code:
+        codes.discard((sku_code, ProductCode.KIND_OEM))
+        codes.add((sku_code, ProductCode.KIND_SKU))
+    return codes
+
+
+def sync_codes(products: Iterable[Product]) -> None:
+    products = [p for p in products if p.pk]
+    if not products:
+        return
+    wanted = {p.pk: product_codes(p.name, p.sku) for p in products}
+    existing: dict[int, set[tuple[str, str]]] = {pk: set() for pk in wanted}
+    for product_id, code, kind in ProductCode.objects.filter(product_id__in=wanted).values_list("product_id", "code", "kind"):
+        existing[product_id].add((code, kind))
+    changed = [pk for pk in wanted if wanted[pk] != existing[pk]]
+    if not changed:
+        return
+    ProductCode.objects.filter(product_id__in=changed).delete()
+    ProductCode.objects.bulk_create(
+        [ProductCode(product_id=pk, code=code, kind=kind) for pk in changed for code, kind in wanted[pk]],
+        batch_size=500,
+    )
+
+
+def product_ids_for_code(value: str, limit: int | None = None) -> list[int]:
+    """Products whose SKU or OEM code equals ``value`` after normalization."""
+    code = normalize_code(value)
+    if len(code) < MIN_CODE_LENGTH:
+        return []
+    qs = ProductCode.objects.filter(code=code).order_by("kind", "product_id").values_list("product_id", flat=True)
+    ids = list(dict.fromkeys(qs))
+    return ids[:limit] if limit else ids
+
+
+def unique_product_slug(value: str) -> str | None:
+    """Slug of the single product with this code, or ``None`` (no match or ambiguous)."""
+    code = normalize_code(value)
+    if len(code) < MIN_CODE_LENGTH:
+        return None
+    slugs = list(ProductCode.objects.filter(code=code).values_list("product__slug", flat=True).distinct()[:2])
+    return slugs[0] if len(slugs) == 1 else None
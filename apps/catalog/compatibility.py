@@ -0,0 +1,206 @@
+"""Vehicle compatibility index.
+
+``Product.compatibility`` stays the source of truth (a JSON list of
+``{make, model, year}``); ``VehicleFitment`` holds one normalized row per
+entry so make/model/year filters are indexed lookups instead of JSON scans.
+A fitment without a model fits every model of its make, and one without a
+year every year of its model; the catalog filters and the garage treat
+blank values as wildcards alike.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Iterable
+
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Product, VehicleFitment
+from .result_cache import result_cache
+from .search import normalize
+
+
+# Longest year range expanded from entries like {"year": "2012-2016"}
+MAX_YEAR_SPAN = 50
+# Precomputed per-vehicle product sets live in the shared ``catalog`` cache
+# until a product of that make/model changes (see invalidate_vehicle_sets).
+VEHICLE_SET_TIMEOUT = 60 * 60 * 24
+# Garages matching more products are filtered with a fitment subquery
+# instead of a list of ids bound into the SQL.
+GARAGE_MAX_IDS = 500
+
+
+def vehicle_key(value) -> str:
+    return " ".join(normalize(str(value or "")).split())
+
+
+def parse_year(value) -> int | None:
+    try:
+        year = int(value)
+    except (TypeError, ValueError):
+        return None
+    return year if year > 0 else None
+
+
+def _entry_years(year) -> list[int | None]:
+    if isinstance(year, str) and "-" in year:
+        start, _, end = year.partition("-")
+        start, end = parse_year(start), parse_year(end)
+        if start and end and 0 <= end - start <= MAX_YEAR_SPAN:
+            return list(range(start, end + 1))
+    return [parse_year(year)]
+
+
+def fitment_rows(compatibility) -> list[dict]:
+    """Normalized, de-duplicated fitment field values for a compatibility list."""
+    rows: dict[tuple, dict] = {}
+    entries = compatibility if isinstance(compatibility, list) else []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        make = str(entry.get("make") or "").strip()
+        model = str(entry.get("model") or "").strip()
+        if not make:
+            continue
+        for year in _entry_years(entry.get("year")):
+            key = (vehicle_key(make)[:60], vehicle_key(model)[:60], year)
+            rows.setdefault(key, {
+                "make": make[:60],
+                "model": model[:60],
+                "year": year,
+                "make_key": key[0],
+                "model_key": key[1],
+            })
+    return list(rows.values())
+
+
+def fitments_for(product: Product) -> list[VehicleFitment]:
+    return [VehicleFitment(product_id=product.pk, **row) for row in fitment_rows(product.compatibility)]
+
+
+def sync_fitments(products: Iterable[Product]) -> None:
+    products = [p for p in products if p.pk]
+    if not products:
+        return
+    rows = [row for p in products for row in fitments_for(p)]
+    existing = VehicleFitment.objects.filter(product_id__in=[p.pk for p in products])
+    affected = set(existing.values_list("make_key", "model_key"))
+    affected.update((row.make_key, row.model_key) for row in rows)
+    existing.delete()
+    VehicleFitment.objects.bulk_create(rows, batch_size=500)
+    invalidate_vehicle_sets(affected)
+
+
+# ---------------------- per-vehicle product sets ----------------------
+def vehicle_set_key(make_key: str, model_key: str | None) -> str:
+    """Cache key of the fitments of one make/model; ``model_key=None`` for the whole make."""
+    raw = make_key if model_key is None else f"{make_key}\x00{model_key}"
+    return f"catalog:vehicle-set:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+def _vehicle_sets(make_key: str, model_key: str) -> list[tuple[str, str | None]]:
+    """Cached sets covering a vehicle: its model plus the make's fitments without a model, or the whole make."""
+    return [(make_key, model_key), (make_key, "")] if model_key else [(make_key, None)]
+
+
+def invalidate_vehicle_sets(vehicles: Iterable[tuple[str, str]]) -> None:
+    """Drop cached product sets for ``(make_key, model_key)`` pairs.
+
+    Sets are cached per make+model (a blank model being a model of its own)
+    and per whole make (vehicles saved without a model), so both are dropped.
+    """
+    keys = set()
+    for make_key, model_key in vehicles:
+        keys.add(vehicle_set_key(make_key, model_key))
+        keys.add(vehicle_set_key(make_key, None))
+    if keys:
+        result_cache().delete_many(list(keys))
+
+
+def _load_vehicle_sets(
+    vehicles: set[tuple[str, str | None]],
+) -> dict[tuple[str, str | None], list[tuple[int, int | None]]]:
+    """Read ``(product_id, year)`` pairs for several vehicle sets in one query."""
+    q = Q()
+    for make_key, model_key in vehicles:
+        q |= Q(make_key=make_key) if model_key is None else Q(make_key=make_key, model_key=model_key)
+    result: dict[tuple[str, str | None], list[tuple[int, int | None]]] = {v: [] for v in vehicles}
+    rows = VehicleFitment.objects.filter(q).values_list("make_key", "model_key", "product_id", "year")
+    for make_key, model_key, product_id, year in rows:
+        if (make_key, model_key) in result:
+            result[(make_key, model_key)].append((product_id, year))
+        if (make_key, None) in result:
+            result[(make_key, None)].append((product_id, year))
+    return result
+
+
+def _wanted_vehicles(vehicles: Iterable) -> list[tuple[str, str, int | None]]:
+    wanted = []
+    for v in vehicles:
+        make_key = vehicle_key(v.make)[:60]
+        if make_key:
+            wanted.append((make_key, vehicle_key(v.model)[:60], parse_year(v.year)))
+    return wanted
+
+
+def garage_product_ids(vehicles: Iterable) -> set[int]:
+    """Ids of products that fit any of the given vehicles.
+
+    ``vehicles`` are objects with ``make``/``model``/``year`` (``GarageVehicle``).
+    Each make/model set comes from the cache in a single ``get_many``; only
+    the missing ones are read from the fitment index, in one query.
+    """
+    return _garage_ids(_wanted_vehicles(vehicles))
+
+
+def _garage_ids(wanted: list[tuple[str, str, int | None]]) -> set[int]:
+    if not wanted:
+        return set()
+    cache = result_cache()
+    pairs = {pair for make_key, model_key, _ in wanted for pair in _vehicle_sets(make_key, model_key)}
+    keys = {vehicle_set_key(*pair): pair for pair in pairs}
+    cached = cache.get_many(list(keys))
+    sets = {keys[key]: value for key, value in cached.items()}
+    missing = pairs - set(sets)
+    if missing:
+        loaded = _load_vehicle_sets(missing)
+        cache.set_many({vehicle_set_key(*pair): value for pair, value in loaded.items()}, VEHICLE_SET_TIMEOUT)
+        sets.update(loaded)
+
+    ids: set[int] = set()
+    for make_key, model_key, year in wanted:
+        for pair in _vehicle_sets(make_key, model_key):
+            for product_id, fitment_year in sets[pair]:
+                if year is None or fitment_year is None or fitment_year == year:
+                    ids.add(product_id)
+    return ids
+
+
+def garage_filter(vehicles: Iterable) -> Q:
+    """``Product`` filter for parts fitting any of ``vehicles``.
+
+    Up to ``GARAGE_MAX_IDS`` matches this is ``id__in`` over the cached
+    per-vehicle sets; above that an ``IN`` subquery on the fitment index.
+    """
+    wanted = _wanted_vehicles(vehicles)
+    ids = _garage_ids(wanted)
+    if len(ids) <= GARAGE_MAX_IDS:
+        return Q(id__in=sorted(ids))
+    q = Q()
+    for make_key, model_key, year in wanted:
+        vehicle = Q(make_key=make_key)
+        if model_key:
+            vehicle &= Q(model_key=model_key) | Q(model_key="")
+        if year is not None:
+            vehicle &= Q(year=year) | Q(year__isnull=True)
+        q |= vehicle
+    return Q(id__in=VehicleFitment.objects.filter(q).values("product_id"))
+
+
+def fitment_filter(make: str, model: str = "", year: int | None = None) -> Q:
+    """Semi-join filter for ``Product`` querysets on the fitment index."""
+    fitments = VehicleFitment.objects.filter(product=OuterRef("pk"), make_key=vehicle_key(make))
+    if model:
+        fitments = fitments.filter(Q(model_key=vehicle_key(model)) | Q(model_key=""))
+    if year:
+        fitments = fitments.filter(Q(year=year) | Q(year__isnull=True))
+    return Q(Exists(fitments))
@@ -0,0 +1,71 @@
+"""Validators for conditional GETs (``ETag`` / ``Last-Modified``).
+
+Used with :func:`django.views.decorators.http.condition`, so a matching
+``If-None-Match`` / ``If-Modified-Since`` is answered with 304 before any
+serializer or template runs.
+
+* single products: ``(id, updated_at)`` read with one indexed query, plus the
+  category generation (category names appear on product pages);
+* listings: the catalog version counter, which every Product/Category change
+  bumps.
+
+Both are combined with the query string (filters, ``fields=``/``omit=``).
+
+HTML ETags also carry the user id, as pages differ between visitors, and
+listings the user's garage version (garage filter and picker).
+"""
+from __future__ import annotations
+
+import hashlib
+
+from .cache import catalog_version, garage_version
+from .models import Product
+from .result_cache import SCOPE_CATEGORIES, generation
+
+
+def _product_validator(request, slug: str):
+    # condition() asks for the ETag and Last-Modified separately; read once
+    cached = getattr(request, "_product_validator", None)
+    if cached is None or cached[0] != slug:
+        row = Product.objects.filter(slug=slug).values_list("id", "updated_at").first()
+        cached = (slug, row)
+        request._product_validator = cached
+    return cached[1]
+
+
+def _query_part(request) -> str:
+    # Query parameters such as fields=/omit= change the representation
+    query = sorted(request.GET.lists())
+    htmx = int("HX-Request" in request.headers)
+    return hashlib.sha1(f"{query}|{htmx}".encode("utf-8")).hexdigest()[:16]
+
+
+def _user_part(request) -> str:
+    user = getattr(request, "user", None)
+    return f"u{user.pk}" if user is not None and user.is_authenticated else "u0"
+
+
+def product_last_modified(request, slug: str):
+    row = _product_validator(request, slug)
+    return row[1] if row else None
+
+
+def product_etag(request, slug: str) -> str | None:
+    row = _product_validator(request, slug)
+    if row is None:
+        return None
+    product_id, updated_at = row
+    return f"p{product_id}-{updated_at.timestamp():.6f}-{generation(SCOPE_CATEGORIES)}-{_query_part(request)}"
+
+
+def product_page_etag(request, slug: str) -> str | None:
+    etag = product_etag(request, slug)
+    return f"{etag}-{_user_part(request)}" if etag else None
+
+
+def catalog_etag(request, *args, **kwargs) -> str:
+    etag = f"c{catalog_version()}-{_query_part(request)}-{_user_part(request)}"
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        etag = f"{etag}-g{garage_version(user.pk)}"
+    return etag
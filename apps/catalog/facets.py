@@ -0,0 +1,88 @@
+"""Facet counts for a catalog result set.
+
+All facets come from one ``GROUP BY`` over (category, manufacturer, price
+bucket, in stock); the per-facet totals are rolled up in Python from those
+rows instead of running a query per facet.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db.models import Case, Count, IntegerField, QuerySet, Value, When
+
+
+# (min, max) price bounds per bucket; ``None`` means unbounded
+PRICE_BUCKETS: list[tuple[Decimal | None, Decimal | None]] = [
+    (None, Decimal("1000")),
+    (Decimal("1000"), Decimal("3000")),
+    (Decimal("3000"), Decimal("5000")),
+    (Decimal("5000"), Decimal("10000")),
+    (Decimal("10000"), None),
+]
+
+
+def _bucket_key(low: Decimal | None, high: Decimal | None) -> str:
+    if high is None:
+        return f"{low:f}+"
+    return f"{low or 0:f}-{high:f}"
+
+
+def _price_bucket_expression() -> Case:
+    whens = [
+        When(price__lt=high, then=Value(index))
+        for index, (_, high) in enumerate(PRICE_BUCKETS)
+        if high is not None
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def compute_facets(queryset: QuerySet) -> dict:
+    rows = (
+        queryset.order_by()
+        .annotate(
+            facet_price=_price_bucket_expression(),
+            facet_stock=Case(When(in_stock__gt=0, then=Value(1)), default=Value(0), output_field=IntegerField()),
+        )
+        .values("category_id", "category__slug", "category__name", "manufacturer", "facet_price", "facet_stock")
+        .annotate(n=Count("id"))
+    )
+
+    total = 0
+    categories: dict[int, dict] = {}
+    manufacturers: dict[str, int] = {}
+    prices = [0] * len(PRICE_BUCKETS)
+    in_stock = 0
+    for row in rows:
+        n = row["n"]
+        total += n
+        category = categories.setdefault(row["category_id"], {
+            "id": row["category_id"],
+            "slug": row["category__slug"],
+            "name": row["category__name"],
+            "count": 0,
+        })
+        category["count"] += n
+        if row["manufacturer"]:
+            manufacturers[row["manufacturer"]] = manufacturers.get(row["manufacturer"], 0) + n
+        prices[row["facet_price"]] += n
+        if row["facet_stock"]:
+            in_stock += n
+
+    return {
+        "total": total,
+        "categories": sorted(categories.values(), key=lambda c: c["name"]),
+        "manufacturers": [
+            {"name": name, "count": count}
+            for name, count in sorted(manufacturers.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        "price": [
+            {
+                "key": _bucket_key(low, high),
+                "min": None if low is None else str(low),
+                "max": None if high is None else str(high),
+                "count": prices[index],
+            }
+            for index, (low, high) in enumerate(PRICE_BUCKETS)
+        ],
+        "in_stock": {"in_stock": in_stock, "out_of_stock": total - in_stock},
+    }
@@ -0,0 +1,177 @@
+"""Product feeds for marketplaces and price aggregators (YML, CSV, JSONL).
+
+A :class:`Feed` reads ``Product`` rows with ``.values().iterator(chunk_size)``
+and yields encoded output in ~64 KB pieces, so memory stays flat however
+large the catalog is. The same object backs the ``/api/feeds/`` streaming
+endpoint and the ``export_feed`` command.
+
+Incremental feeds pass ``since`` and get only products with
+``updated_at > since``. Every feed carries its ``generated_at`` time
+(``X-Feed-Generated-At`` header, YML ``date``), which the consumer passes
+as ``since`` next time. Deleted products are not reported by incremental
+feeds; consumers should reload the full feed periodically.
+"""
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+import json
+from decimal import Decimal
+from typing import Iterator
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Category, Product
+
+
+FEED_CHUNK_SIZE = 2000
+# Output is flushed once this many characters are buffered
+FEED_BUFFER_SIZE = 64 * 1024
+
+FEED_COLUMNS = (
+    "id", "sku", "name", "slug", "manufacturer", "description", "price", "in_stock",
+    "images", "category_id", "updated_at",
+)
+CSV_HEADER = (
+    "id", "sku", "name", "url", "manufacturer", "category", "price", "in_stock", "image", "updated_at",
+)
+
+FEED_FORMATS = {
+    "yml": "application/xml; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+def parse_since(value: str | None) -> datetime.datetime | None:
+    """Parse an ISO date or datetime; naive values are in the current time zone.
+
+    Raises ``ValueError`` for anything else.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value!r}")
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _price(value: Decimal) -> str:
+    return f"{value:.2f}"
+
+
+class Feed:
+    """Iterable of encoded feed chunks.
+
+    ``rows`` counts the products written so far (final once iteration ends).
+    """
+
+    def __init__(self, fmt: str, since: datetime.datetime | None = None, base_url: str | None = None,
+                 chunk_size: int = FEED_CHUNK_SIZE):
+        if fmt not in FEED_FORMATS:
+            raise ValueError(f"Unknown feed format: {fmt!r}")
+        self.fmt = fmt
+        self.since = since
+        self.base_url = (base_url or settings.SITE_BASE_URL).rstrip("/")
+        self.chunk_size = chunk_size
+        self.generated_at = timezone.now()
+        self.rows = 0
+
+    @property
+    def content_type(self) -> str:
+        return FEED_FORMATS[self.fmt]
+
+    @property
+    def filename(self) -> str:
+        return f"products.{self.fmt}"
+
+    def queryset(self):
+        qs = Product.objects.filter(updated_at__lte=self.generated_at)
+        if self.since is not None:
+            qs = qs.filter(updated_at__gt=self.since)
+        return qs.order_by("id").values(*FEED_COLUMNS)
+
+    def product_url(self, slug: str) -> str:
+        return f"{self.base_url}/parts/{slug}/"
+
+    def _products(self) -> Iterator[dict]:
+        for row in self.queryset().iterator(chunk_size=self.chunk_size):
+            self.rows += 1
+            yield row
+
+    def __iter__(self) -> Iterator[bytes]:
+        buffer: list[str] = []
+        size = 0
+        for piece in getattr(self, f"_{self.fmt}")():
+            buffer.append(piece)
+            size += len(piece)
+            if size >= FEED_BUFFER_SIZE:
+                yield "".join(buffer).encode("utf-8")
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer).encode("utf-8")
+
+    def _yml(self) -> Iterator[str]:
+        date = timezone.localtime(self.generated_at).strftime("%Y-%m-%d %H:%M")
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield f"<yml_catalog date={quoteattr(date)}>\n<shop>\n"
+        yield f"<name>ZapChasti</name>\n<url>{escape(self.base_url)}/</url>\n"
+        yield '<currencies><currency id="RUR" rate="1"/></currencies>\n<categories>\n'
+        for category_id, name in Category.objects.order_by("id").values_list("id", "name"):
+            yield f'<category id="{category_id}">{escape(name)}</category>\n'
+        yield "</categories>\n<offers>\n"
+        for row in self._products():
+            available = "true" if row["in_stock"] > 0 else "false"
+            parts = [
+                f'<offer id="{row["id"]}" available="{available}">',
+                f"<url>{escape(self.product_url(row['slug']))}</url>",
+                f"<price>{_price(row['price'])}</price>",
+                "<currencyId>RUR</currencyId>",
+                f"<categoryId>{row['category_id']}</categoryId>",
+            ]
+            parts.extend(f"<picture>{escape(url)}</picture>" for url in (row["images"] or [])[:10])
+            parts.append(f"<name>{escape(row['name'])}</name>")
+            if row["manufacturer"]:
+                parts.append(f"<vendor>{escape(row['manufacturer'])}</vendor>")
+            parts.append(f"<vendorCode>{escape(row['sku'])}</vendorCode>")
+            if row["description"]:
+                parts.append(f"<description>{escape(row['description'])}</description>")
+            parts.append(f"<count>{row['in_stock']}</count></offer>\n")
+            yield "".join(parts)
+        yield "</offers>\n</shop>\n</yml_catalog>\n"
+
+    def _csv(self) -> Iterator[str]:
+        categories = dict(Category.objects.values_list("id", "name"))
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(CSV_HEADER)
+        for row in self._products():
+            images = row["images"] or []
+            writer.writerow((
+                row["id"], row["sku"], row["name"], self.product_url(row["slug"]), row["manufacturer"],
+                categories.get(row["category_id"], ""), _price(row["price"]), row["in_stock"],
+                images[0] if images else "", row["updated_at"].isoformat(),
+            ))
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        yield out.getvalue()
+
+    def _jsonl(self) -> Iterator[str]:
+        categories = dict(Category.objects.values_list("id", "slug"))
+        for row in self._products():
+            item = dict(row)
+            item["price"] = _price(row["price"])
+            item["category"] = categories.get(row["category_id"])
+            item["url"] = self.product_url(row["slug"])
+            item["updated_at"] = row["updated_at"].isoformat()
+            yield json.dumps(item, ensure_ascii=False) + "\n"
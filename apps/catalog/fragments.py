@@ -0,0 +1,28 @@
+"""Cached product card fragments.
+
+``catalog/_product_card.html`` and the home page cards are wrapped in
+``{% cache %}`` keyed on ``(product id, updated_at)``, so a saved product gets
+new keys by itself; the save/delete handlers drop the superseded fragments so
+they do not linger in the cache until they expire.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from django.core.cache.utils import make_template_fragment_key
+
+from .result_cache import result_cache
+
+
+# Fragment names used by the {% cache %} tags in the card templates
+CARD_FRAGMENTS = ("product_card", "home_card")
+
+
+def card_keys(product_id: int, updated_at: datetime) -> list[str]:
+    # Must match the tags' vary-on values: p.id p.updated_at.timestamp
+    return [make_template_fragment_key(name, [product_id, updated_at.timestamp()]) for name in CARD_FRAGMENTS]
+
+
+def drop_cards(product_id: int, updated_at: datetime | None) -> None:
+    if product_id and updated_at:
+        result_cache().delete_many(card_keys(product_id, updated_at))
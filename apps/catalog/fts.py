@@ -0,0 +1,128 @@
+"""SQLite FTS5 backend for catalog search.
+
+``catalog_product_fts`` mirrors the searchable columns of ``Product`` (plus the
+category name) with ``rowid = product.id``. It is created by a migration only
+on SQLite builds with FTS5, so every entry point checks :func:`is_available`
+first and callers fall back to the token index from :mod:`.search`.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .search import tokenize
+
+
+FTS_TABLE = "catalog_product_fts"
+# bm25() weights per column: name, description, sku, manufacturer, category
+BM25_WEIGHTS = (10.0, 1.0, 5.0, 3.0, 2.0)
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, description, sku, manufacturer, category, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+# unicode61 folds case for Cyrillic but keeps "ё" distinct, so fold it here to
+# match :func:`apps.catalog.search.normalize`.
+_FOLD = "replace(replace({col}, 'ё', 'е'), 'Ё', 'Е')"
+_SELECT_ROWS_SQL = (
+    "SELECT p.id, {name}, {description}, {sku}, {manufacturer}, {category} "
+    "FROM catalog_product p JOIN catalog_category c ON c.id = p.category_id"
+).format(
+    name=_FOLD.format(col="p.name"),
+    description=_FOLD.format(col="p.description"),
+    sku=_FOLD.format(col="p.sku"),
+    manufacturer=_FOLD.format(col="p.manufacturer"),
+    category=_FOLD.format(col="c.name"),
+)
+_INSERT_SQL = f"INSERT INTO {FTS_TABLE} (rowid, name, description, sku, manufacturer, category) "
+
+_available: dict[str, bool] = {}
+
+
+def is_available() -> bool:
+    if connection.vendor != "sqlite":
+        return False
+    key = str(connection.settings_dict.get("NAME"))
+    if key not in _available:
+        with connection.cursor() as cursor:
+            _available[key] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _available[key]
+
+
+def index_products(product_ids: Iterable[int], chunk_size: int = 500) -> None:
+    if not is_available():
+        return
+    ids = list(product_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+            cursor.execute(f"{_INSERT_SQL}{_SELECT_ROWS_SQL} WHERE p.id IN ({placeholders})", chunk)
+
+
+def remove_products(product_ids: Iterable[int]) -> None:
+    if not is_available():
+        return
+    ids = list(product_ids)
+    if not ids:
+        return
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", ids)
+
+
+def index_category(category_id: int) -> None:
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM catalog_product WHERE category_id = %s)",
+            [category_id],
+        )
+        cursor.execute(f"{_INSERT_SQL}{_SELECT_ROWS_SQL} WHERE p.category_id = %s", [category_id])
+
+
+def rebuild_index() -> int:
+    """Repopulate the FTS table from ``Product`` in one statement."""
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(f"{_INSERT_SQL}{_SELECT_ROWS_SQL}")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def match_expression(query: str) -> str | None:
+    """Translate a user query into an FTS5 MATCH expression.
+
+    Same semantics as :func:`apps.catalog.search.search_filter`: terms are
+    OR-ed, word tokens inside a term are AND-ed, every token is a prefix.
+    """
+    terms = []
+    for term in (query or "").split():
+        tokens = tokenize(term)
+        if tokens:
+            terms.append("(" + " AND ".join(f'"{t}"*' for t in dict.fromkeys(tokens)) + ")")
+    return " OR ".join(terms) or None
+
+
+def search_filter(expression: str) -> Q:
+    return Q(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]))
+
+
+def rank_expression(expression: str) -> RawSQL:
+    """bm25 score of a product for ``expression`` (lower is more relevant)."""
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return RawSQL(
+        f"SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = catalog_product.id",
+        [expression],
+    )
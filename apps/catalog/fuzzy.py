@@ -0,0 +1,175 @@
+"""Typo-tolerant fallback for catalog search.
+
+When an exact search finds nothing, each unknown query word is replaced by
+the closest word of the catalog vocabulary: product name, SKU, manufacturer
+and category tokens, taken from the in-process suggest index so no query
+touches the ``Product`` table. Candidates come from a trigram index and are
+confirmed with a bounded edit distance. Words are also tried in the other
+alphabet ("amortizator" -> "амортизатор", "брэмбо" -> "brembo").
+"""
+from __future__ import annotations
+
+import threading
+
+from . import suggest
+from .search import tokenize
+
+
+# Words shorter than this are never corrected
+MIN_WORD_LENGTH = 3
+
+_CYR_TO_LAT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+}
+_LAT_TO_CYR_DIGRAPHS = [
+    ("shch", "щ"), ("sch", "щ"), ("zh", "ж"), ("kh", "х"), ("ts", "ц"), ("ch", "ч"),
+    ("sh", "ш"), ("yu", "ю"), ("ya", "я"), ("yo", "ё"),
+]
+_LAT_TO_CYR = {
+    "a": "а", "b": "б", "c": "к", "d": "д", "e": "е", "f": "ф", "g": "г", "h": "х",
+    "i": "и", "j": "й", "k": "к", "l": "л", "m": "м", "n": "н", "o": "о", "p": "п",
+    "q": "к", "r": "р", "s": "с", "t": "т", "u": "у", "v": "в", "w": "в", "x": "кс",
+    "y": "ы", "z": "з",
+}
+
+
+def transliterate(word: str) -> str:
+    """Spell a casefolded word in the other alphabet (Cyrillic <-> Latin)."""
+    if any(ch in _CYR_TO_LAT for ch in word):
+        return "".join(_CYR_TO_LAT.get(ch, ch) for ch in word)
+    out = []
+    i = 0
+    while i < len(word):
+        for latin, cyrillic in _LAT_TO_CYR_DIGRAPHS:
+            if word.startswith(latin, i):
+                out.append(cyrillic)
+                i += len(latin)
+                break
+        else:
+            out.append(_LAT_TO_CYR.get(word[i], word[i]))
+            i += 1
+    return "".join(out)
+
+
+def max_distance(word: str) -> int:
+    if len(word) < MIN_WORD_LENGTH:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def _trigrams(word: str) -> set[str]:
+    padded = f"^^{word}$$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance with adjacent transpositions; ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] | None = None
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            value = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, prev2[j - 2] + 1)
+            row[j] = value
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+class FuzzyMatcher:
+    """Trigram index over a ``word -> frequency`` vocabulary."""
+
+    def __init__(self, vocabulary: dict[str, int]):
+        self.words: list[str] = []
+        self.counts: list[int] = []
+        self.grams: dict[str, list[int]] = {}
+        for word, count in vocabulary.items():
+            # Article numbers are matched by the code index, not by spelling
+            if len(word) < MIN_WORD_LENGTH or any(ch.isdigit() for ch in word):
+                continue
+            index = len(self.words)
+            self.words.append(word)
+            self.counts.append(count)
+            for gram in _trigrams(word):
+                self.grams.setdefault(gram, []).append(index)
+
+    def closest(self, word: str) -> str | None:
+        """The most frequent vocabulary word at the smallest edit distance, if within bounds."""
+        limit = max_distance(word)
+        if not limit:
+            return None
+        grams = _trigrams(word)
+        # q-gram lemma: each edit destroys at most three trigrams
+        needed = max(1, len(grams) - 3 * limit)
+        shared: dict[int, int] = {}
+        for gram in grams:
+            for index in self.grams.get(gram, ()):
+                shared[index] = shared.get(index, 0) + 1
+        best = None
+        for index, n in shared.items():
+            if n < needed:
+                continue
+            candidate = self.words[index]
+            distance = edit_distance(word, candidate, limit)
+            if distance > limit:
+                continue
+            key = (distance, -self.counts[index], candidate)
+            if best is None or key < best:
+                best = key
+        return best[2] if best else None
+
+
+_matcher: tuple[int, int, FuzzyMatcher] | None = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher(index: suggest.SuggestIndex) -> FuzzyMatcher:
+    """Matcher for the current suggest index, rebuilt after the index changes."""
+    global _matcher
+    cached = _matcher
+    if cached is not None and cached[0] == id(index) and cached[1] == index.generation:
+        return cached[2]
+    with _matcher_lock, index.lock:
+        matcher = FuzzyMatcher(index.token_counts)
+        _matcher = (id(index), index.generation, matcher)
+    return matcher
+
+
+def correct(query: str) -> str | None:
+    """Rewrite ``query`` with unknown words replaced by their closest catalog words.
+
+    Returns ``None`` when nothing could be corrected.
+    """
+    index = suggest.get_index()
+    matcher = None
+    words = []
+    changed = False
+    for token in tokenize(query):
+        if index.knows_prefix(token):
+            words.append(token)
+            continue
+        replacement = None
+        alternative = transliterate(token)
+        if alternative != token and index.knows_prefix(alternative):
+            replacement = alternative
+        else:
+            if matcher is None:
+                matcher = get_matcher(index)
+            replacement = matcher.closest(token)
+            if replacement is None and alternative != token:
+                replacement = matcher.closest(alternative)
+        if replacement:
+            words.append(replacement)
+            changed = True
+    return " ".join(words) if changed else None
+
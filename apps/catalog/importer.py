@@ -0,0 +1,420 @@
+"""Bulk catalog import from supplier price lists (CSV, XLSX, JSONL).
+
+Rows are parsed lazily and written in chunks: one ``SELECT`` for the
+existing products of a chunk, ``bulk_create(update_conflicts=True)`` for
+new SKUs (a SKU inserted meanwhile by another writer only gets the columns
+its row provides), :func:`apps.catalog.bulk.update_products` (one
+executemany round trip) for the changed fields of known ones, and bulk
+inserts of the ``ProductChangeLog`` / ``PriceHistory`` rows the per-save
+signals would have written. ``save()`` is never called, so the derived
+data the Product signal handlers maintain is refreshed here once per
+chunk: search tokens, FTS rows, vehicle fitments, product codes, the
+suggest index, cached cards, the result-cache generations and the catalog
+version.
+
+Columns (English or Russian headers): ``sku`` (key), ``name``, ``price``,
+``description``, ``manufacturer``, ``in_stock``, ``category`` (slug or
+name of an existing category), ``images``, ``compatibility``. Missing
+columns leave existing values untouched, so a file with just ``sku`` and
+``price`` is a price update; new SKUs need ``name`` and ``price``. A new
+SKU without ``category`` is put into the category guessed from its name
+(``guess_category_slug``) when that category exists. Invalid rows are
+skipped and reported.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import IO, Iterable, Iterator
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .bulk import sync_derived_data, update_products
+from .models import (
+    PRODUCT_TRACKED_FIELDS,
+    RESERVED_PRODUCT_SLUGS,
+    Category,
+    PriceHistory,
+    Product,
+    ProductChangeLog,
+    guess_category_slug,
+    pick_images_for_name,
+    product_change_rows,
+)
+
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_FORMATS = ("csv", "xlsx", "jsonl")
+# Errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+HEADER_ALIASES = {
+    "артикул": "sku",
+    "название": "name",
+    "наименование": "name",
+    "цена": "price",
+    "описание": "description",
+    "производитель": "manufacturer",
+    "бренд": "manufacturer",
+    "остаток": "in_stock",
+    "наличие": "in_stock",
+    "категория": "category",
+    "изображения": "images",
+    "совместимость": "compatibility",
+}
+# Model fields an import can set (besides sku)
+UPSERT_FIELDS = ("name", "price", "description", "manufacturer", "in_stock", "category", "images", "compatibility")
+IMPORT_COLUMNS = ("sku", *UPSERT_FIELDS)
+# Fields feeding the search tokens, FTS rows, product codes and suggestions;
+# a price or stock update leaves those alone
+SEARCH_FIELDS = {"name", "description", "manufacturer", "category_id"}
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+class ImportFormatUnavailable(Exception):
+    """The file format needs an optional dependency that is not installed."""
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    # New products whose category was guessed from the name
+    categorized: int = 0
+    error_count: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self) -> str:
+        return (
+            f"{self.rows} rows in {self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/s): "
+            f"{self.created} created ({self.categorized} auto-categorized), {self.updated} updated, "
+            f"{self.unchanged} unchanged, {self.error_count} errors"
+        )
+
+
+# ---------------------- readers ----------------------
+def detect_format(filename: str) -> str:
+    fmt = os.path.splitext(filename)[1].lower().lstrip(".")
+    if fmt == "ndjson":
+        fmt = "jsonl"
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported file type: {filename!r} (expected {', '.join(IMPORT_FORMATS)})")
+    return fmt
+
+
+def _header(name) -> str:
+    key = str(name or "").strip().casefold()
+    return HEADER_ALIASES.get(key, key)
+
+
+def _read_csv(stream: IO[bytes]) -> Iterator[tuple[int, dict]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    first = text.readline()
+    try:
+        dialect = csv.Sniffer().sniff(first, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    header = [_header(name) for name in next(csv.reader([first], dialect))]
+    reader = csv.reader(text, dialect)
+    for values in reader:
+        if any(value.strip() for value in values):
+            yield reader.line_num + 1, dict(zip(header, values))
+
+
+def _read_jsonl(stream: IO[bytes]) -> Iterator[tuple[int, dict]]:
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield line_no, None
+            continue
+        yield line_no, {_header(key): value for key, value in data.items()} if isinstance(data, dict) else None
+
+
+def _read_xlsx(stream: IO[bytes]) -> Iterator[tuple[int, dict]]:
+    from openpyxl import load_workbook  # optional dependency, checked by the callers
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_header(name) for name in next(rows, ())]
+        for line_no, values in enumerate(rows, start=2):
+            if any(value not in (None, "") for value in values):
+                yield line_no, {key: value for key, value in zip(header, values) if value is not None}
+    finally:
+        workbook.close()
+
+
+def xlsx_supported() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def check_format(fmt: str) -> None:
+    """Raise :class:`ImportFormatUnavailable` if ``fmt`` cannot be read here."""
+    if fmt == "xlsx" and not xlsx_supported():
+        raise ImportFormatUnavailable("XLSX import needs openpyxl: pip install openpyxl")
+
+
+def read_rows(stream: IO[bytes], fmt: str) -> Iterator[tuple[int, dict | None]]:
+    """Yield ``(line number, row dict)``; ``None`` rows are unparseable lines."""
+    check_format(fmt)
+    return {"csv": _read_csv, "jsonl": _read_jsonl, "xlsx": _read_xlsx}[fmt](stream)
+
+
+# ---------------------- row cleaning ----------------------
+def _text(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def _price(value) -> Decimal:
+    raw = _text(value).replace("\xa0", "").replace(" ", "").replace(",", ".")
+    try:
+        price = Decimal(raw).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ImportRowError(f"invalid price {value!r}")
+    if not price.is_finite() or price < 0:
+        raise ImportRowError(f"invalid price {value!r}")
+    return price
+
+
+def _stock(value) -> int:
+    try:
+        stock = int(Decimal(_text(value) or "0"))
+    except (InvalidOperation, ValueError):
+        raise ImportRowError(f"invalid in_stock {value!r}")
+    if stock < 0:
+        raise ImportRowError(f"invalid in_stock {value!r}")
+    return stock
+
+
+def _images(value) -> list[str]:
+    # Same leniency as the admin form: JSON list, or URLs split by commas/newlines/"|"
+    if isinstance(value, str) and value.strip().startswith("["):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+    if isinstance(value, str):
+        value = value.replace("|", ",").replace("\n", ",").split(",")
+    if not isinstance(value, list):
+        raise ImportRowError("invalid images")
+    return [str(url).strip() for url in value if str(url).strip()]
+
+
+def _compatibility(value) -> list:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ImportRowError("compatibility must be a JSON list")
+    if not isinstance(value, list):
+        raise ImportRowError("compatibility must be a JSON list")
+    return value
+
+
+def clean_row(row: dict, categories: dict[str, int]) -> dict:
+    """Validated model values for the columns present in ``row`` (plus ``sku``)."""
+    sku = _text(row.get("sku"))
+    if not sku:
+        raise ImportRowError("sku is required")
+    if len(sku) > 100:
+        raise ImportRowError("sku is longer than 100 characters")
+    values: dict = {"sku": sku}
+    present = {key for key in IMPORT_COLUMNS if _text(row.get(key)) or isinstance(row.get(key), list)}
+    if "name" in present:
+        values["name"] = _text(row["name"])[:200]
+    if "description" in present:
+        values["description"] = _text(row["description"])
+    if "manufacturer" in present:
+        values["manufacturer"] = _text(row["manufacturer"])[:120]
+    if "price" in present:
+        values["price"] = _price(row["price"])
+    if "in_stock" in present:
+        values["in_stock"] = _stock(row["in_stock"])
+    if "category" in present:
+        key = _text(row["category"])
+        category_id = categories.get(key) or categories.get(key.casefold())
+        if category_id is None:
+            raise ImportRowError(f"unknown category {key!r}")
+        values["category_id"] = category_id
+    if "images" in present:
+        values["images"] = _images(row["images"])
+    if "compatibility" in present:
+        values["compatibility"] = _compatibility(row["compatibility"])
+    return values
+
+
+def _category_lookup(categories: Iterable[Category]) -> dict[str, int]:
+    lookup: dict[str, int] = {}
+    for category in categories:
+        lookup.setdefault(category.name.casefold(), category.pk)
+        lookup[category.slug] = category.pk
+    return lookup
+
+
+# ---------------------- writing ----------------------
+def _unique_slugs(products: list[Product]) -> None:
+    bases = {p.sku: (slugify(f"{p.name}-{p.sku}") or slugify(p.sku) or "product")[:200] for p in products}
+    taken = set(Product.objects.filter(slug__in=bases.values()).values_list("slug", flat=True))
+    taken.update(RESERVED_PRODUCT_SLUGS)
+    for p in products:
+        slug, n = bases[p.sku], 2
+        while slug in taken:
+            slug, n = f"{bases[p.sku]}-{n}", n + 1
+        taken.add(slug)
+        p.slug = slug
+
+
+def _write_chunk(rows: list[tuple[int, dict]], report: ImportReport, categories: dict[int, Category],
+                 user=None, reason: str = "import") -> None:
+    # Last row wins for a SKU repeated within the chunk
+    by_sku = {values["sku"]: (line, values) for line, values in rows}
+    existing = {p.sku: p for p in Product.objects.filter(sku__in=by_sku)}
+    category_ids = {category.slug: pk for pk, category in categories.items()}
+    now = timezone.now()
+
+    to_create: list[Product] = []
+    # Columns each new row provides, the only ones its upsert may overwrite
+    provided: dict[str, tuple[str, ...]] = {}
+    to_update: list[Product] = []
+    update_fields: set[str] = set()
+    previous: dict[int, dict] = {}
+    fitment_skus: set[str] = set()
+    reindex_skus: set[str] = set()
+    logs: list[ProductChangeLog] = []
+    prices: list[PriceHistory] = []
+
+    for sku, (line, values) in by_sku.items():
+        product = existing.get(sku)
+        if product is None:
+            provided[sku] = tuple(sorted(name for name in values if name != "sku"))
+            guessed = "category_id" not in values and "name" in values
+            if guessed:
+                category_id = category_ids.get(guess_category_slug(values["name"]))
+                if category_id is not None:
+                    values["category_id"] = category_id
+            missing = [name for name in ("name", "price", "category_id") if name not in values]
+            if missing:
+                report.add_error(line, f"new sku {sku!r} needs {', '.join(m.replace('_id', '') for m in missing)}")
+                continue
+            if guessed:
+                report.categorized += 1
+            values.setdefault("images", [])
+            if not values["images"]:
+                values["images"] = pick_images_for_name(values["name"])
+            to_create.append(Product(**values, created_at=now, updated_at=now))
+            fitment_skus.add(sku)
+            reindex_skus.add(sku)
+            continue
+
+        changed = [name for name, value in values.items() if name != "sku" and getattr(product, name) != value]
+        if not changed:
+            report.unchanged += 1
+            continue
+        previous[product.pk] = {"slug": product.slug, "category_id": product.category_id, "updated_at": product.updated_at}
+        changes = {name: (getattr(product, name), values[name]) for name in changed if name in PRODUCT_TRACKED_FIELDS}
+        product_logs, product_prices = product_change_rows(product.pk, changes, user, reason, now)
+        logs.extend(product_logs)
+        prices.extend(product_prices)
+        for name in changed:
+            setattr(product, name, values[name])
+        if "compatibility" in changed:
+            fitment_skus.add(sku)
+        if SEARCH_FIELDS.intersection(changed):
+            reindex_skus.add(sku)
+        product.updated_at = now
+        update_fields.update(changed)
+        to_update.append(product)
+
+    with transaction.atomic():
+        if to_create:
+            _unique_slugs(to_create)
+            # An upsert, in case another writer has inserted one of the SKUs since the SELECT
+            by_columns: dict[tuple[str, ...], list[Product]] = {}
+            for p in to_create:
+                by_columns.setdefault(provided[p.sku], []).append(p)
+            for columns, products in by_columns.items():
+                Product.objects.bulk_create(
+                    products, batch_size=500, update_conflicts=True, unique_fields=["sku"],
+                    update_fields=[*columns, "updated_at"],
+                )
+            if any(p.pk is None for p in to_create):
+                # Backends that do not return ids from bulk inserts
+                ids = dict(Product.objects.filter(sku__in=[p.sku for p in to_create]).values_list("sku", "id"))
+                for p in to_create:
+                    p.pk = ids[p.sku]
+        if to_update:
+            update_products(to_update, sorted(update_fields | {"updated_at"}))
+        ProductChangeLog.objects.bulk_create(logs, batch_size=500)
+        PriceHistory.objects.bulk_create(prices, batch_size=500)
+
+        written = to_create + to_update
+        reindex = [p for p in written if p.sku in reindex_skus]
+        for p in reindex:
+            p.category = categories[p.category_id]
+        sync_derived_data(
+            written, previous, reindex, [p for p in written if p.sku in fitment_skus],
+        )
+
+    report.created += len(to_create)
+    report.updated += len(to_update)
+
+
+def import_rows(rows: Iterable[tuple[int, dict | None]], chunk_size: int = IMPORT_CHUNK_SIZE,
+                user=None, reason: str = "import") -> ImportReport:
+    """Upsert products by SKU from ``(line number, row)`` pairs, ``chunk_size`` rows at a time."""
+    report = ImportReport()
+    started = time.perf_counter()
+    categories = Category.objects.in_bulk()
+    lookup = _category_lookup(categories.values())
+    chunk: list[tuple[int, dict]] = []
+    for line, row in rows:
+        report.rows += 1
+        if row is None:
+            report.add_error(line, "unreadable row")
+            continue
+        try:
+            chunk.append((line, clean_row(row, lookup)))
+        except ImportRowError as exc:
+            report.add_error(line, str(exc))
+            continue
+        if len(chunk) >= chunk_size:
+            _write_chunk(chunk, report, categories, user, reason)
+            chunk = []
+    if chunk:
+        _write_chunk(chunk, report, categories, user, reason)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def import_file(stream: IO[bytes], fmt: str, **kwargs) -> ImportReport:
+    return import_rows(read_rows(stream, fmt), **kwargs)
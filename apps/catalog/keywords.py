@@ -0,0 +1,82 @@
+"""Keyword matching over product names with an Aho–Corasick automaton.
+
+Tables such as ``KEYWORD_LABELS`` are lists of ``(keywords, value)`` groups
+in priority order: a name gets the value of the first group that has any
+keyword occurring in it. :class:`KeywordMatcher` compiles such a table once
+into a deterministic automaton (every state knows its next state for every
+character of the keywords' alphabet, and the best group ending at it), so a
+lookup is one dictionary step per character of the name, whatever the number
+of keywords. Matching is on case-folded substrings, like ``k in name.casefold()``.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Generic, Iterable, TypeVar
+
+
+T = TypeVar("T")
+
+_NO_MATCH = 1 << 30
+
+
+class KeywordMatcher(Generic[T]):
+    """First-priority keyword group occurring in a text."""
+
+    def __init__(self, groups: Iterable[tuple[Iterable[str], T]]):
+        self.values: list[T] = []
+        goto: list[dict[str, int]] = [{}]
+        priority = [_NO_MATCH]
+        for index, (keywords, value) in enumerate(groups):
+            self.values.append(value)
+            for keyword in keywords:
+                state = 0
+                for char in keyword.casefold():
+                    following = goto[state].get(char)
+                    if following is None:
+                        following = len(goto)
+                        goto[state][char] = following
+                        goto.append({})
+                        priority.append(_NO_MATCH)
+                    state = following
+                if state:
+                    priority[state] = min(priority[state], index)
+
+        # Breadth-first, so a state's failure state (always shallower) is complete
+        # before the state itself: inherit its transitions and its best match.
+        fail = [0] * len(goto)
+        delta: list[dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            parent_fail = fail[state]
+            delta[state] = {**delta[parent_fail], **goto[state]}
+            priority[state] = min(priority[state], priority[parent_fail])
+            for char, child in goto[state].items():
+                fail[child] = delta[parent_fail].get(char, 0)
+                queue.append(child)
+        # Renumber states so that the accepting ones come last: the scan then
+        # tells them apart with an integer comparison.
+        order = sorted(range(len(delta)), key=lambda state: priority[state] != _NO_MATCH)
+        number = {old: new for new, old in enumerate(order)}
+        self._delta = [{char: number[target] for char, target in delta[old].items()} for old in order]
+        self._priority = [priority[old] for old in order]
+        self._root = number[0]
+        self._first_accepting = sum(1 for value in priority if value == _NO_MATCH)
+
+    def match_index(self, text: str | None) -> int | None:
+        """Index of the first group with a keyword in ``text``, or ``None``."""
+        delta, priority, root, first_accepting = self._delta, self._priority, self._root, self._first_accepting
+        best = _NO_MATCH
+        state = root
+        for char in (text or "").casefold():
+            state = delta[state].get(char, root)
+            if state >= first_accepting and priority[state] < best:
+                best = priority[state]
+                if not best:
+                    break
+        return None if best == _NO_MATCH else best
+
+    def match(self, text: str | None, default: T | None = None) -> T | None:
+        """Value of the first group with a keyword in ``text``, or ``default``."""
+        index = self.match_index(text)
+        return default if index is None else self.values[index]
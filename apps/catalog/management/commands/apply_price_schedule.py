@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.catalog.pricing import apply_scheduled_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply scheduled price changes that are due. Run from cron, or keep it running with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running and check for due changes periodically")
+        parser.add_argument("--interval", type=int, default=60, help="Seconds between checks with --loop. Default: 60")
+
+    def run_once(self):
+        started = time.perf_counter()
+        result = apply_scheduled_changes()
+        if result.applied or not self.loop:
+            self.stdout.write(
+                f"Changes applied: {result.applied}, products: {result.products}, "
+                f"prices changed: {result.changed}, skipped: {result.skipped} "
+                f"({time.perf_counter() - started:.2f}s)"
+            )
+
+    def handle(self, *args, **options):
+        self.loop = options["loop"]
+        if not self.loop:
+            self.run_once()
+            return
+        try:
+            while True:
+                self.run_once()
+                time.sleep(max(options["interval"], 1))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
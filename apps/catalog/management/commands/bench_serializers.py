@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from apps.catalog.models import Product
+from apps.catalog.serializers import PRODUCT_ROW_FIELDS, ProductSerializer, serialize_product_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ProductSerializer with the .values() listing path on a page of products: "
+        "per-item cost of serialization alone and of fetch + serialize + render. "
+        "Also checks that both produce byte-identical JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100, help="Products per page. Default: 100")
+        parser.add_argument("--rounds", type=int, default=200, help="Timed rounds per variant. Default: 200")
+
+    def _time(self, fn, rounds: int) -> float:
+        samples = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples)
+
+    def handle(self, *args, **options):
+        items, rounds = options["items"], options["rounds"]
+        ids = list(Product.objects.order_by("name").values_list("id", flat=True)[:items])
+        if not ids:
+            raise CommandError("No products in the database; run seed_demo first.")
+        page = Product.objects.select_related("category").filter(id__in=ids).order_by("name")
+        renderer = JSONRenderer()
+
+        instances = list(page)
+        rows = list(page.values(*PRODUCT_ROW_FIELDS))
+        drf_bytes = renderer.render(ProductSerializer(instances, many=True).data)
+        fast_bytes = renderer.render(serialize_product_rows(rows))
+        if drf_bytes != fast_bytes:
+            raise CommandError("Outputs differ: serialize_product_rows does not match ProductSerializer")
+
+        results = [
+            ("serialize: ProductSerializer", self._time(lambda: ProductSerializer(instances, many=True).data, rounds)),
+            ("serialize: serialize_product_rows", self._time(lambda: serialize_product_rows(rows), rounds)),
+            ("end to end: ProductSerializer", self._time(
+                lambda: renderer.render(ProductSerializer(list(page.all()), many=True).data), rounds)),
+            ("end to end: serialize_product_rows", self._time(
+                lambda: renderer.render(serialize_product_rows(page.values(*PRODUCT_ROW_FIELDS))), rounds)),
+        ]
+        n = len(ids)
+        self.stdout.write(f"{n} products, {len(fast_bytes)} bytes of JSON, identical output: yes")
+        for label, seconds in results:
+            self.stdout.write(f"{label:<38} {seconds * 1000:8.3f} ms/page {seconds / n * 1e6:9.2f} us/item")
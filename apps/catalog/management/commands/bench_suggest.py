@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.catalog.suggest import SuggestIndex
+from apps.catalog.management.commands.diversify_catalog import PART_TYPES
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark search suggestions on a synthetic catalog (no database access): "
+        "index build time and p50/p99 lookup latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000, help="Synthetic products. Default: 100000")
+        parser.add_argument("--queries", type=int, default=5_000, help="Lookups to time. Default: 5000")
+        parser.add_argument("--limit", type=int, default=8, help="Suggestions per group. Default: 8")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed. Default: 42")
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        count = options["products"]
+        products = []
+        for i in range(count):
+            tpl, _cat, brands = rnd.choice(PART_TYPES)
+            brand = rnd.choice(brands)
+            name = tpl.format(brand=brand, code=rnd.randint(100, 99999))
+            products.append((i + 1, name, f"p-{i}", f"{brand[:3].upper()}-{rnd.randint(10000, 999999)}", brand))
+        categories = [(i, name, f"c-{i}") for i, name in enumerate(
+            ["Фильтры", "Тормозная система", "Подвеска", "Электрика", "Масла и жидкости", "Система охлаждения"]
+        )]
+
+        started = time.perf_counter()
+        index = SuggestIndex.build(products, categories)
+        build_s = time.perf_counter() - started
+
+        words = [w for _, name, _, sku, brand in products[:2000] for w in (name + " " + sku + " " + brand).split()]
+        queries = []
+        for _ in range(options["queries"]):
+            word = rnd.choice(words)
+            prefix = word[: rnd.randint(1, max(1, len(word)))]
+            if rnd.random() < 0.3:
+                prefix = f"{rnd.choice(words)} {prefix}"
+            queries.append(prefix)
+
+        timings = []
+        for q in queries:
+            t0 = time.perf_counter_ns()
+            index.suggest(q, limit=options["limit"])
+            timings.append((time.perf_counter_ns() - t0) / 1_000_000)
+        timings.sort()
+        p50 = statistics.median(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+        self.stdout.write(f"Products: {count}; index build: {build_s:.2f}s")
+        self.stdout.write(f"Queries: {len(timings)}; mean: {statistics.fmean(timings):.3f} ms")
+        self.stdout.write(self.style.SUCCESS(f"p50: {p50:.3f} ms; p99: {p99:.3f} ms; max: {timings[-1]:.3f} ms"))
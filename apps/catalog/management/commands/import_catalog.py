@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.catalog.importer import (
+    IMPORT_CHUNK_SIZE,
+    IMPORT_FORMATS,
+    ImportFormatUnavailable,
+    check_format,
+    detect_format,
+    import_file,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import products from a supplier price list (CSV, XLSX or JSONL), upserting by SKU "
+        "in batches. Columns missing from the file leave existing values untouched. "
+        "XLSX needs openpyxl."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="Default: from the file extension")
+        parser.add_argument(
+            "--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+            help=f"Rows written per batch. Default: {IMPORT_CHUNK_SIZE}",
+        )
+        parser.add_argument("--reason", default="import", help="Reason stored in the price history. Default: import")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            fmt = options["format"] or detect_format(path)
+            check_format(fmt)
+        except (ValueError, ImportFormatUnavailable) as exc:
+            raise CommandError(str(exc))
+        try:
+            with open(path, "rb") as stream:
+                report = import_file(stream, fmt, chunk_size=options["chunk_size"], reason=options["reason"])
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+        for line, message in report.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"... {report.error_count - len(report.errors)} more errors")
+        style = self.style.WARNING if report.error_count else self.style.SUCCESS
+        self.stdout.write(style(report.summary()))
@@ -0,0 +1,210 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:08
+
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of apps.catalog.search.product_tokens as of this migration;
+# later tokenizer changes are applied with ``manage.py rebuild_search_index``
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def product_tokens(*texts):
+    tokens = set()
+    for text in texts:
+        tokens.update(t[:64] for t in WORD_RE.findall((text or '').casefold().replace('ё', 'е')))
+    return tokens
+
+
+def build_search_index(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    SearchToken = apps.get_model('catalog', 'SearchToken')
+    rows = []
+    for p in Product.objects.select_related('category').order_by('pk').iterator(chunk_size=500):
+        category_name = p.category.name if p.category_id else ''
+        for token in product_tokens(p.name, p.description, p.sku, p.manufacturer, category_name):
+            rows.append(SearchToken(product_id=p.pk, token=token))
+        if len(rows) >= 5000:
+            SearchToken.objects.bulk_create(rows, batch_size=500)
+            rows = []
+    SearchToken.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'ordering': ['name'], 'verbose_name': 'Категория', 'verbose_name_plural': 'Категории'},
+        ),
+        migrations.AlterModelOptions(
+            name='pricehistory',
+            options={'ordering': ['-changed_at'], 'verbose_name': 'История цены', 'verbose_name_plural': 'История цен'},
+        ),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'ordering': ['name'], 'verbose_name': 'Товар', 'verbose_name_plural': 'Товары'},
+        ),
+        migrations.AlterModelOptions(
+            name='productchangelog',
+            options={'ordering': ['-changed_at'], 'verbose_name': 'Изменение товара', 'verbose_name_plural': 'Изменения товара'},
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(max_length=120, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=140, unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AlterField(
+            model_name='pricehistory',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения'),
+        ),
+        migrations.AlterField(
+            model_name='pricehistory',
+            name='changed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_changes', to=settings.AUTH_USER_MODEL, verbose_name='Кем изменено'),
+        ),
+        migrations.AlterField(
+            model_name='pricehistory',
+            name='new_price',
+            field=models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Новая цена'),
+        ),
+        migrations.AlterField(
+            model_name='pricehistory',
+            name='old_price',
+            field=models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Старая цена'),
+        ),
+        migrations.AlterField(
+            model_name='pricehistory',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='catalog.product', verbose_name='Товар'),
+        ),
+        migrations.AlterField(
+            model_name='pricehistory',
+            name='reason',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Причина'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='products', to='catalog.category', verbose_name='Категория'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='compatibility',
+            field=models.JSONField(blank=True, default=list, help_text='Список объектов {make, model, year}', verbose_name='Совместимость'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='description',
+            field=models.TextField(blank=True, verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='images',
+            field=models.JSONField(blank=True, default=list, verbose_name='Изображения'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='in_stock',
+            field=models.PositiveIntegerField(default=0, verbose_name='Остаток на складе'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='manufacturer',
+            field=models.CharField(blank=True, max_length=120, verbose_name='Производитель'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='name',
+            field=models.CharField(max_length=200, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Цена'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Артикул'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(max_length=220, unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        migrations.AlterField(
+            model_name='productchangelog',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения'),
+        ),
+        migrations.AlterField(
+            model_name='productchangelog',
+            name='changed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='product_changes', to=settings.AUTH_USER_MODEL, verbose_name='Кем изменено'),
+        ),
+        migrations.AlterField(
+            model_name='productchangelog',
+            name='field',
+            field=models.CharField(max_length=120, verbose_name='Поле'),
+        ),
+        migrations.AlterField(
+            model_name='productchangelog',
+            name='new_value',
+            field=models.TextField(blank=True, verbose_name='Новое значение'),
+        ),
+        migrations.AlterField(
+            model_name='productchangelog',
+            name='old_value',
+            field=models.TextField(blank=True, verbose_name='Старое значение'),
+        ),
+        migrations.AlterField(
+            model_name='productchangelog',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='change_logs', to='catalog.product', verbose_name='Товар'),
+        ),
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, verbose_name='Токен')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Поисковый токен',
+                'verbose_name_plural': 'Поисковые токены',
+                'indexes': [models.Index(fields=['token', 'product'], name='catalog_searchtoken_token_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
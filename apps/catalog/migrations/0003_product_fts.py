@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_fts_table(apps, schema_editor):
+    from apps.catalog import fts
+
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(fts.CREATE_TABLE_SQL)
+    except OperationalError:
+        # SQLite built without FTS5: search keeps using the token index
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"{fts._INSERT_SQL}{fts._SELECT_ROWS_SQL}")
+
+
+def drop_fts_table(apps, schema_editor):
+    from apps.catalog import fts
+
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {fts.FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_searchtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
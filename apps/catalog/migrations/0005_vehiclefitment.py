@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_fitments(apps, schema_editor):
+    from apps.catalog.compatibility import fitment_rows
+
+    Product = apps.get_model('catalog', 'Product')
+    VehicleFitment = apps.get_model('catalog', 'VehicleFitment')
+    rows = []
+    for product_id, compatibility in Product.objects.values_list('id', 'compatibility').iterator(chunk_size=500):
+        rows.extend(VehicleFitment(product_id=product_id, **row) for row in fitment_rows(compatibility))
+    VehicleFitment.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleFitment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('make', models.CharField(max_length=60, verbose_name='Марка')),
+                ('model', models.CharField(blank=True, max_length=60, verbose_name='Модель')),
+                ('year', models.PositiveIntegerField(blank=True, help_text='Пусто — подходит для всех годов', null=True, verbose_name='Год')),
+                ('make_key', models.CharField(max_length=60, verbose_name='Марка (ключ)')),
+                ('model_key', models.CharField(blank=True, max_length=60, verbose_name='Модель (ключ)')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fitments', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Применимость',
+                'verbose_name_plural': 'Применимость',
+                'indexes': [models.Index(fields=['make_key', 'model_key', 'year', 'product'], name='catalog_fitment_vehicle_idx')],
+            },
+        ),
+        migrations.RunPython(build_fitments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_codes(apps, schema_editor):
+    from apps.catalog.codes import product_codes
+
+    Product = apps.get_model('catalog', 'Product')
+    ProductCode = apps.get_model('catalog', 'ProductCode')
+    rows = []
+    for product_id, name, sku in Product.objects.values_list('id', 'name', 'sku').iterator(chunk_size=500):
+        rows.extend(ProductCode(product_id=product_id, code=code, kind=kind) for code, kind in product_codes(name, sku))
+    ProductCode.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_vehiclefitment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=100, verbose_name='Код')),
+                ('kind', models.CharField(choices=[('sku', 'Артикул'), ('oem', 'OEM-номер')], default='sku', max_length=8, verbose_name='Тип')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codes', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Код товара',
+                'verbose_name_plural': 'Коды товаров',
+                'indexes': [models.Index(fields=['code', 'product'], name='catalog_productcode_code_idx')],
+            },
+        ),
+        migrations.RunPython(build_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_productcode'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledPriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('price', 'Новая цена'), ('percent', 'Изменение, %')], default='price', max_length=8, verbose_name='Тип')),
+                ('value', models.DecimalField(decimal_places=2, help_text='Новая цена в рублях или процент изменения (например -15)', max_digits=12, verbose_name='Значение')),
+                ('effective_at', models.DateTimeField(verbose_name='Вступает в силу')),
+                ('reason', models.CharField(blank=True, max_length=255, verbose_name='Причина')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('applied_at', models.DateTimeField(blank=True, null=True, verbose_name='Применено')),
+                ('category', models.ForeignKey(blank=True, help_text='Изменение для всех товаров категории', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_prices', to='catalog.category', verbose_name='Категория')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scheduled_price_changes', to=settings.AUTH_USER_MODEL, verbose_name='Кем запланировано')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_prices', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Запланированное изменение цены',
+                'verbose_name_plural': 'Запланированные изменения цен',
+                'ordering': ['effective_at', 'id'],
+                'indexes': [models.Index(fields=['applied_at', 'effective_at'], name='catalog_schedprice_due_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('category__isnull', True), ('product__isnull', False)), models.Q(('category__isnull', False), ('product__isnull', True)), _connector='OR'), name='catalog_schedprice_one_scope')],
+            },
+        ),
+    ]
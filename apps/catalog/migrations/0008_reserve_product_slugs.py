@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:42
+
+import apps.catalog.models
+from django.db import migrations, models
+
+
+def rename_reserved_slugs(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    for product in Product.objects.filter(slug__in=['batch']):
+        slug = f'{product.slug}-{product.pk}'
+        while Product.objects.filter(slug=slug).exists():
+            slug = f'{slug}-{product.pk}'
+        Product.objects.filter(pk=product.pk).update(slug=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_scheduledpricechange'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(max_length=220, unique=True, validators=[apps.catalog.models.validate_product_slug], verbose_name='Слаг'),
+        ),
+        migrations.RunPython(rename_reserved_slugs, migrations.RunPython.noop),
+    ]
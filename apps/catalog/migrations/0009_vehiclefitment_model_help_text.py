@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_reserve_product_slugs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vehiclefitment',
+            name='model',
+            field=models.CharField(blank=True, help_text='Пусто — подходит для всех моделей марки', max_length=60, verbose_name='Модель'),
+        ),
+    ]
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import copy
 import random
 from urllib.parse import quote
 from django.conf import settings
-from django.db import models
-from django.db.models.signals import pre_save, post_save
+from django.db import models, transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils.text import slugify
 from django.utils import timezone
 
+from .keywords import KeywordMatcher
+
 
 class Category(models.Model):
     name = models.CharField("Название", max_length=120)
@@ -23,6 +26,19 @@ class Category(models.Model):
     def __str__(self) -> str:  # pragma: no cover - trivial
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The loaded slug, so that saves know the previous one without a SELECT
+        if "slug" in instance.__dict__:
+            instance._loaded_slug = instance.slug
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if "slug" in self.__dict__ and (fields is None or "slug" in fields):
+            self._loaded_slug = self.slug
+
 # Labels per keyword group (for building a guaranteed-correct placeholder image)
 KEYWORD_LABELS = [
     (['масляный фильтр', 'фильтр масляный', 'oil filter'], 'Масляный фильтр'),
@@ -41,10 +57,50 @@ KEYWORD_LABELS = [
     (['радиатор', 'радиатор охлаждения', 'радиатор двигателя', 'radiator'], 'Радиатор охлаждения'),
 ]
 
+# Category slug guessed from a product name (the demo categories); filters come
+# first so that "масляный фильтр" is not taken for oil
+KEYWORD_CATEGORIES = [
+    (['фильтр', 'filter'], 'filtry'),
+    (['тормоз', 'колодк', 'brake'], 'tormoza'),
+    (['амортизатор', 'стойка', 'ремень', 'грм', 'shock absorber', 'timing belt'], 'podveska'),
+    (['аккумулятор', 'акб', 'свеч', 'стартер', 'генератор', 'альтернатор', 'щетк', 'щётк', 'дворник',
+      'battery', 'spark plug', 'starter', 'alternator', 'wiper'], 'elektrika'),
+    (['масло', 'антифриз', 'тосол', 'жидкость', 'engine oil', '5w-', '5w3', '5w4'], 'masla'),
+    (['термостат', 'радиатор', 'помпа', 'thermostat', 'radiator'], 'cooling'),
+]
+
+
+# Product fields recorded in ProductChangeLog when they change
+PRODUCT_TRACKED_FIELDS = (
+    "name",
+    "description",
+    "manufacturer",
+    "price",
+    "in_stock",
+    "images",
+    "compatibility",
+    "category_id",
+)
+
+
+# Loaded values kept on Product instances, so saves detect changes without a SELECT
+PRODUCT_SNAPSHOT_FIELDS = PRODUCT_TRACKED_FIELDS + ("slug", "updated_at")
+
+
+# Product slugs taken by API routes under /api/products/
+RESERVED_PRODUCT_SLUGS = frozenset({"batch"})
+
+
+def validate_product_slug(value: str) -> None:
+    from django.core.exceptions import ValidationError
+
+    if value in RESERVED_PRODUCT_SLUGS:
+        raise ValidationError(f"Слаг «{value}» зарезервирован.")
+
 
 class Product(models.Model):
     name = models.CharField("Название", max_length=200)
-    slug = models.SlugField("Слаг", max_length=220, unique=True)
+    slug = models.SlugField("Слаг", max_length=220, unique=True, validators=[validate_product_slug])
     sku = models.CharField("Артикул", max_length=100, unique=True)
     description = models.TextField("Описание", blank=True)
     manufacturer = models.CharField("Производитель", max_length=120, blank=True)
@@ -60,10 +116,113 @@ class Product(models.Model):
         ordering = ["name"]
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
+        # (sort key, id) indexes back keyset pagination of the catalog
+        indexes = [
+            models.Index(fields=["name", "id"], name="catalog_product_name_id_idx"),
+            models.Index(fields=["price", "id"], name="catalog_product_price_id_idx"),
+            models.Index(fields=["created_at", "id"], name="catalog_product_created_id_idx"),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return f"{self.name} ({self.sku})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot = instance.snapshot_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Reloaded values are the new baseline, so changes made by others
+        # in the meantime are not logged as this instance's changes
+        if fields is None:
+            names = PRODUCT_SNAPSHOT_FIELDS
+        else:
+            requested = set(fields)
+            names = [name for name in PRODUCT_SNAPSHOT_FIELDS if {name, name.removesuffix("_id")} & requested]
+        self._snapshot = {**(getattr(self, "_snapshot", None) or {}), **self.snapshot_values(names)}
+
+    def snapshot_values(self, fields=PRODUCT_SNAPSHOT_FIELDS) -> dict:
+        """Current values of the loaded (non-deferred) snapshot fields."""
+        values = {}
+        for name in fields:
+            if name in self.__dict__:
+                value = self.__dict__[name]
+                # JSON values are copied so in-place edits still show up as changes
+                values[name] = copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+        return values
+
+    def changed_fields(self, update_fields=None) -> dict:
+        """``{field: (old, new)}`` for tracked fields that differ from the snapshot."""
+        snapshot = getattr(self, "_snapshot", None) or {}
+        changes = {}
+        for name in PRODUCT_TRACKED_FIELDS:
+            if name not in snapshot or name not in self.__dict__:
+                continue
+            if update_fields is not None and not {name, name.removesuffix("_id")} & set(update_fields):
+                continue
+            if snapshot[name] != self.__dict__[name]:
+                changes[name] = (snapshot[name], self.__dict__[name])
+        return changes
+
+
+class SearchToken(models.Model):
+    """Inverted index row: one casefolded word token of a product."""
+
+    product = models.ForeignKey(Product, verbose_name="Товар", on_delete=models.CASCADE, related_name="search_tokens")
+    token = models.CharField("Токен", max_length=64)
+
+    class Meta:
+        verbose_name = "Поисковый токен"
+        verbose_name_plural = "Поисковые токены"
+        indexes = [models.Index(fields=["token", "product"], name="catalog_searchtoken_token_idx")]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return self.token
+
+
+class VehicleFitment(models.Model):
+    """Normalized row of ``Product.compatibility`` used for vehicle filters."""
+
+    product = models.ForeignKey(Product, verbose_name="Товар", on_delete=models.CASCADE, related_name="fitments")
+    make = models.CharField("Марка", max_length=60)
+    model = models.CharField("Модель", max_length=60, blank=True, help_text="Пусто — подходит для всех моделей марки")
+    year = models.PositiveIntegerField("Год", null=True, blank=True, help_text="Пусто — подходит для всех годов")
+    make_key = models.CharField("Марка (ключ)", max_length=60)
+    model_key = models.CharField("Модель (ключ)", max_length=60, blank=True)
+
+    class Meta:
+        verbose_name = "Применимость"
+        verbose_name_plural = "Применимость"
+        indexes = [
+            models.Index(fields=["make_key", "model_key", "year", "product"], name="catalog_fitment_vehicle_idx"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        y = f" {self.year}" if self.year else ""
+        return f"{self.make} {self.model}{y}"
+
+
+class ProductCode(models.Model):
+    """Article number of a product with separators stripped and case folded."""
+
+    KIND_SKU = "sku"
+    KIND_OEM = "oem"
+    KIND_CHOICES = [(KIND_SKU, "Артикул"), (KIND_OEM, "OEM-номер")]
+
+    product = models.ForeignKey(Product, verbose_name="Товар", on_delete=models.CASCADE, related_name="codes")
+    code = models.CharField("Код", max_length=100)
+    kind = models.CharField("Тип", max_length=8, choices=KIND_CHOICES, default=KIND_SKU)
+
+    class Meta:
+        verbose_name = "Код товара"
+        verbose_name_plural = "Коды товаров"
+        indexes = [models.Index(fields=["code", "product"], name="catalog_productcode_code_idx")]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return self.code
+
 
 class PriceHistory(models.Model):
     product = models.ForeignKey(Product, verbose_name="Товар", on_delete=models.CASCADE, related_name="price_history")
@@ -113,11 +272,71 @@ class ProductChangeLog(models.Model):
         return f"{self.product} | {self.field}: {self.old_value} -> {self.new_value}"
 
 
+class ScheduledPriceChange(models.Model):
+    """Price change planned for ``effective_at``; applied by the ``apply_price_schedule`` command."""
+
+    KIND_PRICE = "price"
+    KIND_PERCENT = "percent"
+    KIND_CHOICES = [(KIND_PRICE, "Новая цена"), (KIND_PERCENT, "Изменение, %")]
+
+    product = models.ForeignKey(
+        Product, verbose_name="Товар", null=True, blank=True, on_delete=models.CASCADE,
+        related_name="scheduled_prices",
+    )
+    category = models.ForeignKey(
+        Category, verbose_name="Категория", null=True, blank=True, on_delete=models.CASCADE,
+        related_name="scheduled_prices", help_text="Изменение для всех товаров категории",
+    )
+    kind = models.CharField("Тип", max_length=8, choices=KIND_CHOICES, default=KIND_PRICE)
+    value = models.DecimalField("Значение", max_digits=12, decimal_places=2,
+                                help_text="Новая цена в рублях или процент изменения (например -15)")
+    effective_at = models.DateTimeField("Вступает в силу")
+    reason = models.CharField("Причина", max_length=255, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name="Кем запланировано",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="scheduled_price_changes",
+    )
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    applied_at = models.DateTimeField("Применено", null=True, blank=True)
+
+    class Meta:
+        ordering = ["effective_at", "id"]
+        verbose_name = "Запланированное изменение цены"
+        verbose_name_plural = "Запланированные изменения цен"
+        indexes = [models.Index(fields=["applied_at", "effective_at"], name="catalog_schedprice_due_idx")]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(product__isnull=False, category__isnull=True)
+                | models.Q(product__isnull=True, category__isnull=False),
+                name="catalog_schedprice_one_scope",
+            ),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        target = self.product or self.category
+        change = f"{self.value} ₽" if self.kind == self.KIND_PRICE else f"{self.value:+}%"
+        return f"{target}: {change} с {self.effective_at:%d.%m.%Y %H:%M}"
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if (self.product_id is None) == (self.category_id is None):
+            raise ValidationError("Укажите либо товар, либо категорию.")
+        if self.kind == self.KIND_PRICE and self.value is not None and self.value <= 0:
+            raise ValidationError({"value": "Цена должна быть больше нуля."})
+
+
 # Signals to auto-fill slug and record changes
 @receiver(pre_save, sender=Product)
 def set_slug_on_product(sender, instance: Product, **kwargs):
     if not instance.slug:
         instance.slug = slugify(instance.name)
+        if instance.slug in RESERVED_PRODUCT_SLUGS:
+            instance.slug = f"{instance.slug}-{slugify(instance.sku)}"
 
 
 @receiver(pre_save, sender=Category)
@@ -221,30 +440,35 @@ KEYWORD_IMAGES = [
 ]
 
 
+# Keyword tables compiled once; see apps.catalog.keywords
+LABEL_MATCHER = KeywordMatcher(KEYWORD_LABELS)
+IMAGE_MATCHER = KeywordMatcher(KEYWORD_IMAGES)
+CATEGORY_MATCHER = KeywordMatcher(KEYWORD_CATEGORIES)
+
+
 def _match_label(name: str) -> str | None:
-    text = (name or '').casefold()
-    for keywords, label in KEYWORD_LABELS:
-        if any(k in text for k in keywords):
-            return label
-    return None
+    return LABEL_MATCHER.match(name)
+
+
+def guess_category_slug(name: str) -> str | None:
+    """Slug of the category a product called ``name`` most likely belongs to."""
+    return CATEGORY_MATCHER.match(name)
 
 
 def pick_images_for_name(name: str) -> list[str]:
-    text = (name or '').casefold()
     result: list[str] = []
     label = _match_label(name)
     if label:
         # Build a guaranteed-correct placeholder as the first image
         placeholder = f"https://via.placeholder.com/800x600.png?text={quote(label)}"
         result.append(placeholder)
-    for keywords, imgs in KEYWORD_IMAGES:
-        if any(k in text for k in keywords):
-            # return 1-2 curated images for variety
-            if len(imgs) > 1:
-                result.extend(random.sample(imgs, k=min(2, len(imgs))))
-            else:
-                result.extend(imgs)
-            break
+    imgs = IMAGE_MATCHER.match(name)
+    if imgs:
+        # return 1-2 curated images for variety
+        if len(imgs) > 1:
+            result.extend(random.sample(imgs, k=min(2, len(imgs))))
+        else:
+            result.extend(imgs)
     return result
 
 
@@ -269,64 +493,224 @@ def ensure_images_by_name(sender, instance: Product, **kwargs):
 
 
 @receiver(pre_save, sender=Product)
-def capture_original_product(sender, instance: Product, **kwargs):
-    # Stash original values on the instance to compare in post_save
-    if instance.pk:
-        try:
-            original = Product.objects.get(pk=instance.pk)
-            instance._original = {
-                "name": original.name,
-                "description": original.description,
-                "manufacturer": original.manufacturer,
-                "price": original.price,
-                "in_stock": original.in_stock,
-                "images": original.images,
-                "compatibility": original.compatibility,
-                "category_id": original.category_id,
-            }
-        except Product.DoesNotExist:  # pragma: no cover - defensive
-            instance._original = {}
-    else:
+def capture_original_product(sender, instance: Product, update_fields=None, **kwargs):
+    # Compare against the values loaded with the instance; only instances
+    # built by hand with an existing pk need a SELECT
+    if not instance.pk:
         instance._original = {}
+        instance._changes = {}
+        return
+    if getattr(instance, "_snapshot", None) is None:
+        instance._snapshot = Product.objects.filter(pk=instance.pk).values(*PRODUCT_SNAPSHOT_FIELDS).first() or {}
+    instance._original = instance._snapshot
+    instance._changes = instance.changed_fields(update_fields)
+
+
+def product_change_rows(product_id: int, changes: dict, changed_by=None, reason: str = "manual change",
+                        changed_at=None) -> tuple[list[ProductChangeLog], list[PriceHistory]]:
+    """Unsaved ProductChangeLog/PriceHistory rows for ``{field: (old, new)}`` changes."""
+    changed_at = changed_at or timezone.now()
+    changed_by_id = getattr(changed_by, "pk", changed_by)
+    logs = [
+        ProductChangeLog(product_id=product_id, field=field, old_value=str(old), new_value=str(new),
+                         changed_by_id=changed_by_id, changed_at=changed_at)
+        for field, (old, new) in changes.items()
+    ]
+    prices = []
+    if "price" in changes:
+        old, new = changes["price"]
+        prices.append(PriceHistory(product_id=product_id, old_price=old if old is not None else new, new_price=new,
+                                   reason=reason[:255], changed_by_id=changed_by_id, changed_at=changed_at))
+    return logs, prices
 
 
 @receiver(post_save, sender=Product)
 def log_product_changes(sender, instance: Product, created: bool, **kwargs):
     # No logging on create
+    changes = getattr(instance, "_changes", None)
+    if created or not changes:
+        return
+    # ``_changed_by`` / ``_change_reason`` may be set by the caller (e.g. the admin)
+    logs, prices = product_change_rows(
+        instance.pk, changes, getattr(instance, "_changed_by", None),
+        getattr(instance, "_change_reason", "manual change"),
+    )
+    ProductChangeLog.objects.bulk_create(logs)
+    if prices:
+        PriceHistory.objects.bulk_create(prices)
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance: Product, raw: bool = False, **kwargs):
+    if raw:
+        return
+    from . import fts
+    from .search import index_products
+
+    index_products([instance])
+    fts.index_products([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def update_vehicle_fitments(sender, instance: Product, created: bool, raw: bool = False, **kwargs):
+    if raw:
+        return
     original = getattr(instance, "_original", {}) or {}
-    if created or not original:
+    if not created and original and "compatibility" not in getattr(instance, "_changes", {}):
         return
+    from .compatibility import sync_fitments
 
-    # Track selected fields
-    fields_to_track = [
-        "name",
-        "description",
-        "manufacturer",
-        "price",
-        "in_stock",
-        "images",
-        "compatibility",
-        "category_id",
-    ]
+    sync_fitments([instance])
+
+
+@receiver(post_save, sender=Product)
+def update_product_codes(sender, instance: Product, raw: bool = False, **kwargs):
+    if raw:
+        return
+    from .codes import sync_codes
+
+    sync_codes([instance])
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_vehicle_sets_on_delete(sender, instance: Product, **kwargs):
+    from .compatibility import fitment_rows, invalidate_vehicle_sets
+
+    invalidate_vehicle_sets((row["make_key"], row["model_key"]) for row in fitment_rows(instance.compatibility))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance: Product, **kwargs):
+    # Token rows go away with the FK cascade; the FTS table has no FK
+    from . import fts
+
+    fts.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_index(sender, instance: Category, created: bool, raw: bool = False, **kwargs):
+    if raw or created:
+        return
+    from . import fts
+    from .search import index_category
+
+    index_category(instance)
+    fts.index_category(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def update_suggest_index(sender, instance: Product, raw: bool = False, **kwargs):
+    if raw:
+        return
+    from . import suggest
+
+    suggest.product_changed(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_suggest_index(sender, instance: Product, **kwargs):
+    from . import suggest
+
+    suggest.product_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def update_category_suggest_index(sender, instance: Category, raw: bool = False, **kwargs):
+    if raw:
+        return
+    from . import suggest
+
+    suggest.category_changed(instance)
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_from_suggest_index(sender, instance: Category, **kwargs):
+    from . import suggest
 
-    for field in fields_to_track:
-        old = original.get(field)
-        new = getattr(instance, field if field != "category_id" else "category_id")
-        if old != new:
-            ProductChangeLog.objects.create(
-                product=instance,
-                field=field,
-                old_value=str(old),
-                new_value=str(new),
-            )
-
-    # Special case: price history
-    if original.get("price") != instance.price:
-        PriceHistory.objects.create(
-            product=instance,
-            old_price=original.get("price") or instance.price,
-            new_price=instance.price,
-            reason="manual change",
-        )
-
-# Create your models here.
+    suggest.category_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_catalog_version_on_change(sender, instance, raw: bool = False, **kwargs):
+    if raw:
+        return
+    from . import suggest
+    from .cache import bump_catalog_version
+
+    changed = {"products" if sender is Product else "categories": [instance.pk]}
+    # After commit, so that processes re-reading the changed rows see them
+    transaction.on_commit(lambda: suggest.catalog_bumped(bump_catalog_version(**changed)))
+
+
+@receiver(pre_save, sender=Category)
+def capture_original_category_slug(sender, instance: Category, **kwargs):
+    # Like capture_original_product: only instances built by hand with an
+    # existing pk (or a deferred slug) need a SELECT
+    instance._original_slug = None
+    if instance.pk:
+        if not hasattr(instance, "_loaded_slug"):
+            instance._loaded_slug = Category.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+        instance._original_slug = instance._loaded_slug
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_slug_snapshot(sender, instance: Category, update_fields=None, **kwargs):
+    if update_fields is None or "slug" in update_fields:
+        instance._loaded_slug = instance.slug
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_results(sender, instance: Product, raw: bool = False, **kwargs):
+    if raw:
+        return
+    from .result_cache import invalidate_product
+
+    original = getattr(instance, "_original", {}) or {}
+    invalidate_product(instance, original.get("category_id"), original.get("slug"))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_results(sender, instance: Category, raw: bool = False, **kwargs):
+    if raw:
+        return
+    from .result_cache import invalidate_category
+
+    invalidate_category(instance.slug, getattr(instance, "_original_slug", None))
+
+
+@receiver(post_save, sender=Product)
+def drop_stale_product_cards(sender, instance: Product, raw: bool = False, **kwargs):
+    if raw:
+        return
+    from .fragments import drop_cards
+
+    original = getattr(instance, "_original", {}) or {}
+    if original.get("updated_at") != instance.updated_at:
+        drop_cards(instance.pk, original.get("updated_at"))
+
+
+@receiver(post_delete, sender=Product)
+def drop_deleted_product_cards(sender, instance: Product, **kwargs):
+    from .fragments import drop_cards
+
+    drop_cards(instance.pk, instance.updated_at)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_snapshot(sender, instance: Product, update_fields=None, **kwargs):
+    # Registered last: later saves of the same instance compare against what was just written
+    if update_fields is None:
+        instance._snapshot = instance.snapshot_values()
+    else:
+        saved = {
+            field.attname for field in Product._meta.concrete_fields
+            if field.name in update_fields or field.attname in update_fields
+        }
+        snapshot = getattr(instance, "_snapshot", None) or {}
+        snapshot.update(instance.snapshot_values([name for name in PRODUCT_SNAPSHOT_FIELDS if name in saved]))
+        instance._snapshot = snapshot
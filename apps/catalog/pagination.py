@@ -0,0 +1,157 @@
+"""Pagination for the product list API.
+
+Page-number pagination stays the default. Clients that pass ``cursor``
+(empty for the first page) get keyset pagination instead: pages are selected
+with ``WHERE (sort key, id) > (last key, last id)`` on an indexed ordering, so
+a page costs the same whatever its depth and no ``COUNT(*)`` is issued.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Sort columns that can drive a keyset (each has a (column, id) index).
+KEYSET_FIELDS = {
+    "name": str,
+    "price": Decimal,
+    "created_at": datetime.fromisoformat,
+}
+DEFAULT_KEYSET_FIELD = "name"
+
+
+class DefaultPagination(PageNumberPagination):
+    page_size = 12
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size = DefaultPagination.page_size
+    page_size_query_param = DefaultPagination.page_size_query_param
+    max_page_size = DefaultPagination.max_page_size
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    @staticmethod
+    def get_ordering(queryset) -> tuple[str, str]:
+        """Return ``(sort key, id)`` ordering derived from the queryset.
+
+        Orderings that cannot be keyed (e.g. search relevance) fall back to name.
+        """
+        ordering = queryset.query.order_by
+        first = ordering[0] if ordering else DEFAULT_KEYSET_FIELD
+        if not isinstance(first, str) or first.lstrip("-") not in KEYSET_FIELDS:
+            first = DEFAULT_KEYSET_FIELD
+        return first, ("-id" if first.startswith("-") else "id")
+
+    def encode_cursor(self, value, pk: int) -> str:
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        raw = json.dumps([value, pk], ensure_ascii=False).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, cursor: str, field: str):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            value, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            return KEYSET_FIELDS[field](value), int(pk)
+        except (ValueError, TypeError, InvalidOperation, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        sort, tiebreak = self.get_ordering(queryset)
+        field = sort.lstrip("-")
+        queryset = queryset.order_by(sort, tiebreak)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor, field)
+            if sort.startswith("-"):
+                after = Q(**{f"{field}__lte": value}) & (Q(**{f"{field}__lt": value}) | Q(id__lt=pk))
+            else:
+                after = Q(**{f"{field}__gte": value}) & (Q(**{f"{field}__gt": value}) | Q(id__gt=pk))
+            queryset = queryset.filter(after)
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        self.next_cursor = None
+        if self.has_next and rows:
+            last = rows[-1]
+            if isinstance(last, dict):  # .values() rows
+                self.next_cursor = self.encode_cursor(last[field], last["id"])
+            else:
+                self.next_cursor = self.encode_cursor(getattr(last, field), last.pk)
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class CatalogPagination(BasePagination):
+    """Page numbers by default, keyset pagination when ``cursor`` is passed."""
+
+    def __init__(self):
+        self.page_numbers = DefaultPagination()
+        self.keyset = KeysetPagination()
+        self.active: BasePagination = self.page_numbers
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.active = self.keyset
+        else:
+            self.active = self.page_numbers
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_numbers.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_numbers.get_schema_operation_parameters(view) + [
+            {
+                "name": KeysetPagination.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Keyset pagination cursor (pass empty for the first page)",
+                "schema": {"type": "string"},
+            },
+        ]
@@ -0,0 +1,299 @@
+"""Set-based price changes: admin repricing and scheduled price changes.
+
+Repricing computes prices in Python with ``Decimal`` (so the preview shows
+exactly what will be written) and stores them in chunks: one
+``UPDATE … SET price = CASE …`` statement per chunk plus bulk-inserted
+``PriceHistory`` / ``ProductChangeLog`` rows, each chunk in its own short
+transaction so a large repricing never holds the SQLite write lock for long.
+Scheduled changes are applied by the database: one UPDATE per category
+change and per batch of product changes, with the history written from the
+prices read back afterwards. ``save()`` is not called; caches are refreshed
+through :func:`apps.catalog.bulk.sync_derived_data`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Round
+from django.db.models.lookups import GreaterThan, LessThanOrEqual
+from django.utils import timezone
+
+from .bulk import sync_derived_data
+from .models import PriceHistory, Product, ProductChangeLog, ScheduledPriceChange, product_change_rows
+
+
+PRICE_CHUNK_SIZE = 500
+MODE_PERCENT = "percent"
+MODE_DELTA = "delta"
+MODE_CHOICES = [
+    (MODE_PERCENT, "Процент"),
+    (MODE_DELTA, "Сумма, ₽"),
+]
+ROUNDING_CHOICES = [
+    ("0.01", "До копеек"),
+    ("1", "До рубля"),
+    ("10", "До 10 ₽"),
+    ("100", "До 100 ₽"),
+]
+# Columns read per product: the price plus what cache invalidation needs
+PRICE_ROW_FIELDS = ("id", "price", "slug", "category_id", "updated_at")
+CENT = Decimal("0.01")
+
+
+def round_price(value: Decimal, step: str | Decimal = "0.01") -> Decimal:
+    """Round half up to a multiple of ``step`` (0.01, 1, 10, ...)."""
+    step = Decimal(step)
+    return ((value / step).quantize(Decimal(1), rounding=ROUND_HALF_UP) * step).quantize(CENT)
+
+
+@dataclass(frozen=True)
+class RepricingRule:
+    mode: str
+    value: Decimal
+    rounding: str = "0.01"
+
+    def apply(self, price: Decimal) -> Decimal:
+        if self.mode == MODE_PERCENT:
+            new = price * (1 + self.value / 100)
+        else:
+            new = price + self.value
+        return round_price(new, self.rounding)
+
+    def __str__(self) -> str:
+        sign = "+" if self.value >= 0 else ""
+        change = f"{sign}{self.value.normalize():f}%" if self.mode == MODE_PERCENT else f"{sign}{self.value:.2f}"
+        return f"{change}, round to {self.rounding}"
+
+
+@dataclass
+class RepricingResult:
+    matched: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    # Rows whose new price would not be positive; left untouched
+    skipped: int = 0
+    total_before: Decimal = Decimal("0.00")
+    total_after: Decimal = Decimal("0.00")
+    sample: list[dict] = field(default_factory=list)
+
+
+def _chunks(ids: list[int], size: int):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def set_prices(prices: dict[int, Decimal], changed_at, chunk_size: int = PRICE_CHUNK_SIZE) -> int:
+    """Store precomputed ``prices`` (``{pk: price}``) with one UPDATE per chunk.
+
+    Products of a chunk that get the same price share one ``WHEN id IN (…)``
+    branch. Returns the number of rows updated.
+    """
+    updated = 0
+    for chunk in _chunks(sorted(prices), chunk_size):
+        by_price: dict[Decimal, list[int]] = {}
+        for pk in chunk:
+            by_price.setdefault(prices[pk], []).append(pk)
+        price = Case(
+            *(When(pk__in=ids, then=Value(new)) for new, ids in by_price.items()),
+            output_field=Product._meta.get_field("price"),
+        )
+        updated += Product.objects.filter(pk__in=chunk).update(price=price, updated_at=changed_at)
+    return updated
+
+
+def write_prices(rows: Iterable[dict], new_prices: dict[int, Decimal], changed_by=None, reason: str = "",
+                 changed_at=None, attribution: dict[int, tuple] | None = None, written: bool = False) -> int:
+    """Store ``new_prices`` for ``rows`` (dicts with ``PRICE_ROW_FIELDS``) in the current transaction.
+
+    ``attribution`` maps product ids to a ``(changed_by, reason)`` pair that
+    overrides the defaults on their history rows. With ``written`` the caller
+    has already stored the prices; only history rows and caches are updated.
+    Returns the number of products whose price actually changed.
+    """
+    attribution = attribution or {}
+    changed_at = changed_at or timezone.now()
+    products, previous, logs, history = [], {}, [], []
+    for row in rows:
+        new = new_prices.get(row["id"])
+        if new is None or new == row["price"]:
+            continue
+        previous[row["id"]] = {"slug": row["slug"], "category_id": row["category_id"], "updated_at": row["updated_at"]}
+        products.append(Product(id=row["id"], slug=row["slug"], category_id=row["category_id"], price=new,
+                                updated_at=changed_at))
+        author, why = attribution.get(row["id"], (changed_by, reason))
+        product_logs, product_history = product_change_rows(
+            row["id"], {"price": (row["price"], new)}, author, why, changed_at,
+        )
+        logs.extend(product_logs)
+        history.extend(product_history)
+    if not products:
+        return 0
+    if not written:
+        set_prices({p.pk: p.price for p in products}, changed_at)
+    ProductChangeLog.objects.bulk_create(logs, batch_size=500)
+    PriceHistory.objects.bulk_create(history, batch_size=500)
+    sync_derived_data(products, previous, reindex=[], fitments=[])
+    return len(products)
+
+
+def preview_repricing(queryset, rule: RepricingRule, sample_size: int = 20) -> RepricingResult:
+    """What :func:`apply_repricing` would do, without writing anything."""
+    result = RepricingResult()
+    rows = queryset.order_by("pk").values_list("sku", "name", "price").iterator(chunk_size=2000)
+    for sku, name, price in rows:
+        result.matched += 1
+        new = rule.apply(price)
+        if new <= 0:
+            result.skipped += 1
+            continue
+        result.total_before += price
+        result.total_after += new
+        if new == price:
+            result.unchanged += 1
+            continue
+        result.changed += 1
+        if len(result.sample) < sample_size:
+            result.sample.append({"sku": sku, "name": name, "old": price, "new": new})
+    return result
+
+
+def apply_repricing(queryset, rule: RepricingRule, changed_by=None, reason: str | None = None,
+                    chunk_size: int = PRICE_CHUNK_SIZE) -> RepricingResult:
+    """Reprice every product in ``queryset`` by ``rule``, ``chunk_size`` products per transaction.
+
+    Prices are re-read inside each chunk's transaction, so edits made while
+    the repricing runs are not overwritten with stale values.
+    """
+    reason = reason or f"repricing {rule}"
+    result = RepricingResult()
+    ids = list(queryset.order_by("pk").values_list("pk", flat=True))
+    for chunk in _chunks(ids, chunk_size):
+        with transaction.atomic():
+            rows = list(Product.objects.filter(pk__in=chunk).values(*PRICE_ROW_FIELDS))
+            new_prices = {}
+            for row in rows:
+                result.matched += 1
+                new = rule.apply(row["price"])
+                if new <= 0:
+                    result.skipped += 1
+                    continue
+                result.total_before += row["price"]
+                result.total_after += new
+                new_prices[row["id"]] = new
+            changed = write_prices(rows, new_prices, changed_by, reason)
+        result.changed += changed
+        result.unchanged += len(new_prices) - changed
+    return result
+
+
+@dataclass
+class ScheduleResult:
+    applied: int = 0
+    products: int = 0
+    changed: int = 0
+    skipped: int = 0
+
+
+def _price_rows(product_ids: set[int], category_ids: set[int]) -> dict[int, dict]:
+    rows = {}
+    ids = sorted(product_ids)
+    for chunk in _chunks(ids, PRICE_CHUNK_SIZE):
+        rows.update((row["id"], row) for row in Product.objects.filter(pk__in=chunk).values(*PRICE_ROW_FIELDS))
+    if category_ids:
+        products = Product.objects.filter(category_id__in=category_ids).values(*PRICE_ROW_FIELDS)
+        rows.update((row["id"], row) for row in products.iterator(chunk_size=2000))
+    return rows
+
+
+def _new_price(change: ScheduledPriceChange):
+    """SQL expression for the price ``change`` sets, rounded to kopecks like :func:`round_price`."""
+    if change.kind == ScheduledPriceChange.KIND_PERCENT:
+        return Round(F("price") * Value(1 + change.value / 100), 2, output_field=Product._meta.get_field("price"))
+    return Value(change.value, output_field=Product._meta.get_field("price"))
+
+
+def _statements(due: list[ScheduledPriceChange]):
+    """Group ``due`` changes, in order, into ``(queryset, price expression, changes)`` UPDATEs.
+
+    A category change is one statement; consecutive product changes share a
+    ``CASE`` statement until a product comes up again (so later changes see
+    the earlier ones) or the batch reaches ``PRICE_CHUNK_SIZE``.
+    """
+    batch: dict[int, ScheduledPriceChange] = {}
+
+    def product_statement():
+        price = Case(
+            *(When(pk=pk, then=_new_price(change)) for pk, change in batch.items()),
+            default=F("price"),
+            output_field=Product._meta.get_field("price"),
+        )
+        return Product.objects.filter(pk__in=list(batch)), price, list(batch.values())
+
+    for change in due:
+        if change.product_id and change.product_id not in batch and len(batch) < PRICE_CHUNK_SIZE:
+            batch[change.product_id] = change
+            continue
+        if batch:
+            yield product_statement()
+            batch = {}
+        if change.product_id:
+            batch[change.product_id] = change
+        else:
+            yield Product.objects.filter(category_id=change.category_id), _new_price(change), [change]
+    if batch:
+        yield product_statement()
+
+
+def apply_scheduled_changes(now=None) -> ScheduleResult:
+    """Apply every pending :class:`ScheduledPriceChange` due by ``now`` in one transaction.
+
+    Changes are applied in ``effective_at`` order by set-based UPDATEs (see
+    :func:`_statements`), so percentages compound; a product hit by several
+    changes still gets one history row per run, attributed to the author of
+    the last change that touched it. Changes that would make a price
+    non-positive are skipped for that product.
+    """
+    now = now or timezone.now()
+    result = ScheduleResult()
+    with transaction.atomic():
+        due = list(
+            ScheduledPriceChange.objects.select_for_update()
+            .filter(applied_at__isnull=True, effective_at__lte=now)
+            .order_by("effective_at", "id")
+        )
+        if not due:
+            return result
+        # Written first: on SQLite this takes the write lock, so the prices
+        # read below cannot change before the UPDATEs run
+        for chunk in _chunks([change.pk for change in due], PRICE_CHUNK_SIZE):
+            ScheduledPriceChange.objects.filter(pk__in=chunk).update(applied_at=now)
+        rows = _price_rows(
+            {change.product_id for change in due if change.product_id},
+            {change.category_id for change in due if change.category_id},
+        )
+        by_category: dict[int, list[int]] = {}
+        for row in rows.values():
+            by_category.setdefault(row["category_id"], []).append(row["id"])
+
+        attribution = {}
+        for queryset, price, changes in _statements(due):
+            skipped = set(queryset.filter(LessThanOrEqual(price, 0)).values_list("pk", flat=True))
+            queryset.filter(GreaterThan(price, 0)).update(price=price, updated_at=now)
+            result.skipped += len(skipped)
+            for change in changes:
+                targets = [change.product_id] if change.product_id else by_category.get(change.category_id, [])
+                for pk in targets:
+                    if pk in rows and pk not in skipped:
+                        attribution[pk] = (change.created_by_id, change.reason or f"scheduled price change #{change.pk}")
+
+        new_prices = {}
+        for chunk in _chunks(sorted(attribution), PRICE_CHUNK_SIZE):
+            new_prices.update(Product.objects.filter(pk__in=chunk).values_list("pk", "price"))
+        result.applied = len(due)
+        result.products = len(attribution)
+        result.changed = write_prices(rows.values(), new_prices, changed_at=now, attribution=attribution, written=True)
+    return result
@@ -0,0 +1,345 @@
+"""Catalog filtering shared by the API and the HTML catalog.
+
+``CatalogQuery`` parses request parameters once and builds the product
+queryset, choosing the cheapest search strategy for the current backend:
+
+* ``code``  - the search is a pasted article number that matches a
+  normalized SKU/OEM code exactly;
+* ``fts``   - SQLite FTS5 table with bm25 ranking;
+* ``index`` - the casefolded token index (SQLite without FTS5);
+* ``like``  - case-insensitive ``LIKE`` on other databases;
+* ``cache`` - match ids of an earlier ``like`` search (kept in the shared
+  ``catalog`` cache), reused until the catalog version changes;
+* ``fuzzy`` - nothing matched exactly, so the search was re-run with
+  misspelled words replaced by the closest catalog words (``fuzzy.py``);
+* ``all``   - no search term, filters only.
+
+The chosen strategy is kept on ``CatalogQuery.strategy`` so views can report it.
+``results()`` and ``facets()`` serve repeated listings from the result cache
+(``result_cache.py``).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Lower
+
+from . import fts, fuzzy, result_cache, search
+from .codes import looks_like_code, product_ids_for_code
+from .cache import catalog_version
+from .compatibility import fitment_filter, garage_filter, parse_year, vehicle_key
+from .facets import compute_facets
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_ALL = "all"
+STRATEGY_CODE = "code"
+STRATEGY_FTS = "fts"
+STRATEGY_INDEX = "index"
+STRATEGY_LIKE = "like"
+STRATEGY_CACHE = "cache"
+STRATEGY_FUZZY = "fuzzy"
+
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_BYPASS = "bypass"
+
+SORT_ORDERING = {
+    "name": ("name",),
+    "price": ("price",),
+    "-price": ("-price",),
+    "new": ("-created_at",),
+    "-new": ("created_at",),
+    "relevance": ("rank", "name"),
+}
+DEFAULT_SORT = "name"
+TRUE_VALUES = {"1", "true", "True"}
+
+# ``like`` searches scan the table, so their match ids are cached when the
+# result is small enough to be worth keeping.
+LIKE_CACHE_MAX_IDS = 5000
+LIKE_CACHE_TIMEOUT = 300
+
+
+def _parse_decimal(value: str | None) -> Decimal | None:
+    if not value:
+        return None
+    try:
+        return Decimal(value)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+class CatalogQuery:
+    def __init__(
+        self,
+        search: str = "",
+        category: str = "",
+        price_min: Decimal | None = None,
+        price_max: Decimal | None = None,
+        in_stock: bool = False,
+        sort: str | None = None,
+        make: str = "",
+        model: str = "",
+        year: int | None = None,
+        garage: str = "",
+        user=None,
+        manufacturer: str = "",
+    ):
+        self.search = " ".join((search or "").split())
+        self.category = category or ""
+        self.price_min = price_min
+        self.price_max = price_max
+        self.in_stock = in_stock
+        self.sort = sort if sort in SORT_ORDERING else None
+        self.make = (make or "").strip()
+        self.model = (model or "").strip()
+        self.year = year
+        # "all" or a GarageVehicle id; only meaningful for a logged-in user
+        self.garage = (garage or "").strip()
+        self.user = user
+        self.manufacturer = (manufacturer or "").strip()
+        self.strategy: str | None = None
+        # Rewritten search text when the fuzzy fallback was used
+        self.corrected_search: str | None = None
+        self._backend: str | None = None
+        self.cache_status: str | None = None
+        self._queryset: QuerySet | None = None
+        self._cache_key: str | None = None
+        self.elapsed_ms: float | None = None
+
+    @classmethod
+    def from_params(cls, params, user=None) -> "CatalogQuery":
+        return cls(
+            search=params.get("search") or "",
+            category=params.get("category") or "",
+            price_min=_parse_decimal(params.get("price_min")),
+            price_max=_parse_decimal(params.get("price_max")),
+            in_stock=params.get("in_stock") in TRUE_VALUES,
+            sort=params.get("sort"),
+            make=params.get("make") or "",
+            model=params.get("model") or "",
+            year=parse_year(params.get("year")),
+            garage=params.get("garage") or "",
+            user=user,
+            manufacturer=params.get("manufacturer") or "",
+        )
+
+    # ---------------------- execution ----------------------
+    def search_backend(self) -> str:
+        forced = getattr(settings, "CATALOG_SEARCH_BACKEND", None)
+        if forced in (STRATEGY_FTS, STRATEGY_INDEX, STRATEGY_LIKE):
+            if forced != STRATEGY_FTS or fts.is_available():
+                return forced
+        if connection.vendor == "sqlite":
+            # SQLite LOWER/LIKE are ASCII-only, so it always goes through an index
+            return STRATEGY_FTS if fts.is_available() else STRATEGY_INDEX
+        return STRATEGY_LIKE
+
+    def queryset(self) -> QuerySet:
+        if self._queryset is not None:
+            return self._queryset
+        started = time.perf_counter()
+        qs = Product.objects.select_related("category").all()
+        qs = self._apply_search(qs)
+        qs = self._apply_filters(qs)
+        qs = qs.order_by(*self.ordering())
+        self.elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.debug("catalog query %r: strategy=%s built in %.2f ms", self.search, self.strategy, self.elapsed_ms)
+        self._queryset = qs
+        return qs
+
+    # ---------------------- result cache ----------------------
+    def cache_key(self) -> str | None:
+        """Result-cache key, or ``None`` for listings that depend on the user."""
+        if self.garage:
+            return None
+        if self._cache_key is None:
+            scope = result_cache.category_scope(self.category) if self.category else result_cache.SCOPE_ALL
+            parts = [
+                self.search.casefold(),
+                self.category,
+                "" if self.price_min is None else self.price_min,
+                "" if self.price_max is None else self.price_max,
+                int(self.in_stock),
+                self.sort or "",
+                vehicle_key(self.make),
+                vehicle_key(self.model),
+                self.year or "",
+                self.manufacturer,
+                getattr(settings, "CATALOG_SEARCH_BACKEND", None) or "",
+            ]
+            digest = hashlib.sha1("\x00".join(map(str, parts)).encode("utf-8")).hexdigest()
+            self._cache_key = f"catalog:results:{result_cache.generation(scope)}:{digest}"
+        return self._cache_key
+
+    def values_queryset(self, values: tuple[str, ...] | None = None) -> QuerySet:
+        qs = self.queryset()
+        return qs.values(*values) if values else qs
+
+    def results(self, values: tuple[str, ...] | None = None):
+        """Ordered products as a ``CachedResult``, or the queryset when not cacheable.
+
+        ``values`` (must include ``"id"``) switches rows to ``.values()`` dicts.
+        """
+        key = self.cache_key()
+        if key is None:
+            self.cache_status = CACHE_BYPASS
+            return self.values_queryset(values)
+        factory = lambda: self.values_queryset(values)  # noqa: E731
+        cache = result_cache.result_cache()
+        entry = cache.get(key)
+        if entry is not None:
+            self.cache_status = CACHE_HIT
+            self.strategy = entry["strategy"]
+            self.corrected_search = entry["corrected_search"]
+            result_cache.record(hit=True)
+            return result_cache.CachedResult(entry["ids"], entry["count"], factory, values)
+
+        self.cache_status = CACHE_MISS
+        result_cache.record(hit=False)
+        qs = self.queryset()
+        ids = list(qs.values_list("id", flat=True)[: result_cache.MAX_CACHED_IDS + 1])
+        count = len(ids) if len(ids) <= result_cache.MAX_CACHED_IDS else qs.count()
+        entry = {
+            "ids": ids[: result_cache.MAX_CACHED_IDS],
+            "count": count,
+            "strategy": self.strategy,
+            "corrected_search": self.corrected_search,
+        }
+        cache.set(key, entry, result_cache.RESULT_TIMEOUT)
+        return result_cache.CachedResult(entry["ids"], count, factory, values)
+
+    def facets(self) -> dict:
+        key = self.cache_key()
+        if key is None:
+            return compute_facets(self.queryset())
+        cache = result_cache.result_cache()
+        facets = cache.get(f"{key}:facets")
+        if facets is None:
+            facets = compute_facets(self.queryset())
+            cache.set(f"{key}:facets", facets, result_cache.RESULT_TIMEOUT)
+        return facets
+
+    def ordering(self) -> tuple[str, ...]:
+        sort = self.sort
+        if sort is None:
+            sort = "relevance" if self.ranked else DEFAULT_SORT
+        elif sort == "relevance" and not self.ranked:
+            sort = DEFAULT_SORT
+        return SORT_ORDERING[sort]
+
+    @property
+    def ranked(self) -> bool:
+        """Whether the queryset carries an FTS ``rank`` annotation."""
+        return self.strategy == STRATEGY_FTS or (self.strategy == STRATEGY_FUZZY and self._backend == STRATEGY_FTS)
+
+    def _apply_filters(self, qs: QuerySet) -> QuerySet:
+        if self.category:
+            qs = qs.filter(category__slug=self.category)
+        if self.manufacturer:
+            qs = qs.filter(manufacturer=self.manufacturer)
+        if self.price_min is not None:
+            qs = qs.filter(price__gte=self.price_min)
+        if self.price_max is not None:
+            qs = qs.filter(price__lte=self.price_max)
+        if self.in_stock:
+            qs = qs.filter(in_stock__gt=0)
+        if self.make:
+            qs = qs.filter(fitment_filter(self.make, self.model, self.year))
+        if self.garage:
+            qs = qs.filter(garage_filter(self._garage_vehicles()))
+        return qs
+
+    def _garage_vehicles(self) -> list:
+        from apps.accounts.models import GarageVehicle
+
+        if self.user is None or not self.user.is_authenticated:
+            return []
+        vehicles = GarageVehicle.objects.filter(user=self.user)
+        if self.garage != "all":
+            if not self.garage.isdigit():
+                return []
+            vehicles = vehicles.filter(pk=int(self.garage))
+        return list(vehicles)
+
+    def _apply_search(self, qs: QuerySet) -> QuerySet:
+        if not self.search:
+            self.strategy = STRATEGY_ALL
+            return qs
+        if looks_like_code(self.search):
+            ids = product_ids_for_code(self.search)
+            if ids:
+                self.strategy = STRATEGY_CODE
+                return qs.filter(id__in=ids)
+        self._backend = self.search_backend()
+        matched = self._text_search(qs, self.search)
+        # The fuzzy index is only consulted once the exact search found nothing
+        if matched.exists():
+            return matched
+        corrected = fuzzy.correct(self.search)
+        if not corrected:
+            return matched
+        self.corrected_search = corrected
+        qs = self._text_search(qs, corrected)
+        self.strategy = STRATEGY_FUZZY
+        return qs
+
+    def _text_search(self, qs: QuerySet, text: str) -> QuerySet:
+        if self._backend == STRATEGY_FTS:
+            self.strategy = STRATEGY_FTS
+            expression = fts.match_expression(text)
+            if expression is None:
+                return qs.none()
+            return qs.filter(fts.search_filter(expression)).annotate(rank=fts.rank_expression(expression))
+        if self._backend == STRATEGY_INDEX:
+            self.strategy = STRATEGY_INDEX
+            q = search.search_filter(text)
+            return qs.filter(q) if q is not None else qs.none()
+        return self._like_search(qs, text)
+
+    def _like_q(self, text: str) -> Q:
+        q = Q()
+        for term in text.split():
+            t = term.casefold()
+            q |= (
+                Q(name_l__contains=t)
+                | Q(desc_l__contains=t)
+                | Q(sku_l__contains=t)
+                | Q(manufacturer_l__contains=t)
+                | Q(category_l__contains=t)
+            )
+        return q
+
+    def _like_cache_key(self, text: str) -> str:
+        digest = hashlib.sha1(text.casefold().encode("utf-8")).hexdigest()
+        return f"catalog:like:{catalog_version()}:{digest}"
+
+    def _like_search(self, qs: QuerySet, text: str) -> QuerySet:
+        key = self._like_cache_key(text)
+        cache = result_cache.result_cache()
+        ids = cache.get(key)
+        if ids is not None:
+            self.strategy = STRATEGY_CACHE
+            return qs.filter(id__in=ids)
+        self.strategy = STRATEGY_LIKE
+        matched = Product.objects.annotate(
+            name_l=Lower("name"),
+            desc_l=Lower("description"),
+            sku_l=Lower("sku"),
+            manufacturer_l=Lower("manufacturer"),
+            category_l=Lower("category__name"),
+        ).filter(self._like_q(text))
+        ids = list(matched.values_list("id", flat=True)[:LIKE_CACHE_MAX_IDS + 1])
+        if len(ids) > LIKE_CACHE_MAX_IDS:
+            return qs.filter(id__in=matched.values("id"))
+        cache.set(key, ids, LIKE_CACHE_TIMEOUT)
+        return qs.filter(id__in=ids)
@@ -0,0 +1,167 @@
+"""Cache of catalog listing results.
+
+A listing (filters + sort + search) is stored as its ordered product ids and
+total count in the ``catalog`` cache alias (locmem, file or Redis, see
+``CATALOG_CACHE_BACKEND``). Pages are then read with one primary-key lookup.
+
+Keys embed a generation counter: listings filtered by category use that
+category's counter, all others the catalog-wide one. The Product/Category
+signal handlers bump the counters of the categories a change touches, so a
+price change in "Фильтры" leaves cached "Подвеска" listings alive. The same
+counters (plus one per product slug) key the anonymous page cache
+(``apps.core.page_cache``).
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.cache import caches
+
+from .models import Category, Product
+
+
+CACHE_ALIAS = "catalog"
+RESULT_TIMEOUT = 60 * 10
+# Only the first ids are kept (100 pages of the HTML catalog); deeper pages
+# fall through to the database.
+MAX_CACHED_IDS = 2400
+SCOPE_ALL = "all"
+# Bumped on any category change (names shown on every product page)
+SCOPE_CATEGORIES = "categories"
+HITS_KEY = "catalog:results:hits"
+MISSES_KEY = "catalog:results:misses"
+
+
+def result_cache():
+    return caches[CACHE_ALIAS]
+
+
+def category_scope(slug: str) -> str:
+    return f"category:{slug}"
+
+
+def product_scope(slug: str) -> str:
+    return f"product:{slug}"
+
+
+def _generation_key(scope: str) -> str:
+    return f"catalog:gen:{scope}"
+
+
+def generation(scope: str) -> int:
+    cache = result_cache()
+    key = _generation_key(scope)
+    value = cache.get(key)
+    if value is None:
+        # Seeded from the clock so an evicted counter never repeats a value
+        cache.add(key, time.time_ns() // 1_000_000, timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def generations(scopes: list[str]) -> list[int]:
+    """Current counters for several scopes with one cache round trip."""
+    keys = [_generation_key(scope) for scope in scopes]
+    found = result_cache().get_many(keys)
+    return [found[key] if key in found else generation(scope) for key, scope in zip(keys, scopes)]
+
+
+def bump_generations(scopes) -> None:
+    cache = result_cache()
+    for scope in set(scopes):
+        try:
+            cache.incr(_generation_key(scope))
+        except ValueError:
+            generation(scope)
+            cache.incr(_generation_key(scope))
+
+
+def _incr(key: str) -> None:
+    cache = result_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def record(hit: bool) -> None:
+    _incr(HITS_KEY if hit else MISSES_KEY)
+
+
+def stats() -> dict:
+    values = result_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "backend": result_cache().__class__.__name__,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats() -> None:
+    result_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+class CachedResult:
+    """Ordered, sliceable catalog result backed by cached ids.
+
+    Stands in for the queryset wherever only ``count()`` and slices are
+    needed (``Paginator``, DRF page-number pagination). Slices inside the
+    cached ids load just those rows by primary key; anything past them is
+    delegated to the real queryset, built on demand. With ``values`` the
+    rows are ``.values(*values)`` dicts instead of model instances.
+    """
+
+    ordered = True
+
+    def __init__(self, ids: list[int], count: int, queryset_factory, values: tuple[str, ...] | None = None):
+        self.ids = ids
+        self._count = count
+        self._queryset_factory = queryset_factory
+        self.values = values
+
+    def count(self) -> int:
+        return self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _rows(self, ids: list[int]) -> list:
+        if self.values:
+            by_id = {row["id"]: row for row in Product.objects.filter(pk__in=ids).values(*self.values)}
+        else:
+            by_id = Product.objects.select_related("category").in_bulk(ids)
+        return [by_id[pk] for pk in ids if pk in by_id]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._count)
+            if step == 1 and (stop <= len(self.ids) or len(self.ids) == self._count):
+                return self._rows(self.ids[start:stop])
+            return list(self._queryset_factory()[item])
+        rows = self[item:item + 1]
+        if not rows:
+            raise IndexError(item)
+        return rows[0]
+
+    def __iter__(self):
+        return iter(self[0:self._count])
+
+
+def invalidate_product(product: Product, old_category_id: int | None = None, old_slug: str | None = None) -> None:
+    scopes = {SCOPE_ALL} | {product_scope(slug) for slug in (product.slug, old_slug) if slug}
+    category_ids = {product.category_id, old_category_id} - {None}
+    if category_ids == {product.category_id} and product.category_id:
+        scopes.add(category_scope(product.category.slug))
+    elif category_ids:
+        slugs = Category.objects.filter(pk__in=category_ids).values_list("slug", flat=True)
+        scopes.update(category_scope(slug) for slug in slugs)
+    bump_generations(scopes)
+
+
+def invalidate_category(*slugs: str) -> None:
+    bump_generations({SCOPE_ALL, SCOPE_CATEGORIES} | {category_scope(slug) for slug in slugs if slug})
@@ -0,0 +1,122 @@
+"""Token index for catalog search.
+
+Every product is split into casefolded word tokens (name, description, sku,
+manufacturer and category name) which are stored in ``SearchToken``. A search
+term then becomes an indexed range lookup on ``token`` (prefix match), so the
+cost depends on the number of matching tokens, not on the size of the catalog.
+"""
+from __future__ import annotations
+
+import re
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Category, Product, SearchToken
+
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TOKEN_LENGTH = 64
+# Upper bound for a prefix range: every token starting with ``t`` sorts
+# between ``t`` and ``t + PREFIX_SENTINEL``.
+PREFIX_SENTINEL = "\U0010ffff"
+_INSERT_SQL = f"INSERT INTO {SearchToken._meta.db_table} (product_id, token) VALUES (%s, %s)"
+
+
+def normalize(text: str) -> str:
+    """Casefold text and fold Cyrillic "ё" into "е" (users type both)."""
+    return (text or "").casefold().replace("ё", "е")
+
+
+def tokenize(text: str) -> list[str]:
+    return [t[:MAX_TOKEN_LENGTH] for t in WORD_RE.findall(normalize(text))]
+
+
+def product_tokens(
+    name: str,
+    description: str,
+    sku: str,
+    manufacturer: str,
+    category_name: str,
+) -> set[str]:
+    tokens: set[str] = set()
+    for text in (name, description, sku, manufacturer, category_name):
+        tokens.update(tokenize(text))
+    return tokens
+
+
+def index_products(products: Iterable[Product]) -> None:
+    """(Re)build index rows for the given products.
+
+    Products should come with ``category`` already loaded (``select_related``)
+    to avoid a query per product.
+    """
+    products = [p for p in products if p.pk]
+    if not products:
+        return
+    rows = []
+    for p in products:
+        category_name = p.category.name if p.category_id else ""
+        for token in product_tokens(p.name, p.description, p.sku, p.manufacturer, category_name):
+            rows.append((p.pk, token))
+    SearchToken.objects.filter(product_id__in=[p.pk for p in products]).delete()
+    # Plain executemany: bulk imports write ~10 rows per product, and building
+    # a model instance per row costs more than the insert itself
+    with connection.cursor() as cursor:
+        cursor.executemany(_INSERT_SQL, rows)
+
+
+def index_category(category: Category, chunk_size: int = 500) -> None:
+    """Reindex products of a category, e.g. after it has been renamed."""
+    qs = Product.objects.select_related("category").filter(category=category).order_by("pk")
+    chunk: list[Product] = []
+    for p in qs.iterator(chunk_size=chunk_size):
+        chunk.append(p)
+        if len(chunk) >= chunk_size:
+            index_products(chunk)
+            chunk = []
+    index_products(chunk)
+
+
+def rebuild_index(chunk_size: int = 500) -> int:
+    """Rebuild the whole token index. Returns the number of indexed products."""
+    SearchToken.objects.all().delete()
+    total = 0
+    chunk: list[Product] = []
+    for p in Product.objects.select_related("category").order_by("pk").iterator(chunk_size=chunk_size):
+        chunk.append(p)
+        if len(chunk) >= chunk_size:
+            index_products(chunk)
+            total += len(chunk)
+            chunk = []
+    index_products(chunk)
+    return total + len(chunk)
+
+
+def _token_subquery(token: str):
+    return SearchToken.objects.filter(
+        token__gte=token, token__lt=token + PREFIX_SENTINEL
+    ).values("product_id")
+
+
+def search_filter(query: str) -> Q | None:
+    """Build a filter for ``Product`` querysets from a raw search string.
+
+    Whitespace-separated terms are OR-ed (a product matches if any term
+    matches). A term like ``akb-1004`` is split into word tokens which all
+    have to match as prefixes of indexed tokens.
+    Returns ``None`` if the query has no searchable tokens.
+    """
+    q = Q()
+    has_terms = False
+    for term in (query or "").split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        term_q = Q()
+        for token in dict.fromkeys(tokens):
+            term_q &= Q(id__in=_token_subquery(token))
+        q |= term_q
+        has_terms = True
+    return q if has_terms else None
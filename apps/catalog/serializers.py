@@ -1,4 +1,10 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
+
+from apps.core.sparse import SparseFieldsetsMixin
 from .models import Category, Product
 
 
@@ -8,7 +14,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "slug"]
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
 
     class Meta:
@@ -28,3 +34,95 @@ class ProductSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
+
+
+MAX_BATCH_KEYS = 500
+
+
+class ProductBatchRequestSerializer(serializers.Serializer):
+    """Body of ``POST /api/products/batch/``: any mix of ids, slugs and SKUs."""
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    slugs = serializers.ListField(child=serializers.CharField(max_length=220), required=False, default=list)
+    skus = serializers.ListField(child=serializers.CharField(max_length=100), required=False, default=list)
+
+    def validate(self, attrs):
+        total = sum(len(attrs[key]) for key in ("ids", "slugs", "skus"))
+        if not total:
+            raise serializers.ValidationError("Pass at least one of ids, slugs or skus.")
+        if total > MAX_BATCH_KEYS:
+            raise serializers.ValidationError(f"At most {MAX_BATCH_KEYS} keys per request.")
+        return attrs
+
+
+# ---------------------- fast read-only path for listings ----------------------
+# ``.values()`` columns behind each ProductSerializer field (category joined in)
+PRODUCT_ROW_COLUMNS = {
+    "id": ("id",),
+    "name": ("name",),
+    "slug": ("slug",),
+    "sku": ("sku",),
+    "description": ("description",),
+    "manufacturer": ("manufacturer",),
+    "price": ("price",),
+    "in_stock": ("in_stock",),
+    "images": ("images",),
+    "category": ("category_id", "category__name", "category__slug"),
+    "compatibility": ("compatibility",),
+    "created_at": ("created_at",),
+    "updated_at": ("updated_at",),
+}
+PRODUCT_ROW_FIELDS = tuple(column for columns in PRODUCT_ROW_COLUMNS.values() for column in columns)
+_PRICE_QUANT = Decimal(1).scaleb(-Product._meta.get_field("price").decimal_places)
+
+
+def product_row_fields(fields: list[str] | None = None) -> tuple[str, ...]:
+    """``.values()`` columns needed to serialize ``fields`` (all fields when ``None``)."""
+    if fields is None:
+        return PRODUCT_ROW_FIELDS
+    return tuple(dict.fromkeys(["id"] + [column for name in fields for column in PRODUCT_ROW_COLUMNS[name]]))
+
+
+def _datetime(value, tz):
+    # Same output as serializers.DateTimeField with the default ISO format
+    if not value:
+        return None
+    if tz is not None:
+        value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+def _price(row, tz):
+    price = row["price"]
+    return "" if price is None else f"{price.quantize(_PRICE_QUANT):f}"
+
+
+def _category(row, tz):
+    return {"id": row["category_id"], "name": row["category__name"], "slug": row["category__slug"]}
+
+
+# Fields that need more than copying the column value
+_ROW_CONVERTERS = {
+    "price": _price,
+    "category": _category,
+    "created_at": lambda row, tz: _datetime(row["created_at"], tz),
+    "updated_at": lambda row, tz: _datetime(row["updated_at"], tz),
+}
+
+
+def serialize_product_rows(rows, fields: list[str] | None = None) -> list[dict]:
+    """``ProductSerializer(many=True).data`` for ``.values(*product_row_fields(fields))`` rows.
+
+    Produces the same JSON without per-field serializer dispatch; only for
+    reading (no validation).
+    """
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    plan = [(name, _ROW_CONVERTERS.get(name)) for name in (PRODUCT_ROW_COLUMNS if fields is None else fields)]
+    data = []
+    for row in rows:
+        item = {}
+        for name, convert in plan:
+            item[name] = row[name] if convert is None else convert(row, tz)
+        data.append(item)
+    return data
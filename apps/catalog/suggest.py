@@ -0,0 +1,417 @@
+"""In-process prefix index for search-as-you-type suggestions.
+
+Each worker process keeps one :class:`SuggestIndex` with four tries (product
+names, SKUs, manufacturers, categories) mapping word tokens to entry ids.
+It is built on first use and then patched by the Product/Category signal
+handlers. Writes made by other processes (web workers, ``import_catalog``,
+``apply_price_schedule``) bump the catalog version in the shared ``catalog``
+cache and record which products and categories they changed; when
+``get_index`` sees a newer version it re-reads just those rows. Only when
+the changes are unknown (expired records, or too many of them) is the index
+rebuilt, at most once per ``SUGGEST_REBUILD_INTERVAL`` seconds and in a
+background thread, serving the current index until the new one is ready
+(``SUGGEST_BACKGROUND_REBUILD = False`` rebuilds inline instead). Its token
+counts double as the vocabulary of the fuzzy search fallback (``fuzzy.py``).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.db import connections
+
+from .cache import catalog_changes, catalog_version
+from .search import tokenize
+
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# How many candidates to examine per trie before giving up on a
+# multi-word query whose other words do not match.
+MAX_CANDIDATES_PER_RESULT = 25
+# Beyond this many versions or changed rows behind, rebuild instead of
+# re-reading the changed rows
+MAX_CATCH_UP_VERSIONS = 500
+MAX_CATCH_UP_ROWS = 5000
+# Default minimum number of seconds between two full rebuilds
+REBUILD_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+class _Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.ids: set | None = None
+
+
+class PrefixTrie:
+    """Character trie of tokens; every terminal node keeps the ids it indexes."""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def add(self, token: str, entry_id) -> None:
+        node = self.root
+        for ch in token:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _Node()
+            node = child
+        if node.ids is None:
+            node.ids = set()
+        node.ids.add(entry_id)
+
+    def discard(self, token: str, entry_id) -> None:
+        node = self.root
+        for ch in token:
+            node = node.children.get(ch)
+            if node is None:
+                return
+        if node.ids:
+            node.ids.discard(entry_id)
+
+    def iter_prefix(self, prefix: str) -> Iterator:
+        """Yield ids under ``prefix`` depth-first.
+
+        Pre-order traversal yields the exact token before its extensions and
+        reaches the first ids after ``len(token)`` steps, so collecting a few
+        results never walks the whole subtree of a short prefix.
+        """
+        node = self.root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return
+        seen = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.ids:
+                for entry_id in node.ids:
+                    if entry_id not in seen:
+                        seen.add(entry_id)
+                        yield entry_id
+            if node.children:
+                stack.extend(reversed(node.children.values()))
+
+    def has_prefix(self, prefix: str) -> bool:
+        return next(self.iter_prefix(prefix), None) is not None
+
+
+def _matches_all(tokens: tuple[str, ...], prefixes: list[str]) -> bool:
+    return all(any(t.startswith(p) for t in tokens) for p in prefixes)
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.products = PrefixTrie()
+        self.skus = PrefixTrie()
+        self.manufacturers = PrefixTrie()
+        self.categories = PrefixTrie()
+        # id -> (name, slug, sku, manufacturer, name tokens, sku tokens, all tokens)
+        self.product_entries: dict[int, tuple] = {}
+        # casefolded name -> [display name, product count, tokens]
+        self.manufacturer_entries: dict[str, list] = {}
+        # id -> (name, slug, tokens)
+        self.category_entries: dict[int, tuple] = {}
+        # token -> number of entries using it (vocabulary for fuzzy matching)
+        self.token_counts: dict[str, int] = {}
+        # Bumped on every change so derived structures know to rebuild
+        self.generation = 0
+        self.lock = threading.RLock()
+        self.built_at: float | None = None
+        # Last catalog version whose changes this index has applied
+        self.version: int | None = None
+
+    # ---------------------- building ----------------------
+    @classmethod
+    def build(cls, products: Iterable[tuple], categories: Iterable[tuple]) -> "SuggestIndex":
+        """Build from ``(id, name, slug, sku, manufacturer)`` and ``(id, name, slug)`` rows."""
+        index = cls()
+        for row in products:
+            index.put_product(*row)
+        for row in categories:
+            index.put_category(*row)
+        index.built_at = time.monotonic()
+        return index
+
+    @classmethod
+    def from_db(cls) -> "SuggestIndex":
+        from .models import Category, Product
+
+        version = catalog_version()
+        products = Product.objects.order_by().values_list("id", "name", "slug", "sku", "manufacturer")
+        categories = Category.objects.order_by().values_list("id", "name", "slug")
+        index = cls.build(products.iterator(chunk_size=2000), categories)
+        index.version = version
+        return index
+
+    # ---------------------- incremental updates ----------------------
+    def refresh(self, product_ids: Iterable[int], category_ids: Iterable[int]) -> None:
+        """Re-read the given products and categories; ids no longer in the database are removed."""
+        from .models import Category, Product
+
+        for model, ids, columns, put, remove in (
+            (Product, sorted(product_ids), ("id", "name", "slug", "sku", "manufacturer"),
+             self.put_product, self.remove_product),
+            (Category, sorted(category_ids), ("id", "name", "slug"), self.put_category, self.remove_category),
+        ):
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                missing = set(chunk)
+                for row in model.objects.filter(pk__in=chunk).order_by().values_list(*columns):
+                    put(*row)
+                    missing.discard(row[0])
+                for pk in missing:
+                    remove(pk)
+
+    def _count_tokens(self, tokens: Iterable[str], delta: int) -> None:
+        counts = self.token_counts
+        for token in tokens:
+            n = counts.get(token, 0) + delta
+            if n > 0:
+                counts[token] = n
+            else:
+                counts.pop(token, None)
+        self.generation += 1
+
+    def put_product(self, product_id: int, name: str, slug: str, sku: str, manufacturer: str) -> None:
+        with self.lock:
+            self.remove_product(product_id)
+            name_tokens = tuple(dict.fromkeys(tokenize(name)))
+            sku_tokens = tuple(dict.fromkeys(tokenize(sku) + ["".join(tokenize(sku))]))
+            self.product_entries[product_id] = (
+                name, slug, sku, manufacturer or "", name_tokens, sku_tokens, name_tokens + sku_tokens
+            )
+            for token in name_tokens:
+                self.products.add(token, product_id)
+            for token in sku_tokens:
+                self.skus.add(token, product_id)
+            self._count_tokens(name_tokens + sku_tokens, 1)
+            if manufacturer:
+                key = manufacturer.casefold()
+                entry = self.manufacturer_entries.get(key)
+                if entry is None:
+                    entry = self.manufacturer_entries[key] = [manufacturer, 0, tuple(tokenize(manufacturer))]
+                    for token in entry[2]:
+                        self.manufacturers.add(token, key)
+                    self._count_tokens(entry[2], 1)
+                entry[1] += 1
+
+    def remove_product(self, product_id: int) -> None:
+        with self.lock:
+            old = self.product_entries.pop(product_id, None)
+            if old is None:
+                return
+            _, _, _, manufacturer, name_tokens, sku_tokens, _ = old
+            for token in name_tokens:
+                self.products.discard(token, product_id)
+            for token in sku_tokens:
+                self.skus.discard(token, product_id)
+            self._count_tokens(name_tokens + sku_tokens, -1)
+            if manufacturer:
+                key = manufacturer.casefold()
+                entry = self.manufacturer_entries.get(key)
+                if entry is not None:
+                    entry[1] -= 1
+                    if entry[1] <= 0:
+                        del self.manufacturer_entries[key]
+                        for token in entry[2]:
+                            self.manufacturers.discard(token, key)
+                        self._count_tokens(entry[2], -1)
+
+    def put_category(self, category_id: int, name: str, slug: str) -> None:
+        with self.lock:
+            self.remove_category(category_id)
+            tokens = tuple(dict.fromkeys(tokenize(name)))
+            self.category_entries[category_id] = (name, slug, tokens)
+            for token in tokens:
+                self.categories.add(token, category_id)
+            self._count_tokens(tokens, 1)
+
+    def remove_category(self, category_id: int) -> None:
+        with self.lock:
+            old = self.category_entries.pop(category_id, None)
+            if old is not None:
+                for token in old[2]:
+                    self.categories.discard(token, category_id)
+                self._count_tokens(old[2], -1)
+
+    # ---------------------- lookup ----------------------
+    def knows_prefix(self, prefix: str) -> bool:
+        """Whether any product, SKU, manufacturer or category token starts with ``prefix``."""
+        with self.lock:
+            return any(
+                trie.has_prefix(prefix)
+                for trie in (self.products, self.skus, self.manufacturers, self.categories)
+            )
+
+    def _collect(self, trie: PrefixTrie, entries: dict, tokens_of, prefix: str, head: list[str], limit: int) -> list:
+        found = []
+        budget = limit * MAX_CANDIDATES_PER_RESULT
+        for entry_id in trie.iter_prefix(prefix):
+            budget -= 1
+            if budget < 0:
+                break
+            entry = entries.get(entry_id)
+            if entry is None:
+                continue
+            if head and not _matches_all(tokens_of(entry), head):
+                continue
+            found.append((entry_id, entry))
+            if len(found) >= limit:
+                break
+        return found
+
+    def suggest(self, query: str, limit: int = DEFAULT_LIMIT) -> dict:
+        tokens = tokenize(query)
+        result = {"products": [], "skus": [], "manufacturers": [], "categories": []}
+        if not tokens:
+            return result
+        # Walk the trie for the longest (most selective) token and check the
+        # others against each candidate's tokens; every token is a prefix.
+        driver = max(reversed(range(len(tokens))), key=lambda i: len(tokens[i]))
+        prefix = tokens[driver]
+        head = tokens[:driver] + tokens[driver + 1:]
+        with self.lock:
+            for pid, (name, slug, sku, *_rest) in self._collect(
+                self.products, self.product_entries, lambda e: e[6], prefix, head, limit
+            ):
+                result["products"].append({"id": pid, "name": name, "slug": slug, "sku": sku})
+            for pid, (name, slug, sku, *_rest) in self._collect(
+                self.skus, self.product_entries, lambda e: e[5], prefix, head, limit
+            ):
+                result["skus"].append({"id": pid, "sku": sku, "name": name, "slug": slug})
+            for _key, (name, count, _tokens) in self._collect(
+                self.manufacturers, self.manufacturer_entries, lambda e: e[2], prefix, head, limit
+            ):
+                result["manufacturers"].append({"name": name, "count": count})
+            for cid, (name, slug, _tokens) in self._collect(
+                self.categories, self.category_entries, lambda e: e[2], prefix, head, limit
+            ):
+                result["categories"].append({"id": cid, "name": name, "slug": slug})
+        return result
+
+
+_index: SuggestIndex | None = None
+_index_lock = threading.Lock()
+_catch_up_lock = threading.Lock()
+_rebuild_thread: threading.Thread | None = None
+
+
+def get_index() -> SuggestIndex:
+    """Return this process's index.
+
+    Only the first call builds synchronously. An index behind the catalog
+    version catches up with the recorded changes, or is still returned
+    while a background rebuild replaces it.
+    """
+    global _index
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SuggestIndex.from_db()
+            return _index
+    current = catalog_version()
+    if index.version != current and not _catch_up(index, current) and _rebuild_due(index):
+        if getattr(settings, "SUGGEST_BACKGROUND_REBUILD", True):
+            _start_rebuild()
+        else:
+            _rebuild()
+    return _index
+
+
+def _rebuild_due(index: SuggestIndex) -> bool:
+    """At most one full rebuild per ``SUGGEST_REBUILD_INTERVAL`` seconds."""
+    interval = getattr(settings, "SUGGEST_REBUILD_INTERVAL", REBUILD_INTERVAL)
+    return index.built_at is None or time.monotonic() - index.built_at >= interval
+
+
+def _catch_up(index: SuggestIndex, current: int) -> bool:
+    """Apply the changes recorded up to version ``current``; False when a rebuild is needed."""
+    if not _catch_up_lock.acquire(blocking=False):
+        return True  # another thread is applying them; serve the index meanwhile
+    try:
+        changes = None
+        if index.version is not None and current - index.version <= MAX_CATCH_UP_VERSIONS:
+            changes = catalog_changes(index.version, current)
+        if changes is None or sum(map(len, changes)) > MAX_CATCH_UP_ROWS:
+            return False
+        index.refresh(*changes)
+        index.version = current
+        return True
+    finally:
+        _catch_up_lock.release()
+
+
+def _rebuild() -> None:
+    global _index
+    index = SuggestIndex.from_db()
+    with _index_lock:
+        # Keep a newer index built meanwhile
+        if _index is None or _index.version is None or _index.version <= index.version:
+            _index = index
+
+
+def _rebuild_in_background() -> None:
+    global _rebuild_thread
+    try:
+        _rebuild()
+    except Exception:  # pragma: no cover - logged, the old index keeps serving
+        logger.exception("Suggest index rebuild failed")
+    finally:
+        connections.close_all()
+        with _index_lock:
+            _rebuild_thread = None
+
+
+def _start_rebuild() -> None:
+    global _rebuild_thread
+    with _index_lock:
+        if _rebuild_thread is not None:
+            return
+        _rebuild_thread = threading.Thread(target=_rebuild_in_background, name="suggest-rebuild", daemon=True)
+        _rebuild_thread.start()
+
+
+def reset_index() -> None:
+    global _index
+    _index = None
+
+
+def catalog_bumped(version: int) -> None:
+    """Adopt ``version`` after a local write that the index already reflects.
+
+    Writers patch the index themselves, so their own catalog version bump
+    need not be re-read. Skipped when another process bumped the version in
+    between: the index then catches up with the recorded changes.
+    """
+    if _index is not None and _index.version == version - 1:
+        _index.version = version
+
+
+def product_changed(product) -> None:
+    if _index is not None:
+        _index.put_product(product.pk, product.name, product.slug, product.sku, product.manufacturer)
+
+
+def product_deleted(product_id: int) -> None:
+    if _index is not None:
+        _index.remove_product(product_id)
+
+
+def category_changed(category) -> None:
+    if _index is not None:
+        _index.put_category(category.pk, category.name, category.slug)
+
+
+def category_deleted(category_id: int) -> None:
+    if _index is not None:
+        _index.remove_category(category_id)
@@ -1,7 +1,30 @@
-from django.test import TestCase
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
 
-from .models import Category, Product
+from . import fts, suggest
+from .models import Category, Product, guess_category_slug
+from .serializers import ProductSerializer
+
+
+@contextmanager
+def product_updates():
+    """Rows affected by each ``UPDATE catalog_product`` run in the block (``None`` for executemany)."""
+    counts = []
+
+    def record(execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if sql.startswith('UPDATE "catalog_product" SET'):
+            counts.append(None if many else context["cursor"].rowcount)
+        return result
+
+    with connection.execute_wrapper(record):
+        yield counts
 
 
 class CatalogSiteTests(TestCase):
@@ -65,3 +88,1206 @@ class CatalogSiteTests(TestCase):
         resp = self.client.get(f'/parts/{self.p1.slug}/')
         self.assertEqual(resp.status_code, 200)
         self.assertContains(resp, self.p1.name)
+
+
+class CatalogSearchIndexTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.product = Product.objects.create(
+            name="Масляный фильтр Bosch",
+            slug="oil-filter-bosch",
+            sku="OIL-123",
+            manufacturer="Bosch",
+            price=Decimal("890.00"),
+            in_stock=3,
+            category=self.cat,
+        )
+
+    def test_cyrillic_prefix_and_category_search(self):
+        resp = self.client.get('/api/products/?search=МАСЛ')
+        self.assertEqual(resp.json()['count'], 1)
+        resp = self.client.get('/api/products/?search=фильтры')
+        self.assertEqual(resp.json()['count'], 1)
+        resp = self.client.get('/api/products/?search=oil-123')
+        self.assertEqual(resp.json()['count'], 1)
+        resp = self.client.get('/api/products/?search=тормоз')
+        self.assertEqual(resp.json()['count'], 0)
+
+    def test_index_follows_product_and_category_saves(self):
+        self.product.name = "Воздушный фильтр Bosch"
+        self.product.save()
+        self.assertEqual(self.client.get('/api/products/?search=масляный').json()['count'], 0)
+        self.assertEqual(self.client.get('/api/products/?search=воздушный').json()['count'], 1)
+        self.cat.name = "Расходники"
+        self.cat.save()
+        self.assertEqual(self.client.get('/api/products/?search=расход').json()['count'], 1)
+
+
+class CatalogFTSTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Тормозная система", slug="tormoza")
+        self.pads = Product.objects.create(
+            name="Тормозные колодки Brembo",
+            slug="brembo-pads",
+            sku="BRK-1",
+            description="Колодки передние",
+            manufacturer="Brembo",
+            price=Decimal("3450.00"),
+            category=self.cat,
+        )
+        self.disc = Product.objects.create(
+            name="Тормозной диск ATE",
+            slug="ate-disc",
+            sku="BRK-2",
+            description="Подходит к колодкам Brembo",
+            manufacturer="ATE",
+            price=Decimal("2500.00"),
+            category=self.cat,
+        )
+
+    def test_results_ordered_by_relevance(self):
+        if not fts.is_available():
+            self.skipTest("SQLite FTS5 is not available")
+        resp = self.client.get('/api/products/?search=brembo')
+        slugs = [p['slug'] for p in resp.json()['results']]
+        # Name/manufacturer hits outrank a description-only mention
+        self.assertEqual(slugs, [self.pads.slug, self.disc.slug])
+        resp = self.client.get('/api/products/?search=brembo&sort=-price')
+        self.assertEqual([p['slug'] for p in resp.json()['results']], [self.pads.slug, self.disc.slug])
+        resp = self.client.get('/api/products/?search=brembo&sort=price')
+        self.assertEqual([p['slug'] for p in resp.json()['results']], [self.disc.slug, self.pads.slug])
+
+    def test_fts_row_removed_with_product(self):
+        self.disc.delete()
+        resp = self.client.get('/catalog/?search=ate')
+        self.assertNotContains(resp, "Тормозной диск ATE")
+
+    def test_rebuild_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("2 products", out.getvalue())
+        self.assertEqual(self.client.get('/api/products/?search=колодк').json()['count'], 2)
+
+
+class CatalogQueryTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Электрика", slug="elektrika")
+        self.product = Product.objects.create(
+            name="Generator Valeo",
+            slug="valeo-gen",
+            sku="GEN-1",
+            manufacturer="Valeo",
+            price=Decimal("1500.00"),
+            category=self.cat,
+        )
+
+    def test_strategy_reported_for_api_and_site(self):
+        resp = self.client.get('/api/products/')
+        self.assertEqual(resp['X-Catalog-Strategy'], 'all')
+        resp = self.client.get('/catalog/?search=valeo')
+        expected = 'fts' if fts.is_available() else 'index'
+        self.assertEqual(resp['X-Catalog-Strategy'], expected)
+
+    def test_invalid_price_is_ignored(self):
+        resp = self.client.get('/api/products/?price_min=abc')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['count'], 1)
+
+    @override_settings(CATALOG_SEARCH_BACKEND='like')
+    def test_like_results_cached_until_catalog_changes(self):
+        resp = self.client.get('/api/products/?search=valeo')
+        self.assertEqual(resp['X-Catalog-Strategy'], 'like')
+        self.assertEqual(resp.json()['count'], 1)
+        # Another sort is a different listing, but the LIKE match ids are reused
+        resp = self.client.get('/api/products/?search=valeo&sort=price')
+        self.assertEqual(resp['X-Catalog-Strategy'], 'cache')
+        self.assertEqual(resp.json()['count'], 1)
+        # Kept in the shared catalog alias, not the per-process default cache
+        cache.clear()
+        resp = self.client.get('/api/products/?search=valeo&sort=-price')
+        self.assertEqual(resp['X-Catalog-Strategy'], 'cache')
+        self.product.manufacturer = "Bosch"
+        self.product.name = "Generator Bosch"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        resp = self.client.get('/api/products/?search=valeo')
+        self.assertEqual(resp['X-Catalog-Strategy'], 'like')
+        self.assertEqual(resp.json()['count'], 0)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Фильтры", slug="filtry")
+        prices = ["100.00", "300.00", "300.00", "200.00", "300.00"]
+        for i, price in enumerate(prices):
+            Product.objects.create(
+                name=f"Фильтр {i % 2}",
+                slug=f"filter-{i}",
+                sku=f"F-{i}",
+                price=Decimal(price),
+                category=cat,
+            )
+
+    def _walk(self, sort: str) -> list[str]:
+        slugs = []
+        url = f'/api/products/?sort={sort}&page_size=2&cursor='
+        while url:
+            data = self.client.get(url).json()
+            self.assertNotIn('count', data)
+            slugs.extend(p['slug'] for p in data['results'])
+            url = data['next']
+        return slugs
+
+    def test_cursor_pages_follow_sort_key_then_id(self):
+        orderings = {
+            "name": ("name", "id"),
+            "price": ("price", "id"),
+            "-price": ("-price", "-id"),
+            "new": ("-created_at", "-id"),
+            "-new": ("created_at", "id"),
+        }
+        for sort, ordering in orderings.items():
+            expected = list(Product.objects.order_by(*ordering).values_list("slug", flat=True))
+            self.assertEqual(self._walk(sort), expected, sort)
+
+    def test_cursor_page_is_single_query(self):
+        first = self.client.get('/api/products/?sort=price&page_size=2&cursor=').json()
+        with self.assertNumQueries(1):
+            resp = self.client.get(first['next'])
+        self.assertEqual(resp.status_code, 200)
+
+    def test_invalid_cursor(self):
+        resp = self.client.get('/api/products/?cursor=not-a-cursor')
+        self.assertEqual(resp.status_code, 404)
+
+
+class CatalogPageTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Фильтры", slug="filtry")
+        for i in range(30):
+            Product.objects.create(
+                name=f"Фильтр {i:02d}",
+                slug=f"filter-{i}",
+                sku=f"F-{i}",
+                price=Decimal("100.00"),
+                category=cat,
+            )
+
+    def test_first_page_renders_one_batch_with_load_more(self):
+        resp = self.client.get('/catalog/?category=filtry')
+        self.assertEqual(resp.context['total_count'], 30)
+        self.assertEqual(len(resp.context['page_obj']), 24)
+        self.assertContains(resp, 'Фильтр 23')
+        self.assertNotContains(resp, 'Фильтр 24')
+        self.assertContains(resp, 'hx-get="?category=filtry&amp;page=2"')
+
+    def test_htmx_request_returns_card_fragment(self):
+        resp = self.client.get('/catalog/?category=filtry&page=2', HTTP_HX_REQUEST='true')
+        self.assertContains(resp, 'Фильтр 29')
+        self.assertNotContains(resp, 'Фильтр 00')
+        self.assertNotContains(resp, '<html')
+        self.assertNotContains(resp, 'hx-trigger="revealed"')
+
+    def test_single_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/catalog/?goto=1')
+        counts = [q['sql'] for q in ctx.captured_queries if 'COUNT(' in q['sql']]
+        self.assertEqual(len(counts), 1)
+
+
+class VehicleFitmentTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.corolla = Product.objects.create(
+            name="Масляный фильтр Corolla",
+            slug="filter-corolla",
+            sku="F-COR",
+            price=Decimal("500.00"),
+            category=cat,
+            compatibility=[{"make": "Toyota", "model": "Corolla", "year": 2015}],
+        )
+        self.universal = Product.objects.create(
+            name="Воздушный фильтр Toyota",
+            slug="filter-toyota",
+            sku="F-TOY",
+            price=Decimal("700.00"),
+            category=cat,
+            compatibility=[{"make": "toyota", "model": "RAV4", "year": "2012-2016"}, {"make": "Toyota", "model": "Corolla"}],
+        )
+
+    def _slugs(self, query):
+        return sorted(p['slug'] for p in self.client.get(f'/api/products/?{query}').json()['results'])
+
+    def test_fitment_rows_follow_compatibility(self):
+        self.assertEqual(self.corolla.fitments.count(), 1)
+        self.assertEqual(self.universal.fitments.filter(model_key="rav4").count(), 5)
+        self.corolla.compatibility = [{"make": "Honda", "model": "Civic", "year": 2018}]
+        self.corolla.save()
+        self.assertEqual(list(self.corolla.fitments.values_list("make_key", flat=True)), ["honda"])
+
+    def test_make_model_year_filters(self):
+        self.assertEqual(self._slugs('make=TOYOTA'), ['filter-corolla', 'filter-toyota'])
+        self.assertEqual(self._slugs('make=toyota&model=corolla&year=2015'), ['filter-corolla', 'filter-toyota'])
+        self.assertEqual(self._slugs('make=toyota&model=corolla&year=2010'), ['filter-toyota'])
+        self.assertEqual(self._slugs('make=toyota&model=rav4&year=2017'), [])
+        resp = self.client.get('/catalog/?make=Toyota&model=RAV4&year=2013')
+        self.assertContains(resp, self.universal.name)
+        self.assertNotContains(resp, self.corolla.name)
+
+    def test_blank_model_fits_every_model_of_the_make(self):
+        Product.objects.create(name="Щётки Toyota", slug="wipers-toyota", sku="W-TOY", price=Decimal("900.00"),
+                               category=self.corolla.category, compatibility=[{"make": "Toyota", "year": 2015}])
+        self.assertEqual(self._slugs('make=toyota&model=corolla&year=2015'),
+                         ['filter-corolla', 'filter-toyota', 'wipers-toyota'])
+        self.assertEqual(self._slugs('make=toyota&model=camry'), ['wipers-toyota'])
+        self.assertEqual(self._slugs('make=toyota&model=camry&year=2016'), [])
+
+
+class GarageFilterTests(TestCase):
+    def setUp(self):
+        from apps.accounts.models import GarageVehicle
+
+        cache.clear()
+        cat = Category.objects.create(name="Подвеска", slug="podveska")
+        self.camry = Product.objects.create(
+            name="Амортизатор Camry",
+            slug="shock-camry",
+            sku="S-CAM",
+            price=Decimal("5000.00"),
+            category=cat,
+            compatibility=[{"make": "Toyota", "model": "Camry", "year": 2018}],
+        )
+        self.civic = Product.objects.create(
+            name="Амортизатор Civic",
+            slug="shock-civic",
+            sku="S-CIV",
+            price=Decimal("4000.00"),
+            category=cat,
+            compatibility=[{"make": "Honda", "model": "Civic"}],
+        )
+        Product.objects.create(name="Амортизатор BMW", slug="shock-bmw", sku="S-BMW", price=Decimal("9000.00"), category=cat)
+        self.user = get_user_model().objects.create_user(email='garage@test.com', password='pass1234')
+        self.camry_car = GarageVehicle.objects.create(user=self.user, make="toyota", model="camry", year=2018)
+        self.civic_car = GarageVehicle.objects.create(user=self.user, make="Honda", model="Civic", year=2020)
+        self.client.force_login(self.user)
+
+    def _slugs(self, garage):
+        return sorted(p['slug'] for p in self.client.get(f'/api/products/?garage={garage}').json()['results'])
+
+    def test_garage_filters(self):
+        self.assertEqual(self._slugs('all'), ['shock-camry', 'shock-civic'])
+        self.assertEqual(self._slugs(self.camry_car.id), ['shock-camry'])
+        resp = self.client.get(f'/catalog/?garage={self.civic_car.id}')
+        self.assertContains(resp, 'Амортизатор Civic')
+        self.assertNotContains(resp, 'Амортизатор Camry')
+
+    def test_other_users_vehicle_and_anonymous_get_nothing(self):
+        other = get_user_model().objects.create_user(email='other@test.com', password='pass1234')
+        self.client.force_login(other)
+        self.assertEqual(self._slugs(self.camry_car.id), [])
+        self.client.logout()
+        self.assertEqual(self._slugs('all'), [])
+
+    def test_cached_sets_invalidated_on_product_change(self):
+        self.assertEqual(self._slugs(self.camry_car.id), ['shock-camry'])
+        self.camry.compatibility = [{"make": "Toyota", "model": "Corolla", "year": 2018}]
+        self.camry.save()
+        self.assertEqual(self._slugs(self.camry_car.id), [])
+        self.civic.compatibility = [{"make": "Toyota", "model": "Camry"}]
+        self.civic.save()
+        self.assertEqual(self._slugs(self.camry_car.id), ['shock-civic'])
+
+    def test_blank_model_fits_every_model_of_the_make(self):
+        from unittest import mock
+
+        from . import compatibility
+
+        self.assertEqual(self._slugs(self.camry_car.id), ['shock-camry'])
+        # Cached sets are dropped when a make-wide part appears
+        Product.objects.create(name="Коврики Toyota", slug="mats-toyota", sku="M-TOY", price=Decimal("2000.00"),
+                               category=self.camry.category, compatibility=[{"make": "Toyota"}])
+        self.assertEqual(self._slugs(self.camry_car.id), ['mats-toyota', 'shock-camry'])
+        self.assertEqual(self._slugs(self.civic_car.id), ['shock-civic'])
+        with mock.patch.object(compatibility, 'GARAGE_MAX_IDS', 1):
+            self.assertEqual(self._slugs(self.camry_car.id), ['mats-toyota', 'shock-camry'])
+
+    def test_large_garage_uses_fitment_subquery(self):
+        from unittest import mock
+
+        from django.core.cache import caches
+        from . import compatibility
+
+        self.assertEqual(self._slugs('all'), ['shock-camry', 'shock-civic'])
+        key = compatibility.vehicle_set_key('toyota', 'camry')
+        self.assertEqual(caches['catalog'].get(key), [(self.camry.id, 2018)])
+        with mock.patch.object(compatibility, 'GARAGE_MAX_IDS', 1), CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._slugs('all'), ['shock-camry', 'shock-civic'])
+        self.assertTrue([q for q in ctx.captured_queries if 'catalog_vehiclefitment' in q['sql'] and 'catalog_product' in q['sql']])
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        filters = Category.objects.create(name="Фильтры", slug="filtry")
+        brakes = Category.objects.create(name="Тормоза", slug="tormoza")
+        Product.objects.create(name="Фильтр A", slug="f-a", sku="F-A", manufacturer="Bosch", price=Decimal("500.00"), in_stock=1, category=filters)
+        Product.objects.create(name="Фильтр B", slug="f-b", sku="F-B", manufacturer="MANN", price=Decimal("1500.00"), in_stock=0, category=filters)
+        Product.objects.create(name="Колодки", slug="b-a", sku="B-A", manufacturer="Bosch", price=Decimal("12000.00"), in_stock=4, category=brakes)
+
+    def test_api_facets_are_opt_in(self):
+        self.assertNotIn('facets', self.client.get('/api/products/').json())
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/api/products/?facets=1').json()
+        # cached listing: page by ids + one facet aggregation
+        self.assertEqual(len(ctx.captured_queries), 2)
+        facets = data['facets']
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual({c['slug']: c['count'] for c in facets['categories']}, {'filtry': 2, 'tormoza': 1})
+        self.assertEqual(facets['manufacturers'][0], {'name': 'Bosch', 'count': 2})
+        self.assertEqual([b['count'] for b in facets['price']], [1, 1, 0, 0, 1])
+        self.assertEqual(facets['in_stock'], {'in_stock': 2, 'out_of_stock': 1})
+
+    def test_facets_follow_filters(self):
+        facets = self.client.get('/api/products/?facets=1&manufacturer=Bosch').json()['facets']
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(facets['manufacturers'], [{'name': 'Bosch', 'count': 2}])
+
+    def test_site_catalog_shows_counts(self):
+        resp = self.client.get('/catalog/?category=filtry')
+        self.assertEqual(resp.context['facets']['total'], 2)
+        self.assertContains(resp, '/catalog/?category=filtry&amp;manufacturer=MANN')
+
+
+class SearchSuggestTests(TestCase):
+    def setUp(self):
+        suggest.reset_index()
+        self.cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.product = Product.objects.create(
+            name="Масляный фильтр Bosch 0 986",
+            slug="oil-filter-bosch",
+            sku="OIL-FLTR-0123",
+            manufacturer="Bosch",
+            price=Decimal("890.00"),
+            category=self.cat,
+        )
+        Product.objects.create(name="Масло моторное Shell", slug="shell-oil", sku="SH-1", manufacturer="Shell",
+                               price=Decimal("2790.00"), category=self.cat)
+
+    def tearDown(self):
+        suggest.reset_index()
+
+    def _get(self, q):
+        resp = self.client.get('/api/search/suggest/', {'q': q})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_prefix_suggestions_per_group(self):
+        data = self._get('мас')
+        self.assertEqual(sorted(p['slug'] for p in data['products']), ['oil-filter-bosch', 'shell-oil'])
+        self.assertEqual([p['slug'] for p in self._get('масл bos')['products']], ['oil-filter-bosch'])
+        self.assertEqual([p['sku'] for p in self._get('oilfltr')['skus']], ['OIL-FLTR-0123'])
+        self.assertEqual(self._get('BOS')['manufacturers'], [{'name': 'Bosch', 'count': 1}])
+        self.assertEqual([c['slug'] for c in self._get('фил')['categories']], ['filtry'])
+        self.assertEqual(self._get('')['products'], [])
+
+    def test_index_follows_signals(self):
+        self._get('мас')  # build
+        self.product.name = "Воздушный фильтр Bosch"
+        self.product.save()
+        self.assertEqual([p['slug'] for p in self._get('мас')['products']], ['shell-oil'])
+        self.assertEqual([p['slug'] for p in self._get('возд')['products']], ['oil-filter-bosch'])
+        self.product.delete()
+        self.assertEqual(self._get('возд')['products'], [])
+        self.assertEqual(self._get('bosch')['manufacturers'], [])
+
+    @override_settings(SUGGEST_REBUILD_INTERVAL=0)
+    def test_stale_index_served_during_background_rebuild(self):
+        import threading
+        from unittest import mock
+
+        from .cache import bump_catalog_version
+
+        old = suggest.get_index()
+        bump_catalog_version()  # e.g. an import in another process
+        release = threading.Event()
+        fresh = suggest.SuggestIndex.build([(1, "Новый товар", "new", "NEW-1", "")], [])
+        fresh.version = old.version + 1
+
+        def slow_build():
+            release.wait(5)
+            return fresh
+
+        with mock.patch.object(suggest.SuggestIndex, 'from_db', side_effect=slow_build):
+            self.assertIs(suggest.get_index(), old)
+            thread = suggest._rebuild_thread
+            self.assertIsNotNone(thread)
+            self.assertIs(suggest.get_index(), old)  # one rebuild at a time
+            release.set()
+            thread.join(5)
+        self.assertIs(suggest.get_index(), fresh)
+
+    def test_changes_from_other_processes_are_applied_without_rebuild(self):
+        from unittest import mock
+
+        from .cache import bump_catalog_version
+
+        index = suggest.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Воздушный фильтр Bosch"
+            self.product.save()
+            # Another process renames a product between the local save and its version bump
+            Product.objects.filter(slug="shell-oil").update(name="Антифриз Shell")
+            bump_catalog_version(products=[Product.objects.get(slug="shell-oil").pk])
+        # The local bump is not adopted: that would swallow the other process's change
+        self.assertEqual(index.version, suggest.catalog_version() - 2)
+        with mock.patch.object(suggest.SuggestIndex, 'from_db', side_effect=AssertionError("rebuilt")):
+            self.assertIs(suggest.get_index(), index)
+            self.assertEqual([p['slug'] for p in self._get('антиф')['products']], ['shell-oil'])
+            self.assertEqual(self._get('мас')['products'], [])
+            self.assertEqual([p['slug'] for p in self._get('возд')['products']], ['oil-filter-bosch'])
+
+    def test_unknown_changes_rebuild_at_most_once_per_interval(self):
+        from unittest import mock
+
+        from .cache import bump_catalog_version
+
+        index = suggest.get_index()
+        bump_catalog_version()  # no change record, e.g. it expired
+        with mock.patch.object(suggest.SuggestIndex, 'from_db', side_effect=AssertionError("rebuilt")):
+            self.assertIs(suggest.get_index(), index)
+        with override_settings(SUGGEST_REBUILD_INTERVAL=0, SUGGEST_BACKGROUND_REBUILD=False):
+            self.assertIsNot(suggest.get_index(), index)
+
+
+class ProductCodeTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.product = Product.objects.create(
+            name="Воздушный фильтр Mann C 35 154",
+            slug="mann-c35154",
+            sku="MN-C35154",
+            manufacturer="Mann",
+            price=Decimal("1290.00"),
+            category=self.cat,
+        )
+
+    def test_codes_from_sku_and_name(self):
+        self.assertEqual(
+            set(self.product.codes.values_list('code', 'kind')),
+            {('mnc35154', 'sku'), ('c35154', 'oem')},
+        )
+        self.product.sku = "MN-2"
+        self.product.save()
+        self.assertIn(('mn2', 'sku'), set(self.product.codes.values_list('code', 'kind')))
+
+    def test_pasted_code_uses_code_strategy(self):
+        resp = self.client.get('/api/products/', {'search': 'c35-154'})
+        self.assertEqual(resp['X-Catalog-Strategy'], 'code')
+        self.assertEqual([p['slug'] for p in resp.json()['results']], ['mann-c35154'])
+
+    def test_goto_resolves_code_without_search(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/catalog/', {'search': 'mn c35154', 'goto': '1'})
+        self.assertRedirects(resp, '/parts/mann-c35154/', fetch_redirect_response=False)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        suggest.reset_index()
+        self.cat = Category.objects.create(name="Подвеска", slug="podveska")
+        Product.objects.create(name="Амортизатор передний", slug="amort", sku="AM-1", manufacturer="Kayaba",
+                               price=Decimal("4200.00"), category=self.cat)
+        Product.objects.create(name="Тормозные колодки", slug="brembo-pads", sku="BR-1", manufacturer="Brembo",
+                               price=Decimal("3100.00"), category=self.cat)
+
+    def tearDown(self):
+        suggest.reset_index()
+
+    def _slugs(self, q):
+        resp = self.client.get('/api/products/', {'search': q})
+        return resp['X-Catalog-Strategy'], [p['slug'] for p in resp.json()['results']], resp.json().get('corrected_search')
+
+    def test_typos_and_transliteration_fall_back_to_fuzzy(self):
+        self.assertEqual(self._slugs('амортизтор'), ('fuzzy', ['amort'], 'амортизатор'))
+        self.assertEqual(self._slugs('amortizator'), ('fuzzy', ['amort'], 'амортизатор'))
+        self.assertEqual(self._slugs('Брэмбо')[1], ['brembo-pads'])
+        self.assertEqual(self._slugs('qwxyz')[1], [])
+
+    def test_exact_match_skips_fuzzy(self):
+        strategy, slugs, corrected = self._slugs('амортизатор')
+        self.assertNotEqual(strategy, 'fuzzy')
+        self.assertEqual((slugs, corrected), (['amort'], None))
+        # The suggest index behind the fuzzy fallback was never loaded
+        self.assertIsNone(suggest._index)
+
+    def test_edit_distance_bound(self):
+        from .fuzzy import edit_distance
+        self.assertEqual(edit_distance('колодки', 'колодик', 2), 1)
+        self.assertEqual(edit_distance('mann', 'valeo', 2), 3)
+
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        self.filters = Category.objects.create(name="Фильтры", slug="filtry")
+        self.brakes = Category.objects.create(name="Тормоза", slug="tormoza")
+        self.filter = Product.objects.create(name="Фильтр A", slug="f-a", sku="F-A", price=Decimal("500.00"),
+                                             category=self.filters)
+        Product.objects.create(name="Колодки", slug="b-a", sku="B-A", price=Decimal("1200.00"), category=self.brakes)
+
+    def test_listing_served_from_cache_until_category_changes(self):
+        resp = self.client.get('/api/products/?category=tormoza')
+        self.assertEqual(resp['X-Catalog-Cache'], 'miss')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/api/products/?category=tormoza')
+        self.assertEqual(resp['X-Catalog-Cache'], 'hit')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual([p['slug'] for p in resp.json()['results']], ['b-a'])
+
+        # A change in another category keeps the entry, the catalog-wide listing is dropped
+        self.client.get('/api/products/')
+        self.filter.price = Decimal("600.00")
+        self.filter.save()
+        self.assertEqual(self.client.get('/api/products/?category=tormoza')['X-Catalog-Cache'], 'hit')
+        self.assertEqual(self.client.get('/api/products/')['X-Catalog-Cache'], 'miss')
+
+        self.filter.category = self.brakes
+        self.filter.save()
+        resp = self.client.get('/api/products/?category=tormoza')
+        self.assertEqual(resp['X-Catalog-Cache'], 'miss')
+        self.assertEqual(resp.json()['count'], 2)
+
+    def test_category_rename_uses_loaded_slug(self):
+        self.assertEqual(self.client.get('/api/products/?category=tormoza')['X-Catalog-Cache'], 'miss')
+        category = Category.objects.get(pk=self.brakes.pk)
+        category.slug = 'brakes'
+        with CaptureQueriesContext(connection) as ctx:
+            category.save()
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "catalog_category"' in q['sql']])
+        # The listing under the old slug was invalidated
+        self.assertEqual(self.client.get('/api/products/?category=tormoza').json()['count'], 0)
+        category.slug = 'tormoza'
+        category.save()
+        self.assertEqual(self.client.get('/api/products/?category=tormoza').json()['count'], 1)
+
+    def test_stats_endpoint_is_staff_only(self):
+        from . import result_cache
+
+        result_cache.reset_stats()
+        self.client.get('/api/products/?category=filtry')
+        self.client.get('/api/products/?category=filtry')
+        self.assertEqual(self.client.get('/api/catalog/cache-stats/').status_code, 403)
+        admin = get_user_model().objects.create_user(email='staff@test.com', password='pass1234', is_staff=True)
+        self.client.force_login(admin)
+        data = self.client.get('/api/catalog/cache-stats/').json()
+        self.assertEqual((data['hits'], data['misses']), (1, 1))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.product = Product.objects.create(name="Фильтр", slug="flt", sku="FLT-1", price=Decimal("500.00"),
+                                              category=self.cat)
+
+    def test_product_detail_not_modified_until_saved(self):
+        resp = self.client.get('/api/products/flt/')
+        etag, last_modified = resp['ETag'], resp['Last-Modified']
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/api/products/flt/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(self.client.get('/api/products/flt/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.product.price = Decimal("550.00")
+        self.product.save()
+        self.assertEqual(self.client.get('/api/products/flt/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_follows_catalog_version(self):
+        for url in ('/api/products/?sort=price', '/catalog/?sort=price'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            with self.captureOnCommitCallbacks(execute=True):
+                Product.objects.create(name="Фильтр 2", slug=f"flt-{len(url)}", sku=f"FLT-{len(url)}",
+                                       price=Decimal("700.00"), category=self.cat)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_uses_shared_catalog_cache(self):
+        from django.core.cache import caches
+        from .cache import VERSION_KEY
+
+        etag = self.client.get('/api/products/')['ETag']
+        # A bump from another process only reaches the shared alias
+        caches['catalog'].incr(VERSION_KEY)
+        cache.clear()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_follows_garage(self):
+        from apps.accounts.models import GarageVehicle
+
+        user = get_user_model().objects.create_user(email='garage-etag@test.com', password='pass1234')
+        self.client.force_login(user)
+        etag = self.client.get('/catalog/?garage=all')['ETag']
+        self.assertEqual(self.client.get('/catalog/?garage=all', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        GarageVehicle.objects.create(user=user, make="Toyota", model="Camry")
+        self.assertEqual(self.client.get('/catalog/?garage=all', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_page_etag_differs_per_user(self):
+        etag = self.client.get('/parts/flt/')['ETag']
+        user = get_user_model().objects.create_user(email='etag@test.com', password='pass1234')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/parts/flt/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CardFragmentCacheTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.product = Product.objects.create(name="Фильтр", slug="flt", sku="FLT-1", price=Decimal("500.00"),
+                                              category=self.cat)
+
+    def test_card_cached_and_replaced_on_save(self):
+        from .fragments import card_keys
+        from .result_cache import result_cache
+
+        self.client.get('/catalog/')
+        old_keys = card_keys(self.product.id, self.product.updated_at)
+        self.assertIn('500.00 ₽', result_cache().get(old_keys[0]))
+        self.product.price = Decimal("650.00")
+        self.product.save()
+        self.assertIsNone(result_cache().get(old_keys[0]))
+        self.assertContains(self.client.get('/catalog/'), '650.00 ₽')
+        self.assertContains(self.client.get('/'), '650.00 ₽')
+        self.assertIsNotNone(result_cache().get(card_keys(self.product.id, self.product.updated_at)[1]))
+
+
+class FastSerializerTests(TestCase):
+    def test_rows_serialize_like_product_serializer(self):
+        from rest_framework.renderers import JSONRenderer
+
+        from .serializers import PRODUCT_ROW_FIELDS, ProductSerializer, serialize_product_rows
+
+        cat = Category.objects.create(name="Фильтры", slug="filtry")
+        Product.objects.create(name="Фильтр", slug="flt", sku="FLT-1", price=Decimal("1234.5"), in_stock=3,
+                               images=["/a.png"], compatibility=[{"make": "Lada", "model": "Vesta", "year": 2020}],
+                               category=cat)
+        qs = Product.objects.select_related("category")
+        self.assertEqual(
+            JSONRenderer().render(serialize_product_rows(qs.values(*PRODUCT_ROW_FIELDS))),
+            JSONRenderer().render(ProductSerializer(qs, many=True).data),
+        )
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Фильтры", slug="filtry")
+        Product.objects.create(name="Фильтр", slug="flt", sku="FLT-1", price=Decimal("500.00"), in_stock=2,
+                               images=["/a.png", "/b.png"], description="long text", category=cat)
+
+    def test_list_fields_and_omit(self):
+        item = self.client.get('/api/products/', {'fields': 'id,name,slug,price,in_stock,images'}).json()['results'][0]
+        self.assertEqual(list(item), ['id', 'name', 'slug', 'price', 'in_stock', 'images'])
+        self.assertEqual(item['price'], '500.00')
+        item = self.client.get('/api/products/', {'omit': 'description,compatibility', 'cursor': ''}).json()['results'][0]
+        self.assertNotIn('description', item)
+        self.assertEqual(item['category']['slug'], 'filtry')
+
+    def test_detail_narrows_sql(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/api/products/flt/', {'fields': 'id,name,category'}).json()
+        self.assertEqual(data, {'id': data['id'], 'name': 'Фильтр', 'category': {'id': data['category']['id'], 'name': 'Фильтры', 'slug': 'filtry'}})
+        select = [q['sql'] for q in ctx.captured_queries if 'catalog_product"."name' in q['sql'] and 'JOIN' in q['sql']][0]
+        self.assertNotIn('"description"', select)
+
+    def test_detail_without_category(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/api/products/flt/', {'fields': 'name,price'})
+        self.assertEqual(resp.json(), {'name': 'Фильтр', 'price': '500.00'})
+        self.assertFalse([q for q in ctx.captured_queries if 'catalog_category' in q['sql']])
+        data = self.client.get('/api/products/flt/', {'omit': 'category'}).json()
+        self.assertNotIn('category', data)
+        self.assertEqual(data['sku'], 'FLT-1')
+
+    def test_unknown_or_empty_selection(self):
+        for params in ({'fields': 'bogus'}, {'fields': 'name,nmae'}, {'omit': 'descripton'}):
+            for url in ('/api/products/', '/api/products/flt/'):
+                resp = self.client.get(url, params)
+                self.assertEqual(resp.status_code, 400, (url, params))
+        self.assertEqual(self.client.get('/api/products/', {'fields': 'bogus'}).json(), {'fields': 'Unknown fields: bogus'})
+        everything = ','.join(ProductSerializer.Meta.fields)
+        resp = self.client.get('/api/products/', {'omit': everything})
+        self.assertEqual((resp.status_code, resp.json()['results']), (200, [{}]))
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.a = Product.objects.create(name="Фильтр A", slug="f-a", sku="F-A", price=Decimal("100.00"), category=cat)
+        self.b = Product.objects.create(name="Фильтр B", slug="f-b", sku="F-B", price=Decimal("200.00"), category=cat)
+
+    def test_mixed_keys_one_query_with_missing(self):
+        body = {'ids': [self.b.id, 999999], 'slugs': ['f-a', 'nope'], 'skus': ['F-B', 'X-1']}
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post('/api/products/batch/?fields=id,slug,price', body, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        data = resp.json()
+        self.assertEqual(data['results'], [
+            {'id': self.b.id, 'slug': 'f-b', 'price': '200.00'},
+            {'id': self.a.id, 'slug': 'f-a', 'price': '100.00'},
+        ])
+        self.assertEqual(data['missing'], {'ids': [999999], 'slugs': ['nope'], 'skus': ['X-1']})
+
+    def test_unknown_fields_and_batch_slug(self):
+        resp = self.client.post('/api/products/batch/?fields=id,bogus', {'ids': [self.a.id]}, content_type='application/json')
+        self.assertEqual((resp.status_code, resp.json()), (400, {'fields': 'Unknown fields: bogus'}))
+        from django.core.exceptions import ValidationError
+
+        product = Product.objects.create(name="Batch", sku="B-1", price=Decimal("1.00"), category=self.a.category)
+        self.assertEqual(product.slug, 'batch-b-1')
+        self.assertEqual(self.client.get('/api/products/batch-b-1/').json()['sku'], 'B-1')
+        product.slug = 'batch'
+        with self.assertRaises(ValidationError):
+            product.full_clean()
+
+    def test_limits(self):
+        self.assertEqual(self.client.post('/api/products/batch/', {}, content_type='application/json').status_code, 400)
+        too_many = {'ids': list(range(1, 502))}
+        self.assertEqual(self.client.post('/api/products/batch/', too_many, content_type='application/json').status_code, 400)
+
+
+class ProductFeedTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name="Фильтры & масла", slug="filtry")
+        self.old = Product.objects.create(name="Фильтр <A>", slug="f-a", sku="F-A", price=Decimal("100.50"),
+                                          in_stock=3, category=cat)
+        self.new = Product.objects.create(name="Фильтр B", slug="f-b", sku="F-B", price=Decimal("200.00"), category=cat)
+        Product.objects.filter(pk=self.old.pk).update(updated_at='2024-01-01T00:00:00Z')
+
+    def test_streaming_formats(self):
+        import csv
+        import io
+        import json
+        from xml.etree import ElementTree
+
+        resp = self.client.get('/api/feeds/products.yml')
+        self.assertTrue(resp.streaming)
+        self.assertIn('X-Feed-Generated-At', resp)
+        root = ElementTree.fromstring(b''.join(resp.streaming_content))
+        offers = root.findall('./shop/offers/offer')
+        self.assertEqual([o.get('id') for o in offers], [str(self.old.id), str(self.new.id)])
+        self.assertEqual(offers[0].findtext('name'), 'Фильтр <A>')
+        self.assertEqual(offers[0].findtext('price'), '100.50')
+        self.assertEqual(offers[1].get('available'), 'false')
+        self.assertEqual(root.findtext('./shop/categories/category'), 'Фильтры & масла')
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(self.client.get('/api/feeds/products.csv').streaming_content).decode())))
+        self.assertEqual([r['sku'] for r in rows], ['F-A', 'F-B'])
+        self.assertTrue(rows[0]['url'].endswith('/parts/f-a/'))
+
+        lines = b''.join(self.client.get('/api/feeds/products.jsonl').streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[1])['price'], '200.00')
+
+    def test_changed_since(self):
+        import json
+
+        resp = self.client.get('/api/feeds/products.jsonl', {'since': '2025-01-01'})
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['sku'] for line in lines], ['F-B'])
+        self.assertEqual(self.client.get('/api/feeds/products.jsonl', {'since': 'вчера'}).status_code, 400)
+
+    def test_export_command(self):
+        import io
+        import os
+        import tempfile
+
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'feed.csv')
+            call_command('export_feed', format='csv', output=path, since='2025-01-01T00:00:00', stderr=io.StringIO())
+            with open(path, encoding='utf-8') as fh:
+                self.assertEqual(len(fh.read().splitlines()), 2)
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.existing = Product.objects.create(name="Фильтр масляный Mann W 712", slug="mann-w712", sku="W712",
+                                               price=Decimal("500.00"), in_stock=1, category=self.cat)
+
+    def _import(self, content: bytes, fmt: str = 'csv', **kwargs):
+        import io
+
+        from .importer import import_file
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_file(io.BytesIO(content), fmt, **kwargs)
+
+    def test_csv_upsert_with_history_and_indexes(self):
+        from .models import PriceHistory, ProductChangeLog, ProductCode
+
+        content = (
+            "Артикул;Наименование;Цена;Остаток;Категория\n"
+            "W712;Фильтр масляный Mann W 712;1 250,50;7;filtry\n"
+            "OC-90;Фильтр масляный Knecht OC 90;800;3;Фильтры\n"
+            "BAD;Фильтр;abc;1;filtry\n"
+            "NEW-2;;100;1;filtry\n"
+        ).encode('utf-8')
+        report = self._import(content, chunk_size=2)
+        self.assertEqual((report.rows, report.created, report.updated, report.error_count), (4, 1, 1, 2))
+        self.assertEqual([line for line, _ in report.errors], [4, 5])
+
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.price, self.existing.in_stock), (Decimal("1250.50"), 7))
+        history = PriceHistory.objects.get(product=self.existing)
+        self.assertEqual((history.old_price, history.new_price, history.reason), (Decimal("500.00"), Decimal("1250.50"), "import"))
+        self.assertEqual(set(ProductChangeLog.objects.filter(product=self.existing).values_list('field', flat=True)),
+                         {'price', 'in_stock'})
+
+        new = Product.objects.get(sku="OC-90")
+        self.assertTrue(new.slug and new.images)
+        self.assertTrue(ProductCode.objects.filter(product=new, code="oc90").exists())
+        self.assertEqual(self.client.get('/api/products/', {'search': 'knecht'}).json()['count'], 1)
+        self.assertEqual(suggest.get_index().suggest('knec')['products'][0]['sku'], 'OC-90')
+
+    def test_price_only_file_and_unchanged_rows(self):
+        from .models import SearchToken
+
+        tokens = set(SearchToken.objects.filter(product=self.existing).values_list('token', flat=True))
+        self.assertEqual(self.client.get('/api/products/', {'sort': 'price'}).json()['results'][0]['price'], '500.00')
+        report = self._import(b'{"sku": "W712", "price": "450"}\n{"sku": "W712-X", "price": "1"}\n', 'jsonl')
+        self.assertEqual((report.updated, report.error_count), (1, 1))
+        self.assertEqual(set(SearchToken.objects.filter(product=self.existing).values_list('token', flat=True)), tokens)
+        # the cached listing was invalidated
+        self.assertEqual(self.client.get('/api/products/', {'sort': 'price'}).json()['results'][0]['price'], '450.00')
+        self.assertEqual(self._import(b'{"sku": "W712", "price": "450.00"}\n', 'jsonl').unchanged, 1)
+
+    def test_upsert_conflict_keeps_columns_missing_from_the_file(self):
+        from unittest import mock
+
+        Product.objects.filter(pk=self.existing.pk).update(description="Оригинал", manufacturer="Mann")
+        real_filter = Product.objects.filter
+        calls = []
+
+        def filter_(*args, **kwargs):
+            # The chunk's SELECT misses W712, as if another writer inserted it right after
+            calls.append(kwargs)
+            return Product.objects.none() if len(calls) == 1 else real_filter(*args, **kwargs)
+
+        with mock.patch.object(Product.objects, 'filter', side_effect=filter_):
+            report = self._import('{"sku": "W712", "name": "Фильтр W712", "price": "510", "category": "filtry"}\n'
+                                  .encode('utf-8'), 'jsonl')
+        self.assertEqual(report.created, 1)
+        product = Product.objects.get(sku="W712")
+        self.assertEqual((product.pk, product.name, product.price), (self.existing.pk, "Фильтр W712", Decimal("510.00")))
+        self.assertEqual((product.description, product.manufacturer, product.slug), ("Оригинал", "Mann", "mann-w712"))
+
+    def test_admin_upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        admin = get_user_model().objects.create_user(email='admin@test.com', password='pass1234',
+                                                     is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get('/admin/catalog/product/import/').status_code, 200)
+        upload = SimpleUploadedFile('prices.csv', b'sku,price\nW712,600\n', content_type='text/csv')
+        resp = self.client.post('/admin/catalog/product/import/', {'file': upload, 'reason': 'прайс поставщика'})
+        self.assertRedirects(resp, '/admin/catalog/product/')
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.price, Decimal("600.00"))
+        self.assertEqual(self.existing.price_history.get().changed_by, admin)
+
+    def test_xlsx_without_openpyxl_is_rejected_up_front(self):
+        import io
+        from unittest import mock
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.management import CommandError, call_command
+
+        from . import importer
+
+        admin = get_user_model().objects.create_user(email='admin@test.com', password='pass1234',
+                                                     is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        with mock.patch.object(importer, 'xlsx_supported', return_value=False), \
+                mock.patch.object(importer, 'import_rows') as import_rows:
+            upload = SimpleUploadedFile('prices.xlsx', b'PK', content_type='application/octet-stream')
+            resp = self.client.post('/admin/catalog/product/import/', {'file': upload, 'reason': 'import'})
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn('openpyxl', str(resp.context['form'].errors['file']))
+            with self.assertRaisesMessage(CommandError, 'openpyxl'):
+                call_command('import_catalog', 'missing.xlsx', stdout=io.StringIO())
+            import_rows.assert_not_called()
+
+    def test_new_products_without_category_are_categorized_by_name(self):
+        report = self._import(
+            '{"sku": "OC-91", "name": "Oil filter Knecht OC 91", "price": "700"}\n'
+            '{"sku": "P-1", "name": "Тормозные колодки ATE", "price": "900"}\n'.encode('utf-8'), 'jsonl',
+        )
+        self.assertEqual((report.created, report.categorized, report.error_count), (1, 1, 1))
+        self.assertEqual(Product.objects.get(sku="OC-91").category, self.cat)
+        self.assertIn("category", report.errors[0][1])
+
+
+class ProductChangeTrackingTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.other = Category.objects.create(name="Масла", slug="masla")
+        Product.objects.create(name="Фильтр", slug="flt", sku="F-1", price=Decimal("100.00"), category=self.cat,
+                               images=["https://example.com/a.jpg"])
+
+    def test_refresh_from_db_resets_snapshot(self):
+        from .models import PriceHistory, ProductChangeLog
+
+        product = Product.objects.get(slug="flt")
+        Product.objects.filter(pk=product.pk).update(price=Decimal("20.00"))
+        product.refresh_from_db()
+        product.in_stock = 3
+        product.save()
+        self.assertEqual(list(ProductChangeLog.objects.values_list('field', flat=True)), ['in_stock'])
+        self.assertFalse(PriceHistory.objects.exists())
+
+        Product.objects.filter(pk=product.pk).update(price=Decimal("30.00"))
+        product.refresh_from_db(fields=["price"])
+        product.save()
+        self.assertFalse(PriceHistory.objects.exists())
+
+    def test_save_uses_snapshot_and_one_insert_per_table(self):
+        from .models import PriceHistory, ProductChangeLog
+
+        product = Product.objects.get(slug="flt")
+        product.price = Decimal("120.00")
+        product.in_stock = 5
+        product.category = self.other
+        with CaptureQueriesContext(connection) as ctx:
+            product.save()
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertFalse([q for q in sql if q.startswith('SELECT') and 'FROM "catalog_product"' in q
+                          and 'WHERE "catalog_product"."id"' in q])
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "catalog_productchangelog"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "catalog_pricehistory"')]), 1)
+        self.assertEqual(set(ProductChangeLog.objects.values_list('field', flat=True)), {'price', 'in_stock', 'category_id'})
+        self.assertEqual(PriceHistory.objects.get().old_price, Decimal("100.00"))
+
+        # the snapshot follows the saved state
+        product.save()
+        self.assertEqual(ProductChangeLog.objects.count(), 3)
+
+    def test_in_place_edits_update_fields_and_unloaded_instances(self):
+        from .models import ProductChangeLog
+
+        product = Product.objects.get(slug="flt")
+        product.images.append("https://example.com/b.jpg")
+        product.name = "Фильтр масляный"
+        product.save(update_fields=["images"])
+        self.assertEqual(list(ProductChangeLog.objects.values_list('field', flat=True)), ['images'])
+
+        # an instance not loaded from the database is compared with the stored row
+        pk = product.pk
+        stale = Product.objects.get(pk=pk)
+        stale.__dict__.pop('_snapshot')
+        stale.in_stock = 9
+        stale.save()
+        self.assertTrue(ProductChangeLog.objects.filter(field='in_stock', new_value='9').exists())
+
+    def test_deferred_instances_log_only_loaded_fields(self):
+        product = Product.objects.only("id", "price", "slug").get(slug="flt")
+        product.price = Decimal("90.00")
+        product.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).change_logs.get().field, 'price')
+
+
+class RepricingTests(TestCase):
+    def setUp(self):
+        self.filters = Category.objects.create(name="Фильтры", slug="filtry")
+        self.oils = Category.objects.create(name="Масла", slug="masla")
+        self.a = Product.objects.create(name="Фильтр A", slug="f-a", sku="F-A", price=Decimal("104.00"),
+                                        manufacturer="Mann", category=self.filters)
+        self.b = Product.objects.create(name="Фильтр B", slug="f-b", sku="F-B", price=Decimal("1996.00"),
+                                        manufacturer="Bosch", category=self.filters)
+        self.c = Product.objects.create(name="Масло C", slug="m-c", sku="M-C", price=Decimal("500.00"),
+                                        manufacturer="Mann", category=self.oils)
+        self.admin = get_user_model().objects.create_user(email='admin@test.com', password='pass1234',
+                                                          is_staff=True, is_superuser=True)
+
+    def test_rules_and_rounding(self):
+        from .pricing import MODE_DELTA, MODE_PERCENT, RepricingRule
+
+        self.assertEqual(RepricingRule(MODE_PERCENT, Decimal("10")).apply(Decimal("104.00")), Decimal("114.40"))
+        self.assertEqual(RepricingRule(MODE_PERCENT, Decimal("10"), "10").apply(Decimal("104.00")), Decimal("110.00"))
+        self.assertEqual(RepricingRule(MODE_DELTA, Decimal("-4.50"), "1").apply(Decimal("104.00")), Decimal("100.00"))
+
+    def test_apply_is_set_based_with_history(self):
+        from .models import PriceHistory
+        from .pricing import MODE_PERCENT, RepricingRule, apply_repricing
+
+        Product.objects.create(name="Фильтр D", slug="f-d", sku="F-D", price=Decimal("96.00"), category=self.filters)
+        with product_updates() as updates, self.captureOnCommitCallbacks(execute=True):
+            result = apply_repricing(Product.objects.filter(category=self.filters), RepricingRule(MODE_PERCENT, Decimal("10"), "10"),
+                                     changed_by=self.admin, chunk_size=2)
+        self.assertEqual((result.matched, result.changed), (3, 3))
+        # One statement per chunk, each updating every product of its chunk
+        self.assertEqual(updates, [2, 1])
+        self.assertEqual(Product.objects.get(pk=self.a.pk).price, Decimal("110.00"))
+        self.assertEqual(Product.objects.get(pk=self.b.pk).price, Decimal("2200.00"))
+        self.assertEqual(Product.objects.get(pk=self.c.pk).price, Decimal("500.00"))
+        history = PriceHistory.objects.get(product=self.a)
+        self.assertEqual((history.old_price, history.new_price, history.changed_by), (Decimal("104.00"), Decimal("110.00"), self.admin))
+
+    def test_price_only_writes_keep_suggest_index_current(self):
+        from unittest import mock
+
+        from .cache import catalog_version
+        from .models import ScheduledPriceChange
+        from .pricing import MODE_PERCENT, RepricingRule, apply_repricing, apply_scheduled_changes
+
+        suggest.reset_index()
+        index = suggest.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_repricing(Product.objects.filter(pk=self.a.pk), RepricingRule(MODE_PERCENT, Decimal("5")))
+        with self.captureOnCommitCallbacks(execute=True):
+            ScheduledPriceChange.objects.create(product=self.b, value=Decimal("1000"), effective_at=self.a.updated_at)
+            apply_scheduled_changes()
+        self.assertEqual(index.version, catalog_version())
+        with mock.patch.object(suggest.SuggestIndex, 'from_db', side_effect=AssertionError("rebuilt")):
+            self.assertIs(suggest.get_index(), index)
+        suggest.reset_index()
+
+    def test_admin_preview_then_apply(self):
+        self.client.force_login(self.admin)
+        data = {'mode': 'delta', 'value': '-200', 'rounding': '0.01', 'manufacturer': 'mann'}
+        resp = self.client.post('/admin/catalog/product/reprice/', {**data, 'preview': '1'})
+        self.assertEqual(resp.status_code, 200)
+        preview = resp.context['preview']
+        self.assertEqual((preview.matched, preview.changed, preview.skipped), (2, 1, 1))
+        self.assertEqual(Product.objects.get(pk=self.c.pk).price, Decimal("500.00"))
+
+        resp = self.client.post('/admin/catalog/product/reprice/', {**data, 'apply': '1'})
+        self.assertRedirects(resp, '/admin/catalog/product/')
+        self.assertEqual(Product.objects.get(pk=self.c.pk).price, Decimal("300.00"))
+        self.assertEqual(Product.objects.get(pk=self.a.pk).price, Decimal("104.00"))
+
+    def test_admin_action_on_selected(self):
+        self.client.force_login(self.admin)
+        selected = {'action': 'reprice_selected', '_selected_action': [self.a.pk, self.c.pk]}
+        resp = self.client.post('/admin/catalog/product/', selected)
+        self.assertEqual(resp.context['selected_count'], 2)
+        resp = self.client.post('/admin/catalog/product/', {**selected, 'mode': 'percent', 'value': '50',
+                                                             'rounding': '1', 'apply': '1'})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(Product.objects.get(pk=self.a.pk).price, Decimal("156.00"))
+        self.assertEqual(Product.objects.get(pk=self.b.pk).price, Decimal("1996.00"))
+
+        resp = self.client.post('/admin/catalog/product/', {'action': 'decrease_price_10', '_selected_action': [self.b.pk]})
+        self.assertEqual(Product.objects.get(pk=self.b.pk).price, Decimal("1796.40"))
+
+
+class ScheduledPriceChangeTests(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        self.now = timezone.now()
+        self.past, self.future = self.now - timedelta(minutes=1), self.now + timedelta(days=1)
+        self.filters = Category.objects.create(name="Фильтры", slug="filtry")
+        self.oils = Category.objects.create(name="Масла", slug="masla")
+        self.a = Product.objects.create(name="Фильтр A", slug="f-a", sku="F-A", price=Decimal("100.00"), category=self.filters)
+        self.b = Product.objects.create(name="Фильтр B", slug="f-b", sku="F-B", price=Decimal("200.00"), category=self.filters)
+        self.c = Product.objects.create(name="Масло C", slug="m-c", sku="M-C", price=Decimal("300.00"), category=self.oils)
+        self.manager = get_user_model().objects.create_user(email='manager@test.com', password='pass1234')
+
+    def schedule(self, **kwargs):
+        from .models import ScheduledPriceChange
+
+        kwargs.setdefault("effective_at", self.past)
+        return ScheduledPriceChange.objects.create(created_by=self.manager, **kwargs)
+
+    def test_due_changes_applied_set_based(self):
+        from .models import PriceHistory, ScheduledPriceChange
+        from .pricing import apply_scheduled_changes
+
+        self.schedule(category=self.filters, kind=ScheduledPriceChange.KIND_PERCENT, value=Decimal("-10"))
+        self.schedule(product=self.a, kind=ScheduledPriceChange.KIND_PERCENT, value=Decimal("50"), reason="акция")
+        self.schedule(product=self.c, value=Decimal("299.00"), effective_at=self.future)
+
+        with product_updates() as updates, self.captureOnCommitCallbacks(execute=True):
+            result = apply_scheduled_changes(now=self.now)
+        self.assertEqual((result.applied, result.products, result.changed), (2, 2, 2))
+        # The category change updates both filters at once, then the product change
+        self.assertEqual(updates, [2, 1])
+        # Percentages compound: 100 - 10% + 50%
+        self.assertEqual(Product.objects.get(pk=self.a.pk).price, Decimal("135.00"))
+        self.assertEqual(Product.objects.get(pk=self.b.pk).price, Decimal("180.00"))
+        self.assertEqual(Product.objects.get(pk=self.c.pk).price, Decimal("300.00"))
+        history = PriceHistory.objects.get(product=self.a)
+        self.assertEqual((history.old_price, history.new_price, history.reason, history.changed_by),
+                         (Decimal("100.00"), Decimal("135.00"), "акция", self.manager))
+        self.assertEqual(ScheduledPriceChange.objects.filter(applied_at__isnull=True).count(), 1)
+
+        # Applied changes are not applied again
+        self.assertEqual(apply_scheduled_changes(now=self.now).applied, 0)
+        self.assertEqual(Product.objects.get(pk=self.b.pk).price, Decimal("180.00"))
+
+    def test_product_changes_share_a_statement_until_a_product_repeats(self):
+        from .models import PriceHistory, ScheduledPriceChange
+        from .pricing import apply_scheduled_changes
+
+        self.schedule(product=self.a, value=Decimal("120.00"))
+        self.schedule(product=self.b, kind=ScheduledPriceChange.KIND_PERCENT, value=Decimal("10"))
+        self.schedule(product=self.a, kind=ScheduledPriceChange.KIND_PERCENT, value=Decimal("10"))
+        with product_updates() as updates, self.captureOnCommitCallbacks(execute=True):
+            result = apply_scheduled_changes(now=self.now)
+        self.assertEqual((result.applied, result.products, result.changed), (3, 2, 2))
+        self.assertEqual(updates, [2, 1])
+        self.assertEqual(Product.objects.get(pk=self.a.pk).price, Decimal("132.00"))
+        self.assertEqual(Product.objects.get(pk=self.b.pk).price, Decimal("220.00"))
+        history = PriceHistory.objects.get(product=self.a)
+        self.assertEqual((history.old_price, history.new_price), (Decimal("100.00"), Decimal("132.00")))
+
+    def test_command_and_non_positive_result(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import ScheduledPriceChange
+
+        self.schedule(product=self.b, kind=ScheduledPriceChange.KIND_PERCENT, value=Decimal("-100"))
+        self.schedule(product=self.c, value=Decimal("299.00"))
+        out = StringIO()
+        call_command("apply_price_schedule", stdout=out)
+        self.assertIn("Changes applied: 2, products: 1, prices changed: 1, skipped: 1", out.getvalue())
+        self.assertEqual(Product.objects.get(pk=self.b.pk).price, Decimal("200.00"))
+        self.assertEqual(Product.objects.get(pk=self.c.pk).price, Decimal("299.00"))
+
+    def test_scope_is_required(self):
+        from django.core.exceptions import ValidationError
+        from .models import ScheduledPriceChange
+
+        change = ScheduledPriceChange(value=Decimal("10"), effective_at=self.future)
+        with self.assertRaises(ValidationError):
+            change.full_clean()
+
+
+class KeywordMatcherTests(TestCase):
+    def test_first_priority_group_wins(self):
+        from .keywords import KeywordMatcher
+
+        matcher = KeywordMatcher([(['масляный фильтр', 'oil filter'], 'filter'), (['масло', 'oil'], 'oil'),
+                                  (['he', 'she', 'hers'], 'pronoun')])
+        self.assertEqual(matcher.match('Масло моторное, масляный фильтр'), 'filter')
+        self.assertEqual(matcher.match('ENGINE OIL 5W-30'), 'oil')
+        self.assertEqual(matcher.match('ushers'), 'pronoun')
+        self.assertIsNone(matcher.match('Сальник коленвала'))
+        self.assertEqual(matcher.match(None, default='-'), '-')
+
+    def test_same_results_as_linear_scan(self):
+        from .keywords import KeywordMatcher
+        from .management.commands.bench_keywords import OTHER_PARTS, linear_match_index
+        from .management.commands.diversify_catalog import PART_TYPES
+        from .models import KEYWORD_CATEGORIES, KEYWORD_IMAGES, KEYWORD_LABELS
+
+        names = [tpl.format(brand="Bosch", code=1) for tpl, _cat, _brands in PART_TYPES] + OTHER_PARTS
+        names += ["Фильтр масляный", "АКБ 60Ач", "Масло 5W30", "ЩЁТКА ДВОРНИКА", "стойка стабилизатора"]
+        for table in (KEYWORD_LABELS, KEYWORD_IMAGES, KEYWORD_CATEGORIES):
+            matcher = KeywordMatcher(table)
+            for name in names:
+                self.assertEqual(matcher.match_index(name), linear_match_index(table, name), name)
+        for tpl, slug, _brands in PART_TYPES:
+            self.assertEqual(guess_category_slug(tpl.format(brand="X", code=1)), slug)
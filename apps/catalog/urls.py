@@ -1,7 +1,19 @@
-from django.urls import path
-from .views import ProductListAPIView, ProductDetailAPIView
+from django.urls import path, re_path
+from .views import (
+    CatalogCacheStatsAPIView,
+    ProductBatchAPIView,
+    ProductDetailAPIView,
+    ProductListAPIView,
+    SearchSuggestAPIView,
+    product_feed,
+)
 
 urlpatterns = [
     path('products/', ProductListAPIView.as_view(), name='api-products-list'),
+    # Before the detail route; "batch" is a reserved product slug
+    path('products/batch/', ProductBatchAPIView.as_view(), name='api-products-batch'),
     path('products/<slug:slug>/', ProductDetailAPIView.as_view(), name='api-products-detail'),
+    re_path(r'^feeds/products\.(?P<fmt>yml|csv|jsonl)$', product_feed, name='api-products-feed'),
+    path('search/suggest/', SearchSuggestAPIView.as_view(), name='api-search-suggest'),
+    path('catalog/cache-stats/', CatalogCacheStatsAPIView.as_view(), name='api-catalog-cache-stats'),
 ]
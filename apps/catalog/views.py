@@ -1,89 +1,159 @@
-from rest_framework import generics
-from rest_framework.pagination import PageNumberPagination
+from decimal import Decimal
+
+from rest_framework import generics, permissions, views
+from rest_framework.response import Response
+from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.db.models import Q
-from django.db.models.functions import Lower
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db import connection
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_GET
+
+from apps.core.page_cache import anonymous_page_cache
+from apps.core.sparse import requested_fields, restrict_queryset
 
+from . import result_cache, suggest
+from .codes import looks_like_code, unique_product_slug
+from .conditional import catalog_etag, product_etag, product_last_modified, product_page_etag
+from .feeds import Feed, parse_since
 from .models import Product, Category
-from .serializers import ProductSerializer
+from .pagination import CatalogPagination, DefaultPagination, KeysetPagination  # noqa: F401 - DefaultPagination re-exported
+from .query import TRUE_VALUES, CatalogQuery
+from .serializers import (
+    PRODUCT_ROW_COLUMNS,
+    ProductBatchRequestSerializer,
+    ProductSerializer,
+    product_row_fields,
+    serialize_product_rows,
+)
 
 
-class DefaultPagination(PageNumberPagination):
-    page_size = 12
-    page_size_query_param = "page_size"
-    max_page_size = 100
+# Response header naming the search strategy used by CatalogQuery (for profiling)
+STRATEGY_HEADER = "X-Catalog-Strategy"
+# Result cache outcome for the listing: hit, miss or bypass
+CACHE_HEADER = "X-Catalog-Cache"
+# Product cards per page (and per "load more" batch) on /catalog/
+CATALOG_PAGE_SIZE = 24
 
 
 class ProductListAPIView(generics.ListAPIView):
     serializer_class = ProductSerializer
-    pagination_class = DefaultPagination
+    pagination_class = CatalogPagination
+
+    @method_decorator(condition(etag_func=catalog_etag))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        qs = Product.objects.select_related("category").all().order_by("name")
-        params = self.request.query_params
-
-        search = params.get("search")
-        if search:
-            tokens = [t.strip().casefold() for t in search.split() if t.strip()]
-            if tokens:
-                if connection.vendor == 'sqlite':
-                    # SQLite LOWER/LIKE are ASCII-only; do Python-level casefold matching
-                    ids = []
-                    for p in qs:
-                        text = " ".join([
-                            (p.name or ""),
-                            (p.description or ""),
-                            (p.sku or ""),
-                            (p.manufacturer or ""),
-                        ]).casefold()
-                        if any(t in text for t in tokens):
-                            ids.append(p.id)
-                    qs = qs.filter(id__in=ids)
-                else:
-                    qs = qs.annotate(
-                        name_l=Lower("name"),
-                        desc_l=Lower("description"),
-                        sku_l=Lower("sku"),
-                        manufacturer_l=Lower("manufacturer"),
-                    )
-                    q = Q()
-                    for t in tokens:
-                        q |= (
-                            Q(name_l__contains=t)
-                            | Q(desc_l__contains=t)
-                            | Q(sku_l__contains=t)
-                            | Q(manufacturer_l__contains=t)
-                        )
-                    qs = qs.filter(q)
-
-        category = params.get("category")
-        if category:
-            qs = qs.filter(category__slug=category)
-
-        price_min = params.get("price_min")
-        if price_min:
-            qs = qs.filter(price__gte=price_min)
-
-        price_max = params.get("price_max")
-        if price_max:
-            qs = qs.filter(price__lte=price_max)
-
-        in_stock = params.get("in_stock")
-        if in_stock in {"1", "true", "True"}:
-            qs = qs.filter(in_stock__gt=0)
-
-        sort = params.get("sort")
-        if sort == "price":
-            qs = qs.order_by("price")
-        elif sort == "-price":
-            qs = qs.order_by("-price")
-        elif sort == "new":
-            qs = qs.order_by("-created_at")
-        elif sort == "-new":
-            qs = qs.order_by("created_at")
-
-        return qs
+        self.catalog_query = CatalogQuery.from_params(self.request.query_params, user=self.request.user)
+        self.selected_fields = requested_fields(self.request, PRODUCT_ROW_COLUMNS)
+        columns = product_row_fields(self.selected_fields)
+        if KeysetPagination.cursor_query_param in self.request.query_params:
+            # Keyset pages filter on the sort key, which needs the real queryset
+            sort_field = KeysetPagination.get_ordering(self.catalog_query.queryset())[0].lstrip("-")
+            return self.catalog_query.values_queryset(tuple(dict.fromkeys(columns + (sort_field,))))
+        return self.catalog_query.results(values=columns)
+
+    def list(self, request, *args, **kwargs):
+        # Rows are .values() dicts; serialize_product_rows matches ProductSerializer output
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        response = self.get_paginated_response(serialize_product_rows(page, self.selected_fields))
+        if request.query_params.get("facets") in TRUE_VALUES:
+            response.data["facets"] = self.catalog_query.facets()
+        if self.catalog_query.corrected_search:
+            response.data["corrected_search"] = self.catalog_query.corrected_search
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        catalog_query = getattr(self, "catalog_query", None)
+        if catalog_query is not None and catalog_query.strategy:
+            response[STRATEGY_HEADER] = catalog_query.strategy
+        if catalog_query is not None and catalog_query.cache_status:
+            response[CACHE_HEADER] = catalog_query.cache_status
+        return response
+
+
+class CatalogCacheStatsAPIView(views.APIView):
+    """Hit/miss counters of the catalog result cache (staff only)."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(result_cache.stats())
+
+
+class SearchSuggestAPIView(views.APIView):
+    """Search-as-you-type: products, SKUs, manufacturers and categories for a prefix."""
+
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        try:
+            limit = int(request.query_params.get("limit", suggest.DEFAULT_LIMIT))
+        except ValueError:
+            limit = suggest.DEFAULT_LIMIT
+        limit = max(1, min(limit, suggest.MAX_LIMIT))
+        data = suggest.get_index().suggest(query, limit=limit)
+        data["query"] = query
+        return Response(data)
+
+
+class ProductBatchAPIView(views.APIView):
+    """Look up many products at once by ids, slugs and/or SKUs.
+
+    One ``IN`` query per request; keys that match nothing are listed under
+    ``missing`` instead of failing the request. Supports ``fields=``/``omit=``.
+    """
+
+    def post(self, request):
+        body = ProductBatchRequestSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(body.validated_data["ids"]))
+        slugs = list(dict.fromkeys(body.validated_data["slugs"]))
+        skus = list(dict.fromkeys(body.validated_data["skus"]))
+
+        selected = requested_fields(request, PRODUCT_ROW_COLUMNS)
+        columns = tuple(dict.fromkeys(product_row_fields(selected) + ("slug", "sku")))
+        rows = Product.objects.filter(Q(id__in=ids) | Q(slug__in=slugs) | Q(sku__in=skus)).values(*columns)
+        by_id, by_slug, by_sku = {}, {}, {}
+        for row in rows:
+            by_id[row["id"]] = row
+            by_slug[row["slug"]] = row
+            by_sku[row["sku"]] = row
+
+        # Results follow the request order (ids, then slugs, then SKUs), each product once
+        ordered = {}
+        for keys, index in ((ids, by_id), (slugs, by_slug), (skus, by_sku)):
+            for value in keys:
+                row = index.get(value)
+                if row is not None:
+                    ordered.setdefault(row["id"], row)
+        return Response({
+            "results": serialize_product_rows(ordered.values(), selected),
+            "missing": {
+                "ids": [value for value in ids if value not in by_id],
+                "slugs": [value for value in slugs if value not in by_slug],
+                "skus": [value for value in skus if value not in by_sku],
+            },
+        })
+
+
+@require_GET
+def product_feed(request, fmt: str):
+    """Stream the catalog as a YML/CSV/JSONL feed; ``?since=`` limits it to recent changes."""
+    try:
+        since = parse_since(request.GET.get("since"))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    feed = Feed(fmt, since=since, base_url=request.build_absolute_uri("/"))
+    response = StreamingHttpResponse(feed, content_type=feed.content_type)
+    response["Content-Disposition"] = f'inline; filename="{feed.filename}"'
+    response["X-Feed-Generated-At"] = feed.generated_at.isoformat()
+    return response
 
 
 class ProductDetailAPIView(generics.RetrieveAPIView):
@@ -91,94 +161,109 @@ class ProductDetailAPIView(generics.RetrieveAPIView):
     lookup_field = "slug"
     queryset = Product.objects.select_related("category").all()
 
+    def get_queryset(self):
+        selected = requested_fields(self.request, ProductSerializer.Meta.fields)
+        return restrict_queryset(super().get_queryset(), ProductSerializer, selected)
+
+    @method_decorator(condition(etag_func=product_etag, last_modified_func=product_last_modified))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 # ---------------------- Site (HTML) views ----------------------
+def _catalog_url(request, **changes) -> str:
+    params = request.GET.copy()
+    for key in ("goto", "page"):
+        params.pop(key, None)
+    for key, value in changes.items():
+        if value is None:
+            params.pop(key, None)
+        else:
+            params[key] = value
+    return f"/catalog/?{params.urlencode()}"
+
+
+def _facet_links(request, facets: dict) -> dict:
+    """Attach filter URLs (keeping the current query) to facet entries."""
+    cent = Decimal("0.01")
+    for m in facets["manufacturers"]:
+        m["url"] = _catalog_url(request, manufacturer=m["name"])
+    for bucket in facets["price"]:
+        bucket["url"] = _catalog_url(
+            request,
+            price_min=bucket["min"],
+            price_max=str(Decimal(bucket["max"]) - cent) if bucket["max"] else None,
+        )
+    facets["in_stock"]["url"] = _catalog_url(request, in_stock="1")
+    return facets
+
+
+def _catalog_page_scopes(request) -> list[str]:
+    category = request.GET.get("category")
+    return [result_cache.category_scope(category) if category else result_cache.SCOPE_ALL]
+
+
+@condition(etag_func=catalog_etag)
+@anonymous_page_cache(_catalog_page_scopes)
 def site_catalog(request):
-    params = request.GET
-    qs = Product.objects.select_related("category").all().order_by("name")
-
-    search = params.get("search")
-    if search:
-        tokens = [t.strip().casefold() for t in search.split() if t.strip()]
-        if tokens:
-            if connection.vendor == 'sqlite':
-                ids = []
-                for p in qs:
-                    text = " ".join([
-                        (p.name or ""),
-                        (p.description or ""),
-                        (p.sku or ""),
-                        (p.manufacturer or ""),
-                        (getattr(p.category, 'name', '') or ""),
-                    ]).casefold()
-                    if any(t in text for t in tokens):
-                        ids.append(p.id)
-                qs = qs.filter(id__in=ids)
-            else:
-                qs = qs.annotate(
-                    name_l=Lower("name"),
-                    desc_l=Lower("description"),
-                    sku_l=Lower("sku"),
-                    manufacturer_l=Lower("manufacturer"),
-                    category_l=Lower("category__name"),
-                )
-                q = Q()
-                for t in tokens:
-                    q |= (
-                        Q(name_l__contains=t)
-                        | Q(desc_l__contains=t)
-                        | Q(sku_l__contains=t)
-                        | Q(manufacturer_l__contains=t)
-                        | Q(category_l__contains=t)
-                    )
-                qs = qs.filter(q)
-
-    category = params.get("category")
-    if category:
-        qs = qs.filter(category__slug=category)
-
-    price_min = params.get("price_min")
-    if price_min:
-        qs = qs.filter(price__gte=price_min)
-
-    price_max = params.get("price_max")
-    if price_max:
-        qs = qs.filter(price__lte=price_max)
-
-    in_stock = params.get("in_stock")
-    if in_stock in {"1", "true", "True"}:
-        qs = qs.filter(in_stock__gt=0)
-
-    sort = params.get("sort")
-    if sort == "price":
-        qs = qs.order_by("price")
-    elif sort == "-price":
-        qs = qs.order_by("-price")
-    elif sort == "new":
-        qs = qs.order_by("-created_at")
-    elif sort == "-new":
-        qs = qs.order_by("created_at")
+    # A pasted article number resolves straight to its product (one indexed lookup)
+    search_term = request.GET.get("search") or ""
+    if request.GET.get("goto") == "1" and looks_like_code(search_term):
+        slug = unique_product_slug(search_term)
+        if slug:
+            return redirect(f"/parts/{slug}/")
+
+    catalog_query = CatalogQuery.from_params(request.GET, user=request.user)
+    qs = catalog_query.results()
 
     # If exactly one product matched and user requested goto, redirect to its detail
     if request.GET.get('goto') == '1':
-        try:
-            count = qs.count()
-            if count == 1:
-                only = qs.first()
-                return redirect(f"/parts/{only.slug}/")
-        except Exception:
-            pass
-
-    categories = Category.objects.all()
-    total_count = qs.count()
+        matches = list(qs[:2])
+        if len(matches) == 1:
+            return redirect(f"/parts/{matches[0].slug}/")
+
+    is_htmx = bool(getattr(request, "htmx", False))
+    paginator = Paginator(qs, CATALOG_PAGE_SIZE)
+    facets = None
+    if not is_htmx:
+        facets = catalog_query.facets()
+        # The facet pass already counted the result set
+        paginator.count = facets["total"]
+    page_obj = paginator.get_page(request.GET.get("page"))
+    next_page_url = None
+    if page_obj.has_next():
+        next_params = request.GET.copy()
+        next_params.pop("goto", None)
+        next_params["page"] = page_obj.next_page_number()
+        next_page_url = f"?{next_params.urlencode()}"
+
     context = {
-        "products": qs,  # show all products
-        "categories": categories,
-        "total_count": total_count,
+        "page_obj": page_obj,
+        "next_page_url": next_page_url,
     }
-    return render(request, "catalog/list.html", context)
+    if is_htmx:
+        # "Load more" / infinite scroll: only the next batch of cards
+        response = render(request, "catalog/_product_grid.html", context)
+    else:
+        category_counts = {c["id"]: c["count"] for c in facets["categories"]}
+        categories = list(Category.objects.all())
+        for category in categories:
+            category.facet_count = category_counts.get(category.id, 0)
+        context.update({
+            "categories": categories,
+            "facets": _facet_links(request, facets),
+            "total_count": paginator.count,
+            "corrected_search": catalog_query.corrected_search,
+            "garage": list(request.user.garage.all()) if request.user.is_authenticated else [],
+        })
+        response = render(request, "catalog/list.html", context)
+    response[STRATEGY_HEADER] = catalog_query.strategy
+    response[CACHE_HEADER] = catalog_query.cache_status
+    return response
 
 
+@condition(etag_func=product_page_etag, last_modified_func=product_last_modified)
+@anonymous_page_cache(lambda request, slug: [result_cache.product_scope(slug), result_cache.SCOPE_CATEGORIES])
 def site_product_detail(request, slug: str):
     product = get_object_or_404(Product.objects.select_related("category"), slug=slug)
     context = {
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from apps.catalog.models import Category, Product
+from apps.catalog.serializers import CategorySerializer, ProductSerializer
+from apps.core import renderers
+from apps.core.renderers import FastJSONRenderer
+from apps.orders.models import Order
+from apps.orders.serializers import OrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare FastJSONRenderer with DRF's JSONRenderer on real serializer output "
+        "(product page, categories, orders) and check that both render identical bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100, help="Products per page. Default: 100")
+        parser.add_argument("--rounds", type=int, default=200, help="Timed rounds per renderer. Default: 200")
+
+    def _time(self, fn, rounds: int) -> float:
+        samples = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError("orjson is not installed; FastJSONRenderer falls back to the stock renderer.")
+        items, rounds = options["items"], options["rounds"]
+        products = list(Product.objects.select_related("category").order_by("name")[:items])
+        if not products:
+            raise CommandError("No products in the database; run seed_demo first.")
+        payloads = [
+            ("products", ProductSerializer(products, many=True).data),
+            ("categories", CategorySerializer(Category.objects.all(), many=True).data),
+        ]
+        orders = list(Order.objects.prefetch_related("items__product")[:items])
+        if orders:
+            payloads.append(("orders", OrderSerializer(orders, many=True).data))
+
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        for label, data in payloads:
+            expected = stock.render(data)
+            if fast.render(data) != expected:
+                raise CommandError(f"Outputs differ for {label}")
+            stock_s = self._time(lambda: stock.render(data), rounds)
+            fast_s = self._time(lambda: fast.render(data), rounds)
+            self.stdout.write(
+                f"{label:<11} {len(data):5d} items {len(expected):8d} bytes  "
+                f"JSONRenderer {stock_s * 1000:8.3f} ms  FastJSONRenderer {fast_s * 1000:8.3f} ms  "
+                f"x{stock_s / fast_s:5.1f}"
+            )
+        self.stdout.write("identical output: yes")
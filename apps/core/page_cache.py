@@ -0,0 +1,90 @@
+"""Full-page cache for anonymous visitors.
+
+Pages are stored in the ``catalog`` cache under their path, sorted query
+string and HTMX flag, prefixed with the catalog generation counters the
+view names (see ``apps.catalog.result_cache``), so saving a product purges
+its own page and the listings of its category and nothing else.
+
+Only plain anonymous GETs are served: logged-in users, guests whose session
+holds a cart or pending messages, and responses that set cookies other than
+CSRF are never cached. The cart badge and mini-cart in ``base.html`` load
+over separate requests, and the CSRF cookie they need is issued on every hit.
+"""
+from __future__ import annotations
+
+import hashlib
+from functools import wraps
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from apps.catalog import result_cache
+
+
+PAGE_TIMEOUT = 60 * 10
+# Response header with the page cache outcome: hit or miss
+PAGE_CACHE_HEADER = "X-Page-Cache"
+
+
+def _is_cacheable_request(request) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if CookieStorage.cookie_name in request.COOKIES:
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        if request.user.is_authenticated:
+            return False
+        session = request.session
+        if session.get("cart_id") or session.get("_messages"):
+            return False
+    return True
+
+
+def _page_key(request, scopes: list[str]) -> str:
+    query = sorted(request.GET.lists())
+    raw = f"{request.path}?{query}|htmx={int('HX-Request' in request.headers)}"
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    versions = ".".join(str(v) for v in result_cache.generations(scopes))
+    return f"page:{versions}:{digest}"
+
+
+def anonymous_page_cache(scopes: Callable[..., list[str]], timeout: int = PAGE_TIMEOUT):
+    """Cache a view's 200 responses for anonymous visitors.
+
+    ``scopes(request, *args, **kwargs)`` names the generation counters whose
+    bump must purge the page.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not _is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+            cache = result_cache.result_cache()
+            key = _page_key(request, scopes(request, *args, **kwargs))
+            entry = cache.get(key)
+            if entry is not None:
+                get_token(request)
+                response = HttpResponse(entry["content"], status=entry["status"])
+                for header, value in entry["headers"].items():
+                    response[header] = value
+                response[PAGE_CACHE_HEADER] = "hit"
+                return response
+
+            response = view(request, *args, **kwargs)
+            cookies = set(response.cookies) - {settings.CSRF_COOKIE_NAME}
+            if response.status_code == 200 and not response.streaming and not cookies:
+                cache.set(key, {
+                    "status": response.status_code,
+                    "content": response.content,
+                    "headers": dict(response.headers),
+                }, timeout)
+                response[PAGE_CACHE_HEADER] = "miss"
+            return response
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,61 @@
+"""Fast JSON renderer for DRF views.
+
+``FastJSONRenderer`` encodes with ``orjson`` when it is installed and
+produces the same bytes as DRF's ``JSONRenderer`` with the default
+``UNICODE_JSON`` / ``COMPACT_JSON`` settings: types orjson has no native
+form for (``Decimal``, lazy strings, querysets, ...) go through the same
+conversions as DRF's ``JSONEncoder``.
+
+Without orjson, with ``?indent=`` / the browsable API, with non-default
+JSON settings, or for data orjson rejects (e.g. integers beyond 64 bits),
+rendering falls back to the stock renderer.
+"""
+from __future__ import annotations
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+_ENCODER = JSONEncoder()
+# DRF always escapes these so the output is a strict JavaScript subset
+_LINE_SEPARATORS = (("\u2028".encode(), b"\\u2028"), ("\u2029".encode(), b"\\u2029"))
+
+
+def _default(obj):
+    # orjson does UUIDs natively; datetimes are passed through so their
+    # representation matches DRF's (full precision, "Z" for UTC)
+    return _ENCODER.default(obj)
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data) -> bytes:
+    """Encode ``data`` like the stock renderer in compact, unicode mode."""
+    if orjson is None:
+        return JSONRenderer().render(data)
+    ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+    for raw, escaped in _LINE_SEPARATORS:
+        if raw in ret:
+            ret = ret.replace(raw, escaped)
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in replacement for ``rest_framework.renderers.JSONRenderer``."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
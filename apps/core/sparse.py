@@ -0,0 +1,113 @@
+"""Sparse fieldsets for API responses.
+
+Clients pass ``?fields=id,name,price`` to get only those fields, or
+``?omit=description,compatibility`` to drop some. The selection applies to
+the top-level serializer only (nested ones keep their shape), and
+``restrict_queryset`` narrows the SQL to the columns the selection needs.
+Unknown field names are rejected with a 400.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+FIELDS_PARAM = "fields"
+OMIT_PARAM = "omit"
+
+
+def _split(value: str | None) -> set[str]:
+    return {name.strip() for name in (value or "").split(",") if name.strip()}
+
+
+def requested_fields(request, available: Iterable[str]) -> list[str] | None:
+    """Selected field names in declaration order, or ``None`` when the request selects nothing.
+
+    Raises ``ValidationError`` (a 400 response) for names not in ``available``.
+    """
+    if request is None:
+        return None
+    params = getattr(request, "query_params", request.GET)
+    fields, omit = _split(params.get(FIELDS_PARAM)), _split(params.get(OMIT_PARAM))
+    if not fields and not omit:
+        return None
+    available = list(available)
+    errors = {}
+    for param, names in ((FIELDS_PARAM, fields), (OMIT_PARAM, omit)):
+        unknown = sorted(names.difference(available))
+        if unknown:
+            errors[param] = f"Unknown fields: {', '.join(unknown)}"
+    if errors:
+        raise ValidationError(errors)
+    return [name for name in available if (not fields or name in fields) and name not in omit]
+
+
+class SparseFieldsetsMixin:
+    """Serializer mixin honouring ``fields=`` / ``omit=`` from the request in the context."""
+
+    def _is_top_level(self) -> bool:
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+        selected = requested_fields(self.context.get("request"), fields)
+        if selected is None:
+            return fields
+        return {name: fields[name] for name in selected}
+
+
+def restrict_queryset(queryset, serializer_class, selected: list[str] | None, keep: Iterable[str] = ()):
+    """Apply ``.only()`` for the model columns behind ``selected`` serializer fields.
+
+    Foreign keys serialized by a nested serializer load the related columns
+    too; reverse relations need no column and are left to prefetching.
+    ``keep`` names columns the view itself needs (e.g. for permission checks).
+    ``select_related()`` joins of relations the selection leaves out are
+    dropped, since ``.only()`` cannot defer a relation that is traversed.
+    """
+    if selected is None:
+        return queryset
+    model = queryset.model
+    declared = serializer_class().fields
+    columns = {model._meta.pk.name, *keep}
+    for name in selected:
+        field = declared.get(name)
+        source = (getattr(field, "source", None) or name).split(".")[0]
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.concrete:
+            continue
+        columns.add(model_field.name)
+        if model_field.is_relation and isinstance(field, serializers.BaseSerializer):
+            related_pk = model_field.related_model._meta.pk.name
+            nested = getattr(field, "child", field).fields
+            columns.add(f"{model_field.name}__{related_pk}")
+            for sub in nested.values():
+                sub_source = sub.source.split(".")[0]
+                if sub_source != "*":
+                    columns.add(f"{model_field.name}__{sub_source}")
+    related = queryset.query.select_related
+    if isinstance(related, dict):
+        kept = [path for path in _related_paths(related) if path.split("__")[0] in columns]
+        queryset = queryset.select_related(None)
+        if kept:
+            queryset = queryset.select_related(*kept)
+    return queryset.only(*columns)
+
+
+def _related_paths(tree: dict, prefix: str = "") -> list[str]:
+    """``select_related()`` lookups from the nested dict Django keeps them in."""
+    paths = []
+    for name, subtree in tree.items():
+        path = f"{prefix}{name}"
+        nested = _related_paths(subtree, f"{path}__") if subtree else []
+        paths.extend(nested or [path])
+    return paths
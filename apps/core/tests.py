@@ -1,3 +1,88 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.catalog.models import Category, Product
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name="Фильтры", slug="filtry")
+        self.other = Category.objects.create(name="Тормоза", slug="tormoza")
+        self.product = Product.objects.create(name="Фильтр масляный", slug="oil", sku="OIL-1",
+                                              price=Decimal("500.00"), category=self.cat)
+        Product.objects.create(name="Колодки", slug="pads", sku="PAD-1", price=Decimal("900.00"), category=self.other)
+
+    def test_pages_cached_for_anonymous_and_purged_on_save(self):
+        self.assertEqual(self.client.get('/parts/oil/')['X-Page-Cache'], 'miss')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/parts/oil/')
+        self.assertEqual(resp['X-Page-Cache'], 'hit')
+        # only the (id, updated_at) lookup for the ETag
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('csrftoken', resp.cookies)
+        self.assertContains(resp, "Фильтр масляный")
+
+        self.client.get('/catalog/?category=tormoza')
+        self.product.name = "Фильтр воздушный"
+        self.product.save()
+        resp = self.client.get('/parts/oil/')
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+        self.assertContains(resp, "Фильтр воздушный")
+        # Listings of other categories survive
+        self.assertEqual(self.client.get('/catalog/?category=tormoza')['X-Page-Cache'], 'hit')
+
+    def test_htmx_requests_cached_separately(self):
+        self.client.get('/catalog/')
+        resp = self.client.get('/catalog/', HTTP_HX_REQUEST='true')
+        self.assertEqual(resp['X-Page-Cache'], 'miss')
+        self.assertNotContains(resp, '<html')
+
+    def test_logged_in_and_cart_sessions_skip_cache(self):
+        self.client.get('/')
+        self.client.post('/api/cart/items/', {'product': self.product.id, 'quantity': 1}, content_type='application/json')
+        self.assertNotIn('X-Page-Cache', self.client.get('/'))
+        user = get_user_model().objects.create_user(email='u@test.com', password='pass1234')
+        self.client.force_login(user)
+        self.assertNotIn('X-Page-Cache', self.client.get('/'))
+
+
+class FastJSONRendererTests(TestCase):
+    def test_matches_stock_renderer(self):
+        import datetime
+        import uuid
+
+        from django.utils import timezone
+        from rest_framework.renderers import JSONRenderer
+
+        from apps.core.renderers import FastJSONRenderer
+
+        data = {
+            "price": Decimal("1234.50"),
+            "when": datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            "local": timezone.localtime(timezone.now()),
+            "day": datetime.date(2024, 5, 1),
+            "secret": uuid.uuid4(),
+            "text": "Фильтр масляный",
+            "keys": {1: "one"},
+            "nested": [Decimal("0.10"), None, True],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        # indent falls back to the stock renderer as well
+        pretty = FastJSONRenderer().render(data, "application/json; indent=2")
+        self.assertEqual(pretty, JSONRenderer().render(data, "application/json; indent=2"))
+
+    def test_payment_client_secret_rendered(self):
+        from apps.orders.models import Order
+        from apps.payments_mock.models import PaymentMock
 
-# Create your tests here.
+        user = get_user_model().objects.create_user(email="pay@test.com", password="pass1234")
+        order = Order.objects.create(user=user, payment_method="card")
+        self.client.force_login(user)
+        resp = self.client.post('/api/payments/mock/create/', {"order_id": order.id}, content_type="application/json")
+        self.assertEqual(resp.status_code, 201)
+        payment = PaymentMock.objects.get(id=resp.json()["payment_id"])
+        self.assertEqual(resp.json()["client_secret"], str(payment.client_secret))
@@ -1,7 +1,13 @@
 from django.shortcuts import render
+from django.views.decorators.http import condition
+from apps.catalog.conditional import catalog_etag
 from apps.catalog.models import Product
+from apps.catalog.result_cache import SCOPE_ALL
+from .page_cache import anonymous_page_cache
 
 
+@condition(etag_func=catalog_etag)
+@anonymous_page_cache(lambda request: [SCOPE_ALL])
 def home(request):
     featured = Product.objects.order_by('-created_at')[:8]
     context = {
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from apps.core.sparse import SparseFieldsetsMixin
 from .models import Order, OrderItem
 
 
@@ -13,7 +14,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ("unit_price",)
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
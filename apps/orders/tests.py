@@ -100,6 +100,20 @@ class OrdersTests(TestCase):
         self.assertEqual(data["fulfillment_status"], "placed")
         self.assertTrue(data["tracking_number"].startswith("ZC"))
 
+    def test_orders_sparse_fieldsets(self):
+        order = Order.objects.create(user=self.user, payment_method="card")
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, unit_price=Decimal("4213.00"))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        resp = client.get(reverse("api-orders"), {"fields": "id,total,status"})
+        results = resp.json()["results"] if "results" in resp.json() else resp.json()
+        self.assertEqual(set(results[0]), {"id", "total", "status"})
+        resp = client.get(reverse("api-orders-detail", kwargs={"pk": order.id}), {"omit": "items,user"})
+        self.assertNotIn("items", resp.json())
+        self.assertIn("tracking_number", resp.json())
+        full = client.get(reverse("api-orders-detail", kwargs={"pk": order.id})).json()
+        self.assertEqual(full["items"][0]["product_sku"], "AKB-1004")
+
     # -------- Site (HTML) views --------
     def test_site_checkout_requires_auth(self):
         from django.urls import reverse as dj_reverse
@@ -12,6 +12,7 @@ from .models import Order, OrderItem
 from .serializers import OrderSerializer
 from apps.payments_mock.models import PaymentMock
 from apps.accounts.models import Address
+from apps.core.sparse import requested_fields, restrict_queryset
 
 
 class IsOwner(permissions.BasePermission):
@@ -19,12 +20,20 @@ class IsOwner(permissions.BasePermission):
         return obj.user_id == request.user.id
 
 
+def _sparse_orders(request, queryset):
+    """Narrow columns to ``fields=``/``omit=`` and prefetch items only when they are sent."""
+    selected = requested_fields(request, OrderSerializer.Meta.fields)
+    if selected is None or "items" in selected:
+        queryset = queryset.prefetch_related('items__product')
+    return restrict_queryset(queryset, OrderSerializer, selected, keep=('user',))
+
+
 class OrderListAPIView(generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return _sparse_orders(self.request, Order.objects.filter(user=self.request.user).order_by('-created_at'))
 
 
 class OrderDetailAPIView(generics.RetrieveAPIView):
@@ -32,6 +41,9 @@ class OrderDetailAPIView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     queryset = Order.objects.all()
 
+    def get_queryset(self):
+        return _sparse_orders(self.request, super().get_queryset())
+
     def get_object(self):
         obj = super().get_object()
         self.check_object_permissions(self.request, obj)
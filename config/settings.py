@@ -129,6 +129,30 @@ else:
     }
 
 
+# Caches
+# The catalog result cache has its own alias so it can be moved to a shared
+# backend without touching the default one.
+CATALOG_CACHE_BACKEND = env.str('CATALOG_CACHE_BACKEND', default='locmem')  # 'locmem', 'file' or 'redis'
+CATALOG_CACHE_LOCATION = env.str('CATALOG_CACHE_LOCATION', default='')
+_CATALOG_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'catalog'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache' / 'catalog')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+_catalog_cache_backend, _catalog_cache_location = _CATALOG_CACHE_BACKENDS[CATALOG_CACHE_BACKEND]
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': _catalog_cache_backend,
+        'LOCATION': CATALOG_CACHE_LOCATION or _catalog_cache_location,
+        'TIMEOUT': 600,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -181,6 +205,11 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
+    # orjson-backed, byte-compatible with rest_framework.renderers.JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 SPECTACULAR_SETTINGS = {